@@ -0,0 +1,202 @@
+"""Queue-backed access log: requests never wait on a log write.
+
+With PC2NUTS_ACCESS_LOG_FILE set, every request used to run a
+RotatingFileHandler write (and now and then a rotation) on the event loop,
+so a slow disk added its latency straight to /lookup. The access log's
+handler is now a QueueWriter. emit() only puts the record on a bounded
+queue. A dedicated writer thread formats the records, writes them in batches
+and flushes once per batch.
+
+When the queue is full (the disk cannot keep up), PC2NUTS_ACCESS_LOG_QUEUE_POLICY
+decides: "drop" (the default) discards the record and counts it, and "block"
+waits up to PC2NUTS_ACCESS_LOG_QUEUE_BLOCK_MS for room before dropping it.
+Records are logged on the event loop, so that wait stalls every request in
+the worker, not just the one being logged; it is bounded for that reason.
+
+PC2NUTS_ACCESS_LOG_FORMAT=json writes one JSON object per line instead of
+text. Without a file it goes to stderr, through the same queue. Text lines
+without a file still propagate to the root logger, as before.
+"""
+
+import json
+import logging
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from app.config import settings
+
+access_logger = logging.getLogger("app.access")
+access_logger.setLevel(logging.INFO)
+
+# Largest number of records written between two flushes
+_BATCH = 512
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, client, method, path, status, duration_ms and token_id if trusted."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        client, method, path, status, duration_ms = record.args[:5]
+        line = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "client": client,
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration_ms, 1),
+        }
+        token_id = getattr(record, "token_id", None)
+        if token_id:
+            line["token_id"] = token_id
+        return json.dumps(line, separators=(",", ":"))
+
+
+class QueueWriter(logging.Handler):
+    """Hand records to a writer thread that writes them through `target` in batches.
+
+    `target` is a StreamHandler (a RotatingFileHandler or stderr) that is
+    only ever used from the writer thread. With `block` False, records that
+    find the queue full are dropped and counted. With `block` True, emit()
+    waits up to `block_timeout` seconds for room first; it is called on the
+    event loop, so the whole worker waits with it.
+    """
+
+    def __init__(
+        self, target: logging.StreamHandler, maxsize: int, block: bool = False, block_timeout: float = 0.05
+    ) -> None:
+        super().__init__()
+        self.target = target
+        self.block = block
+        self.block_timeout = block_timeout
+        self.queue: queue.Queue = queue.Queue(maxsize)
+        self.written = 0
+        self.dropped = 0
+        self.blocked = 0
+        self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if not self.block:
+                self.dropped += 1
+                return
+            self.blocked += 1
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+            except queue.Full:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < _BATCH and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            records = batch[:-1] if stop else batch
+            if records:
+                self._write(records)
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _write(self, records: list[logging.LogRecord]) -> None:
+        target = self.target
+        rotating = isinstance(target, RotatingFileHandler)
+        for record in records:
+            try:
+                if rotating and target.shouldRollover(record):
+                    target.doRollover()
+                target.stream.write(target.format(record) + target.terminator)
+            except Exception:
+                target.handleError(record)
+        try:
+            target.flush()
+        except Exception:
+            target.handleError(records[-1])
+        self.written += len(records)
+
+    def flush(self) -> None:
+        """Wait until every record queued so far has been written."""
+        if self._thread.is_alive():
+            self.queue.join()
+
+    def close(self) -> None:
+        """Write out the queue, stop the writer thread and close the target."""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(5)
+        self.target.close()
+        super().close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "max_queued": self.queue.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+        }
+
+
+_writer: QueueWriter | None = None
+
+
+def configure() -> None:
+    """Give the access log its queue-backed handler when it writes to a file or as JSON.
+
+    Called once at import of app.main. Text lines without a file keep
+    propagating to the root logger (stderr), where pytest's caplog sees them.
+    """
+    global _writer
+    as_json = settings.access_log_format == "json"
+    if _writer is not None or not (settings.access_log_file or as_json):
+        return
+    if settings.access_log_file:
+        target: logging.StreamHandler = RotatingFileHandler(
+            settings.access_log_file,
+            maxBytes=settings.access_log_max_mb * 1024 * 1024,
+            backupCount=settings.access_log_backup_count,
+        )
+    else:
+        target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(JsonFormatter() if as_json else logging.Formatter("%(asctime)s %(message)s"))
+    _writer = QueueWriter(
+        target,
+        settings.access_log_queue_size,
+        settings.access_log_queue_policy == "block",
+        settings.access_log_queue_block_ms / 1000,
+    )
+    access_logger.addHandler(_writer)
+    access_logger.propagate = False
+
+
+def log_request(
+    client: str, method: str, path: str, status: int, duration_ms: float, token_id: str | None
+) -> None:
+    """Log one access line. Formatting happens on the writer thread, not here."""
+    access_logger.info(
+        "%s %s %s %d %.1fms%s",
+        client,
+        method,
+        path,
+        status,
+        duration_ms,
+        f" token_id={token_id}" if token_id else "",
+        extra={"token_id": token_id},
+    )
+
+
+def get_access_log_stats() -> dict[str, int]:
+    """Queue depth and written/dropped/blocked counts since startup (all 0 without a queue)."""
+    if _writer is None:
+        return {"queued": 0, "max_queued": 0, "written": 0, "dropped": 0, "blocked": 0}
+    return _writer.stats()
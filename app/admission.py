@@ -0,0 +1,165 @@
+"""Admission control for /lookup and /pattern: shed load before requests pile up.
+
+Past the throughput knee (docs/performance.md) every extra request only adds
+to the queue, and p99 jumps from ~150 ms to seconds. Rather than let work
+queue inside the worker, AdmissionMiddleware caps the requests each worker
+has in flight and answers anything over the cap with an immediate 503 and
+`Retry-After`, so clients back off or fail over while latency stays flat.
+
+Trusted-token requests (request.state.trusted, set by AuthMiddleware) have
+their own lane with a separate cap, so anonymous overload never sheds them.
+
+With PC2NUTS_ADMISSION_TARGET_DELAY_MS set, the anonymous cap adapts. A
+standing queue shows up as even the fastest response in an interval taking
+longer than the target; CoDel uses the same signal to tell a queue from a
+burst. When that happens the cap is cut by a quarter, and it grows back by
+one per interval while responses stay under the target. The cap never
+exceeds PC2NUTS_ADMISSION_MAX_IN_FLIGHT.
+
+All counters are touched from the event loop only, so no lock is needed.
+"""
+
+import math
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+GUARDED_PATHS = frozenset({"/lookup", "/pattern"})
+
+# Length of one queue-delay measurement interval, in seconds
+_INTERVAL = 0.1
+# Multiplicative decrease applied to the adaptive cap on a standing queue
+_BACKOFF = 0.75
+
+
+class AdmissionController:
+    """In-flight accounting and the shed decision for the two lanes.
+
+    `max_in_flight` caps anonymous requests and `trusted_max_in_flight`
+    trusted ones; 0 disables shedding for that lane. `target_delay` (seconds)
+    turns on the adaptive anonymous cap; 0 keeps it fixed at `max_in_flight`.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        trusted_max_in_flight: int,
+        target_delay: float = 0.0,
+        clock=time.monotonic,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.trusted_max_in_flight = trusted_max_in_flight
+        self.target_delay = target_delay
+        self.limit = max_in_flight
+        self.in_flight = 0
+        self.trusted_in_flight = 0
+        self.shed = 0
+        self.trusted_shed = 0
+        self.queue_delay = 0.0
+        self._clock = clock
+        self._interval_end = clock() + _INTERVAL
+        self._interval_min = math.inf
+
+    def try_acquire(self, trusted: bool) -> bool:
+        """Admit a request into its lane, or count it as shed and return False."""
+        if trusted:
+            if self.trusted_max_in_flight and self.trusted_in_flight >= self.trusted_max_in_flight:
+                self.trusted_shed += 1
+                return False
+            self.trusted_in_flight += 1
+            return True
+        if self.max_in_flight and self.in_flight >= self.limit:
+            self.shed += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, trusted: bool, latency: float | None) -> None:
+        """Return an admitted request's slot; `latency` is its time to response headers."""
+        if trusted:
+            self.trusted_in_flight -= 1
+        else:
+            self.in_flight -= 1
+        if latency is None:
+            return
+        if latency < self._interval_min:
+            self._interval_min = latency
+        now = self._clock()
+        if now < self._interval_end:
+            return
+        self.queue_delay = self._interval_min
+        if self.target_delay and self.max_in_flight:
+            if self._interval_min > self.target_delay:
+                self.limit = max(1, int(self.limit * _BACKOFF))
+            elif self.limit < self.max_in_flight:
+                self.limit += 1
+        self._interval_end = now + _INTERVAL
+        self._interval_min = math.inf
+
+    def stats(self) -> dict[str, int | float]:
+        """Current in-flight counts and cap, shed counters since startup, and queue delay."""
+        return {
+            "in_flight": self.in_flight,
+            "trusted_in_flight": self.trusted_in_flight,
+            "limit": self.limit,
+            "max_in_flight": self.max_in_flight,
+            "shed": self.shed,
+            "trusted_shed": self.trusted_shed,
+            "queue_delay_ms": round(self.queue_delay * 1000, 3),
+        }
+
+
+_controller = AdmissionController(
+    settings.admission_max_in_flight,
+    settings.admission_trusted_max_in_flight,
+    settings.admission_target_delay_ms / 1000,
+)
+
+
+def get_admission_stats() -> dict[str, int | float]:
+    """Admission counters of this worker, for /health."""
+    return _controller.stats()
+
+
+class AdmissionMiddleware:
+    """Shed /lookup and /pattern requests over this worker's in-flight cap with a 503.
+
+    Must sit inside AuthMiddleware, which decides whether a request is
+    trusted. Other paths pass straight through and are not counted.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in GUARDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        controller = _controller
+        trusted = bool(scope.get("state", {}).get("trusted", False))
+        if not controller.try_acquire(trusted):
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded. Try again later."},
+                headers={"Retry-After": str(settings.admission_retry_after_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        latency: float | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal latency
+            if message["type"] == "http.response.start":
+                latency = time.monotonic() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            controller.release(trusted, latency)
@@ -5,12 +5,13 @@ See docs/superpowers/specs/2026-04-29-auth-token-bypass-design.md for the design
 
 import contextvars
 import hashlib
-import hmac
+import time
+from typing import NamedTuple
 
 from fastapi import HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.config import settings
 
@@ -18,6 +19,9 @@ from app.config import settings
 # Empty until the first refresh succeeds; merged into the active set via _get_trusted_tokens.
 _db_tokens: frozenset[str] = frozenset()
 _token_db_stale: bool = False
+# DB clock at the last successful refresh (None → next refresh is a full sync)
+_db_tokens_since: str | None = None
+_last_full_sync: float = 0.0
 
 
 def token_id(token: str) -> str:
@@ -41,25 +45,57 @@ def extract_bearer(request: Request) -> str | None:
 
 
 def _get_trusted_tokens() -> frozenset[str]:
-    """Indirection seam for tests; returns the union of DB-loaded and env-var tokens."""
+    """Union of DB-loaded and env-var tokens; read when the verification map is rebuilt."""
     return _db_tokens | settings.trusted_tokens
 
 
-def is_trusted(candidate: str) -> bool:
-    """Constant-time membership test against the configured trusted tokens.
+class _TrustedTokens(NamedTuple):
+    """Verification map for one trusted token set. Swapped in whole, never mutated.
 
-    Uses hmac.compare_digest in a loop. Returns False for empty input or when
-    no tokens are configured.
+    Keyed by sha256(token), so checking a candidate is one hash and one dict
+    probe however many tokens there are. The probe only compares digests of
+    the candidate, which leak nothing usable about a token, so it stays
+    timing-safe without a compare_digest loop over every token.
     """
+
+    tokens: frozenset[str]
+    ids: dict[bytes, str]  # sha256(token) -> token_id(token)
+
+
+def _build_trusted(tokens: frozenset[str]) -> _TrustedTokens:
+    ids = {hashlib.sha256(token.encode()).digest(): token_id(token) for token in tokens}
+    return _TrustedTokens(tokens, ids)
+
+
+# Env-var tokens until the first token DB refresh merges in the DB-backed ones
+_trusted = _build_trusted(settings.trusted_tokens)
+
+
+def _rebuild_trusted() -> None:
+    """Swap in a verification map for the current DB and env-var tokens."""
+    global _trusted
+    _trusted = _build_trusted(_get_trusted_tokens())
+
+
+def verify_token(candidate: str) -> str | None:
+    """Return the token id of a trusted token, or None for an unknown or empty one."""
     if not candidate:
-        return False
-    return any(hmac.compare_digest(candidate, t) for t in _get_trusted_tokens())
+        return None
+    return _trusted.ids.get(hashlib.sha256(candidate.encode()).digest())
+
+
+def is_trusted(candidate: str) -> bool:
+    """Timing-safe membership test against the configured trusted tokens.
+
+    Returns False for empty input or when no tokens are configured.
+    """
+    return verify_token(candidate) is not None
 
 
 _request_var: contextvars.ContextVar[Request | None] = contextvars.ContextVar("pc2nuts_request", default=None)
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
+class AuthMiddleware:
     """Validate Authorization header up-front.
 
     - No header → request.state.trusted = False, normal flow.
@@ -76,40 +112,60 @@ class AuthMiddleware(BaseHTTPMiddleware):
 
     Also stores the Request in a ContextVar so the parameterless slowapi
     exempt_when callable can read it (slowapi calls exempt_when()).
+
+    Written as plain ASGI rather than BaseHTTPMiddleware: the downstream app
+    is awaited directly with the original receive/send, so a request costs no
+    extra task, memory stream or response wrapper.
     """
 
     EXEMPT_PATHS = frozenset({"/health"})
 
-    async def dispatch(self, request: Request, call_next):
-        if request.url.path in self.EXEMPT_PATHS:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # request.state is backed by scope["state"], so downstream Requests
+        # (route handlers, the access log) see the same attributes.
+        request = Request(scope)
+        if scope["path"] in self.EXEMPT_PATHS:
             request.state.trusted = False
             request.state.token_id = None
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         # Bypass disabled (no tokens configured) → ignore Authorization header
         # entirely; behaviour identical to pre-feature (per-IP rate limit only).
-        if not _get_trusted_tokens():
+        if not _trusted.ids:
             request.state.trusted = False
             request.state.token_id = None
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         try:
             token = extract_bearer(request)
         except HTTPException as exc:
-            return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+            await response(scope, receive, send)
+            return
 
         if token is not None:
-            if not is_trusted(token):
-                return JSONResponse({"detail": "invalid token"}, status_code=401)
+            tid = verify_token(token)
+            if tid is None:
+                await JSONResponse({"detail": "invalid token"}, status_code=401)(scope, receive, send)
+                return
             request.state.trusted = True
-            request.state.token_id = token_id(token)
+            request.state.token_id = tid
         else:
             request.state.trusted = False
             request.state.token_id = None
 
         ctx_token = _request_var.set(request)
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send)
         finally:
             _request_var.reset(ctx_token)
 
@@ -128,21 +184,41 @@ def is_trusted_request() -> bool:
 
 
 def refresh_db_tokens(db) -> None:
-    """Reload the active token set from the DB.
+    """Bring the DB token set up to date.
+
+    The first refresh, and then one every PC2NUTS_TOKEN_FULL_RESYNC_SECONDS,
+    is a full sync of every active row; this also drops rows deleted outright.
+    In between, only rows created or revoked since the previous refresh are
+    fetched and applied to the current set.
 
-    On success: replace _db_tokens with the new frozenset, clear the stale flag.
-    On failure: keep _db_tokens unchanged, set _token_db_stale = True.
+    On success: replace _db_tokens if it changed and swap in a rebuilt
+    verification map, clear the stale flag.
+    On failure: keep _db_tokens unchanged, set _token_db_stale = True; the next
+    refresh fetches the missed changes.
 
-    `db` is duck-typed: must expose .list_active() returning rows with a 'value' key.
+    `db` is duck-typed: must expose .sync_rows(since) returning the DB clock and
+    rows with 'value' and 'revoked_at' keys.
     """
-    global _db_tokens, _token_db_stale
+    global _db_tokens, _token_db_stale, _db_tokens_since, _last_full_sync
+    now = time.monotonic()
+    full = _db_tokens_since is None or now - _last_full_sync >= settings.token_full_resync_seconds
     try:
-        rows = db.list_active()
+        clock, rows = db.sync_rows(None if full else _db_tokens_since)
     except Exception as exc:  # noqa: BLE001 — caller passes a duck-typed client
         import logging
 
         logging.getLogger(__name__).warning("token DB refresh failed: %s", exc)
         _token_db_stale = True
         return
-    _db_tokens = frozenset(r["value"] for r in rows if r.get("value"))
+    if full:
+        tokens = frozenset(r["value"] for r in rows if r.get("value"))
+        _last_full_sync = now
+    else:
+        revoked = {r["value"] for r in rows if r.get("value") and r.get("revoked_at")}
+        added = {r["value"] for r in rows if r.get("value") and not r.get("revoked_at")}
+        tokens = (_db_tokens - revoked) | added
+    if tokens != _db_tokens:
+        _db_tokens = tokens
+        _rebuild_trusted()
+    _db_tokens_since = clock
     _token_db_stale = False
@@ -1,6 +1,7 @@
 import json
 import re
 from pathlib import Path
+from typing import Literal
 
 from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
@@ -16,25 +17,45 @@ class Settings(BaseSettings):
     tercet_base_url: str = _defaults["tercet_base_url"]
     data_dir: str = "./data"
     db_cache_ttl_days: int = 30
+    snapshot_enabled: bool = True
+    gc_freeze: bool = True
+    data_reload_interval_seconds: int = Field(default=3600, ge=0)
     estimates_csv: str = "./tercet_missing_codes.csv"
     extra_sources: str = ""
     trusted_tokens_raw: str = Field(default="", validation_alias="PC2NUTS_TRUSTED_TOKENS")
     token_db_url: str = ""
     token_db_auth_token: str = ""
     token_refresh_seconds: int = Field(default=60, ge=1)
+    token_full_resync_seconds: int = Field(default=3600, ge=1)
     rate_limit: str = _defaults.get("rate_limit", "120/minute")
     rate_limit_headers: bool = _defaults.get("rate_limit_headers", True)
     workers: int = Field(default=_defaults.get("workers", 1), ge=1)
     rate_limit_storage_uri: str | None = _defaults.get("rate_limit_storage_uri", None)
     estimates_refresh_url: str = ""
     estimates_refresh_interval_seconds: int = Field(default=86400, ge=0)
+    estimates_follow_seconds: int = Field(default=5, ge=1)
+    estimates_refresh_max_mb: int = Field(default=64, ge=1)
     cache_max_age: int = _defaults.get("cache_max_age", 3600)
+    batch_max_size: int = Field(default=10000, ge=1)
+    batch_max_bytes: int = Field(default=2 * 1024 * 1024, ge=1)
+    lookup_cache_size: int = Field(default=10000, ge=0)
+    lookup_cache_ttl_seconds: int = Field(default=3600, ge=0)
+    admission_max_in_flight: int = Field(default=0, ge=0)
+    admission_trusted_max_in_flight: int = Field(default=0, ge=0)
+    admission_target_delay_ms: int = Field(default=0, ge=0)
+    admission_retry_after_seconds: int = Field(default=1, ge=1)
+    metrics_flush_seconds: int = Field(default=5, ge=1)
     startup_timeout: int = 300
+    download_concurrency: int = Field(default=8, ge=1)
     docs_enabled: bool = True
     cors_origins: str = "*"
     access_log_file: str = ""
     access_log_max_mb: int = 10
     access_log_backup_count: int = 5
+    access_log_format: Literal["text", "json"] = "text"
+    access_log_queue_size: int = Field(default=10000, ge=1)
+    access_log_queue_policy: Literal["drop", "block"] = "drop"
+    access_log_queue_block_ms: int = Field(default=50, ge=1)
 
     # Countries with TERCET flat files available
     countries: list[str] = _defaults["countries"]
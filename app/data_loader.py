@@ -1,37 +1,93 @@
 """Download and parse TERCET flat files into an in-memory lookup table."""
 
+import codecs
 import csv
 import hashlib
 import io
+import itertools
+import json
 import logging
 import re
 import sqlite3
+import sys
 import threading
 import time
 import zipfile
-from collections import Counter
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
+from types import MappingProxyType
+from typing import NamedTuple
 
 import httpx
 
+from app import gc_stats, metrics, snapshot
 from app.config import settings
+from app.lookup_cache import MISSING, LookupCache
+from app.lookup_store import LookupStore, _PrefixTable
 
 _NUTS3_RE = re.compile(r"^[A-Z]{2}[A-Z0-9]{1,3}$")
+_NON_ALNUM_RE = re.compile(r"[^A-Za-z0-9]")
 
-_MAX_UNCOMPRESSED_SIZE = 100 * 1024 * 1024  # 100 MB
+# ZIP members are streamed, so this only guards against decompression bombs
+_MAX_UNCOMPRESSED_SIZE = 4 * 1024 * 1024 * 1024  # 4 GB
+_SAMPLE_BYTES = 64 * 1024  # head of each member used to detect encoding and dialect
+_DOWNLOAD_CHUNK = 1024 * 1024
+# Staged rows are folded into the packed store once they reach this many and
+# outnumber the rows already packed
+_COMPACT_MIN_ROWS = 1_000_000
 
 logger = logging.getLogger(__name__)
 
-# postal_code -> NUTS3 code, keyed by (country_code, normalized_postal_code)
-_lookup: dict[tuple[str, str], str] = {}
+# The module-level tables below are the *working set* a load builds into.
+# Requests never read them directly: load_data() starts every build on fresh,
+# empty tables (see _begin_build()) and, once everything is loaded and indexed,
+# _publish() swaps them in as the live _Generation in a single assignment.
+
+# postal_code -> NUTS3 code, keyed by (country_code, normalized_postal_code).
+# Packed per-country columns; loaders write through a staging dict and
+# load_data() compacts it before building the derived indexes.
+_lookup: LookupStore = LookupStore()
 
 # Pre-computed estimates keyed by (country_code, postal_code)
 _estimates: dict[tuple[str, str], dict] = {}
 
-# Prefix index: country_code -> prefix -> list of nuts3 codes
-_prefix_index: dict[str, dict[str, list[str]]] = {}
+
+class _PrefixVotes(NamedTuple):
+    """Majority-vote summary of every TERCET code sharing one prefix.
+
+    Winners break ties the way Counter.most_common(1) does over the codes in
+    load order (first-seen wins), so Tier 3 results match a live vote. The
+    votes are counted over _lookup.ordered_items(), which replays the packed
+    rows in the order they were loaded rather than in postal-code order.
+    """
+
+    total: int
+    nuts1: str
+    nuts1_count: int
+    nuts2: str
+    nuts2_count: int
+    nuts3: str
+    nuts3_count: int
+
+
+# NUTS code registry for the integer-encoded tables: id -> code. Rebuilt with
+# the prefix index, so ids are only meaningful within one generation.
+_nuts_codes: tuple[str, ...] = ()
+
+# A _PrefixVotes packed into one int: four 32-bit counts, then three 16-bit
+# registry ids. One untracked int per prefix instead of a tuple plus up to
+# four int objects keeps the index small and out of the cyclic GC's way.
+_COUNT_MASK = 0xFFFFFFFF
+_ID_MASK = 0xFFFF
+
+# Prefix index: country_code -> prefix -> packed vote summary over the codes
+# sharing it (see _pack_votes / _unpack_votes), as flat columns that a
+# snapshot can map (see _PrefixTable)
+_prefix_index: dict[str, _PrefixTable] = {}
 
 # Countries with a single NUTS3 region: country_code -> nuts3 code
 _single_nuts3: dict[str, str] = {}
@@ -43,6 +99,71 @@ _country_fallback: dict[str, dict] = {}
 # NUTS region names: nuts_id -> name_latn
 _nuts_names: dict[str, str] = {}
 
+
+class _CountryRegistry(NamedTuple):
+    """Per-country summary of the loaded data, rebuilt by _build_prefix_index()."""
+
+    counts: dict[str, int]  # country_code -> number of TERCET entries
+    loaded: frozenset[str]  # countries with TERCET data or a single-NUTS3 fallback
+    available: str  # sorted, comma-separated `loaded` for the /lookup 400 message
+
+
+# Replaced wholesale (never mutated) so readers always see a consistent registry
+_countries = _CountryRegistry({}, frozenset(), "")
+
+
+class _Nuts3Record(NamedTuple):
+    """One NUTS3 region with its parent codes and all three names resolved.
+
+    Built once per generation for every NUTS3 code the data can return.
+    `exact` and `single` are the complete lookup() results for a Tier 1 hit
+    and a Tier 5 single-NUTS3 fallback on the region, shared by every postal
+    code that maps to it; the other tiers copy the names and add their own
+    confidences (see _tier_result).
+    """
+
+    nuts1: str
+    nuts1_name: str | None
+    nuts2: str
+    nuts2_name: str | None
+    nuts3: str
+    nuts3_name: str | None
+    exact: Mapping[str, object]
+    single: Mapping[str, object]
+
+
+def _nuts3_record(nuts3: str, names: dict[str, str]) -> _Nuts3Record:
+    n1, n2 = nuts3[:3], nuts3[:4]
+    n1_name, n2_name, n3_name = names.get(n1), names.get(n2), names.get(nuts3)
+
+    def result(match_type: str) -> Mapping[str, object]:
+        return MappingProxyType(
+            {
+                "match_type": match_type,
+                "nuts1": n1,
+                "nuts1_confidence": 1.0,
+                "nuts2": n2,
+                "nuts2_confidence": 1.0,
+                "nuts3": nuts3,
+                "nuts3_confidence": 1.0,
+                "nuts1_name": n1_name,
+                "nuts2_name": n2_name,
+                "nuts3_name": n3_name,
+            }
+        )
+
+    return _Nuts3Record(n1, n1_name, n2, n2_name, nuts3, n3_name, result("exact"), result("estimated"))
+
+
+def _build_nuts3_records() -> dict[str, _Nuts3Record]:
+    """Records for every NUTS3 code in the working lookup table, estimates and fallbacks."""
+    codes = _lookup.nuts3_codes()
+    codes.update(est["nuts3"] for est in _estimates.values())
+    codes.update(_single_nuts3.values())
+    codes.update(fb["nuts3"] for fb in _country_fallback.values())
+    return {code: _nuts3_record(code, _nuts_names) for code in codes}
+
+
 # Staleness tracking
 _data_stale: bool = False
 _data_loaded_at: str = ""
@@ -50,9 +171,73 @@ _data_loaded_at: str = ""
 # Extra source tracking
 _extra_source_count: int = 0
 
-# Protects against concurrent reload
+# Per-country timings of the last TERCET download (empty after a cache load):
+# country_code -> files, entries, fetch_s, ingest_s
+_load_timings: dict[str, dict[str, float]] = {}
+
+
+class _Generation(NamedTuple):
+    """One complete set of loaded data, as served to requests.
+
+    Built off to the side by load_data() and published by rebinding _gen, so a
+    request that reads _gen once sees a single consistent generation however
+    long it runs and whatever reload happens meanwhile.
+    """
+
+    id: int  # increments on every publish
+    lookup: LookupStore
+    estimates: dict[tuple[str, str], dict]
+    prefix_index: dict[str, _PrefixTable]
+    nuts_codes: tuple[str, ...]
+    single_nuts3: dict[str, str]
+    country_fallback: dict[str, dict]
+    nuts_names: dict[str, str]
+    countries: _CountryRegistry
+    nuts3_records: dict[str, _Nuts3Record]
+    stale: bool
+    loaded_at: str  # when the TERCET data itself was fetched (cache created_at)
+    extra_source_count: int
+    load_timings: dict[str, dict[str, float]]
+    built_at: str  # when this generation was published
+    build_timings: dict[str, float]  # phase -> seconds, see load_data()
+    remote_estimates: bool  # estimates replaced by app.estimates_refresh since publish
+
+
+def _working_generation(gen_id: int, build_timings: dict[str, float], remote_estimates: bool) -> _Generation:
+    return _Generation(
+        gen_id,
+        _lookup,
+        _estimates,
+        _prefix_index,
+        _nuts_codes,
+        _single_nuts3,
+        _country_fallback,
+        _nuts_names,
+        _countries,
+        _build_nuts3_records(),
+        _data_stale,
+        _data_loaded_at,
+        _extra_source_count,
+        _load_timings,
+        datetime.now(timezone.utc).isoformat(),
+        build_timings,
+        remote_estimates,
+    )
+
+
+# The live generation; replaced wholesale, never mutated
+_gen = _working_generation(0, {}, False)
+
+# Results of lookup() against _gen; rebound to every generation as it is published
+_lookup_cache = LookupCache(settings.lookup_cache_size, settings.lookup_cache_ttl_seconds)
+_lookup_cache.bind(_gen)
+
+# Guards publishing _gen and swapping estimates into it; only ever held briefly
 _data_lock = threading.Lock()
 
+# Serialises load_data() builds, which can take minutes
+_reload_lock = threading.Lock()
+
 
 def normalize_postal_code(code: str) -> str:
     """Normalize a postal code by removing spaces, dashes, and uppercasing.
@@ -60,7 +245,7 @@ def normalize_postal_code(code: str) -> str:
     European postal codes use varied formats (PL: 00-950, SE: 111 22, UK: SW1A 1AA).
     Stripping all non-alphanumeric characters ensures consistent matching.
     """
-    return re.sub(r"[^A-Za-z0-9]", "", code.strip()).upper()
+    return _NON_ALNUM_RE.sub("", code.strip()).upper()
 
 
 def normalize_country(country_code: str) -> str:
@@ -69,33 +254,52 @@ def normalize_country(country_code: str) -> str:
     return "EL" if cc == "GR" else cc
 
 
-def get_lookup_table() -> dict[tuple[str, str], str]:
-    return _lookup
+def get_generation() -> _Generation:
+    """Return the live data generation (read it once per request for a consistent view)."""
+    return _gen
+
+
+def get_lookup_table() -> LookupStore:
+    return _gen.lookup
 
 
 def get_estimates_table() -> dict[tuple[str, str], dict]:
-    return _estimates
+    return _gen.estimates
 
 
-def get_loaded_countries() -> set[str]:
+def get_loaded_countries() -> frozenset[str]:
     """Return the set of country codes that have data loaded."""
-    return {cc for cc, _ in _lookup} | set(_single_nuts3.keys())
+    return _gen.countries.loaded
+
+
+def get_country_counts() -> dict[str, int]:
+    """Return the number of TERCET entries per country code."""
+    return _gen.countries.counts
+
+
+def get_available_countries() -> str:
+    """Sorted comma-separated list of country codes with loaded data."""
+    return _gen.countries.available
 
 
 def get_data_stale() -> bool:
-    return _data_stale
+    return _gen.stale
 
 
 def get_data_loaded_at() -> str:
-    return _data_loaded_at
+    return _gen.loaded_at
 
 
 def get_extra_source_count() -> int:
-    return _extra_source_count
+    return _gen.extra_source_count
+
+
+def get_load_timings() -> dict[str, dict[str, float]]:
+    return _gen.load_timings
 
 
 def get_nuts_names() -> dict[str, str]:
-    return _nuts_names
+    return _gen.nuts_names
 
 
 def _infer_country_from_url(url: str) -> str:
@@ -167,16 +371,21 @@ def _db_connection(path: Path, *, readonly: bool = True):
         con.close()
 
 
-def _read_db_created_at(db: Path) -> str:
-    """Read the created_at timestamp from the DB metadata table."""
+def _read_db_metadata(db: Path, key: str) -> str:
+    """Read one value from the DB metadata table; empty if it is missing."""
     try:
         with _db_connection(db) as con:
-            row = con.execute("SELECT value FROM metadata WHERE key = 'created_at'").fetchone()
+            row = con.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
         return row[0] if row else ""
     except sqlite3.Error:
         return ""
 
 
+def _read_db_created_at(db: Path) -> str:
+    """Read the created_at timestamp from the DB metadata table."""
+    return _read_db_metadata(db, "created_at")
+
+
 def _discover_zip_urls(client: httpx.Client, base_url: str) -> list[str]:
     """Try to discover ZIP file URLs from the TERCET directory listing."""
     urls: list[str] = []
@@ -212,20 +421,39 @@ def _sniff_dialect(text: str) -> csv.Dialect | None:
         return None
 
 
-def _parse_csv_content(text: str, country_code: str, *, overwrite: bool = False) -> int:
-    """Parse CSV/TSV content and populate the lookup table. Returns row count."""
-    count = 0
-    skipped = 0
+def _detect_encoding(head: bytes) -> str:
+    """Pick the first of utf-8-sig/utf-8/latin-1 that decodes a file's head sample.
 
-    dialect = _sniff_dialect(text)
+    The sample may end mid-character, so it is decoded incrementally.
+    """
+    for enc in ("utf-8-sig", "utf-8"):
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    # latin-1 always succeeds
+    return "latin-1"
+
+
+def _iter_csv_rows(lines: Iterable[str], country_code: str) -> Iterator[tuple[str, str, str]]:
+    """Parse CSV/TSV lines into (country_code, postal_code, nuts3) rows in file order.
+
+    Only the first few lines are buffered (for dialect sniffing), so `lines`
+    can be a stream of any size. Touches no shared state.
+    """
+    lines = iter(lines)
+    head = list(itertools.islice(lines, 10))
+    dialect = _sniff_dialect("".join(head))
     if dialect is not None:
-        reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+        reader = csv.reader(itertools.chain(head, lines), dialect=dialect)
     else:
         # Fallback heuristic for delimiter only
-        first_line = text.split("\n", 1)[0]
+        first_line = head[0] if head else ""
         delimiter = "\t" if "\t" in first_line else ";" if ";" in first_line else ","
-        reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
-    fieldnames = [f.strip().upper() for f in (reader.fieldnames or [])]
+        reader = csv.reader(itertools.chain(head, lines), delimiter=delimiter)
+    header = next(reader, [])
+    fieldnames = [f.strip().upper() for f in header]
 
     # Find the postal code column
     pc_col = None
@@ -247,7 +475,7 @@ def _parse_csv_content(text: str, country_code: str, *, overwrite: bool = False)
             country_code,
             fieldnames,
         )
-        return 0
+        return
 
     # Detect optional COUNTRY_CODE column
     cc_col = None
@@ -256,19 +484,20 @@ def _parse_csv_content(text: str, country_code: str, *, overwrite: bool = False)
             cc_col = candidate
             break
 
-    # Map back to original-case field names from DictReader
-    orig_fields = list(reader.fieldnames or [])
-    pc_orig = orig_fields[fieldnames.index(pc_col)]
-    nuts3_orig = orig_fields[fieldnames.index(nuts3_col)]
-    cc_orig = orig_fields[fieldnames.index(cc_col)] if cc_col else None
+    pc_idx = fieldnames.index(pc_col)
+    nuts3_idx = fieldnames.index(nuts3_col)
+    cc_idx = fieldnames.index(cc_col) if cc_col else None
 
     if not country_code and cc_col is None:
         logger.warning("No country code available (not in URL or CSV columns), skipping file")
-        return 0
+        return
 
+    default_cc = country_code.upper()
+    skipped = 0
     for row in reader:
-        pc = row.get(pc_orig, "")
-        nuts3 = row.get(nuts3_orig, "").strip()
+        width = len(row)
+        pc = row[pc_idx] if pc_idx < width else ""
+        nuts3 = row[nuts3_idx].strip() if nuts3_idx < width else ""
         if not pc or not nuts3:
             continue
         # Validate NUTS3 code format
@@ -276,47 +505,137 @@ def _parse_csv_content(text: str, country_code: str, *, overwrite: bool = False)
             skipped += 1
             continue
         # Resolve country code: per-row CSV column takes priority, then function param
-        row_cc = row.get(cc_orig, "").strip().upper() if cc_orig else ""
-        cc = row_cc if row_cc else country_code.upper()
-        key = (cc, normalize_postal_code(pc))
+        row_cc = row[cc_idx].strip().upper() if cc_idx is not None and cc_idx < width else ""
+        yield (row_cc or default_cc, normalize_postal_code(pc), nuts3)
+
+    if skipped:
+        logger.warning("Skipped %d rows with invalid NUTS3 codes for %s", skipped, country_code)
+
+
+def _merge_rows(rows: Iterable[tuple[str, str, str]], *, overwrite: bool = False) -> int:
+    """Write parsed rows into the lookup table. Returns the number of new keys.
+
+    Staged writes are compacted whenever they outnumber the packed rows (and
+    at least _COMPACT_MIN_ROWS), so a large source never sits in the staging
+    dict all at once while the rebuild cost stays linear overall.
+    """
+    count = 0
+    staged = 0
+    for cc, pc, nuts3 in rows:
+        key = (cc, pc)
         if overwrite:
             # Last-write-wins: extra sources overwrite TERCET data
-            is_new = key not in _lookup
+            before = len(_lookup)
             _lookup[key] = nuts3
-            if is_new:
-                count += 1
-        else:
+            count += len(_lookup) - before
+        elif _lookup.add(key, nuts3):
             # First-write-wins: discovery-phase data takes priority
-            if key not in _lookup:
-                _lookup[key] = nuts3
-                count += 1
-
-    if skipped:
-        logger.warning("Skipped %d rows with invalid NUTS3 codes for %s", skipped, country_code)
+            count += 1
+        else:
+            continue
+        staged += 1
+        if staged >= _COMPACT_MIN_ROWS and staged >= len(_lookup) - staged:
+            _lookup.compact()
+            staged = 0
     return count
 
 
-def _download_zip(client: httpx.Client, url: str) -> bytes | None:
-    """Download a ZIP with one retry on transient network errors.
+def _download_zip(client: httpx.Client, url: str, dest: Path, *, deadline: float = 0) -> bool:
+    """Stream a ZIP to `dest` with one retry on transient network errors.
 
-    Returns raw bytes on success, None on failure or 404.
+    The body goes to a temporary file renamed into place on success, so the
+    archive is never held in memory. Returns False on failure or 404. With a
+    deadline, the request timeout shrinks so a slow mirror cannot run far past it.
     """
+    part = dest.with_name(dest.name + ".part")
     for attempt in range(2):
+        timeout = 60.0
+        if deadline:
+            timeout = min(timeout, max(deadline - time.monotonic(), 1.0))
         try:
-            resp = client.get(url, timeout=60, follow_redirects=True)
-            if resp.status_code == 404:
-                return None
-            resp.raise_for_status()
-            return resp.content
+            with client.stream("GET", url, timeout=timeout, follow_redirects=True) as resp:
+                if resp.status_code == 404:
+                    return False
+                resp.raise_for_status()
+                with open(part, "wb") as f:
+                    for chunk in resp.iter_bytes(_DOWNLOAD_CHUNK):
+                        f.write(chunk)
+            part.replace(dest)
+            return True
         except httpx.HTTPStatusError:
-            return None
+            return False
         except httpx.RequestError as exc:
             if attempt == 0:
                 logger.debug("Transient error downloading %s, retrying: %s", url, exc)
                 time.sleep(2)
             else:
                 logger.warning("Failed to download %s after 2 attempts: %s", url, exc)
-    return None
+        except OSError as exc:
+            logger.error("Failed to write %s: %s", part, exc)
+            break
+        finally:
+            part.unlink(missing_ok=True)
+    return False
+
+
+def _fetch_zip(client: httpx.Client, url: str, cache_dir: Path, *, deadline: float = 0) -> Path | None:
+    """Return the cached ZIP for `url`, downloading it first unless a fresh valid copy exists."""
+    filename = url.rsplit("/", 1)[-1]
+    cached = cache_dir / filename
+
+    if cached.exists():
+        # Check cache TTL — re-download if older than 30 days
+        age = time.time() - cached.stat().st_mtime
+        if age > settings.db_cache_ttl_days * 86400:
+            logger.info("Cache expired for %s (%.0f days old), re-downloading", cached.name, age / 86400)
+            cached.unlink()
+        # Validate cached file is a real ZIP
+        elif not zipfile.is_zipfile(cached):
+            logger.warning("Corrupt cached file %s, deleting and re-downloading", cached.name)
+            cached.unlink()
+        else:
+            logger.info("Using cached file %s", cached)
+            return cached
+
+    logger.info("Downloading %s", url)
+    if not _download_zip(client, url, cached, deadline=deadline):
+        return None
+    # Validate before keeping it in the cache
+    if not zipfile.is_zipfile(cached):
+        logger.warning("Downloaded file from %s is not a valid ZIP, skipping", url)
+        cached.unlink(missing_ok=True)
+        return None
+    return cached
+
+
+def _iter_zip_rows(path: Path, url: str, country_code: str) -> Iterator[tuple[str, str, str]]:
+    """Stream rows out of every CSV/TSV member of a ZIP, in member order.
+
+    Each member is decompressed and decoded incrementally; the encoding is
+    picked from a head sample, so no member is ever held in memory whole.
+    """
+    try:
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                name = info.filename
+                if not name.lower().endswith((".csv", ".tsv", ".txt")):
+                    continue
+                if info.file_size > _MAX_UNCOMPRESSED_SIZE:
+                    logger.warning(
+                        "Skipping %s in %s: uncompressed size %d bytes exceeds limit",
+                        name,
+                        url,
+                        info.file_size,
+                    )
+                    continue
+                with io.BufferedReader(zf.open(info), _SAMPLE_BYTES) as raw:
+                    encoding = _detect_encoding(raw.peek(_SAMPLE_BYTES))
+                    # Postal and NUTS codes are ASCII; a stray byte further down that
+                    # the sample missed can only be in a column we don't read
+                    text = io.TextIOWrapper(raw, encoding=encoding, errors="replace", newline="")
+                    yield from _iter_csv_rows(text, country_code)
+    except zipfile.BadZipFile:
+        logger.warning("Bad ZIP file from %s", url)
 
 
 def _download_and_parse_zip(
@@ -332,67 +651,80 @@ def _download_and_parse_zip(
     if deadline and time.monotonic() > deadline:
         logger.warning("Startup timeout reached, skipping download of %s", url)
         return 0
-    filename = url.rsplit("/", 1)[-1]
-    cached = cache_dir / filename
+    path = _fetch_zip(client, url, cache_dir, deadline=deadline)
+    if path is None:
+        return 0
+    total = _merge_rows(_iter_zip_rows(path, url, country_code), overwrite=overwrite)
+    # Pack this file's rows now so the staging dict never holds more than one ZIP
+    _lookup.compact()
+    return total
 
-    content: bytes | None = None
 
-    if cached.exists():
-        # Check cache TTL — re-download if older than 30 days
-        age = time.time() - cached.stat().st_mtime
-        if age > settings.db_cache_ttl_days * 86400:
-            logger.info("Cache expired for %s (%.0f days old), re-downloading", cached.name, age / 86400)
-            cached.unlink()
-        else:
-            content = cached.read_bytes()
-            # Validate cached file is a real ZIP
-            if not zipfile.is_zipfile(io.BytesIO(content)):
-                logger.warning("Corrupt cached file %s, deleting and re-downloading", cached.name)
-                cached.unlink()
-                content = None
-            else:
-                logger.info("Using cached file %s", cached)
-
-    if content is None:
-        logger.info("Downloading %s", url)
-        content = _download_zip(client, url)
-        if content is None:
-            return 0
-        # Validate before caching
-        if not zipfile.is_zipfile(io.BytesIO(content)):
-            logger.warning("Downloaded file from %s is not a valid ZIP, skipping", url)
-            return 0
-        try:
-            cached.write_bytes(content)
-        except OSError as exc:
-            logger.error("Failed to cache %s: %s", cached, exc)
+class _FetchedZip(NamedTuple):
+    """One TERCET ZIP in the local cache, fetched by a download worker but not yet ingested."""
 
-    total = 0
+    url: str
+    path: Path
+    fetch_seconds: float
+
+
+def _fetch_for_ingest(
+    client: httpx.Client, url: str, cache_dir: Path, *, deadline: float = 0
+) -> _FetchedZip | None:
+    """Download-worker body: bring one ZIP into the cache without touching _lookup.
+
+    Returns None if the deadline has passed or the file is unavailable.
+    """
+    if deadline and time.monotonic() > deadline:
+        return None
+    start = time.monotonic()
+    path = _fetch_zip(client, url, cache_dir, deadline=deadline)
+    if path is None:
+        return None
+    return _FetchedZip(url, path, time.monotonic() - start)
+
+
+def _fetch_first_guess(
+    client: httpx.Client, country_code: str, cache_dir: Path, *, deadline: float = 0, start: int = 0
+) -> tuple[int, _FetchedZip | None]:
+    """Walk the guessed URLs for one country from index `start`, most likely first.
+
+    Returns (index, zip) for the first candidate that exists, or (index, None)
+    once the candidates or the deadline run out.
+    """
+    candidates = list(_guess_zip_urls_for_country(settings.tercet_base_url, country_code))
+    for i in range(start, len(candidates)):
+        result = _fetch_for_ingest(client, candidates[i], cache_dir, deadline=deadline)
+        if result is not None:
+            return i, result
+    return len(candidates), None
+
+
+_END = object()
+
+
+def _ordered_results(pool: ThreadPoolExecutor, fn, items, window: int):
+    """Yield (item, fn(item)) in input order while the pool runs up to `window` items ahead.
+
+    Keeps the merge deterministic however the downloads finish, and bounds the
+    parsed-but-unmerged rows held in memory. Unstarted work is cancelled if
+    the consumer stops early.
+    """
+    items = iter(items)
+    pending: deque = deque()
     try:
-        with zipfile.ZipFile(io.BytesIO(content)) as zf:
-            for name in zf.namelist():
-                if name.lower().endswith((".csv", ".tsv", ".txt")):
-                    file_size = zf.getinfo(name).file_size
-                    if file_size > _MAX_UNCOMPRESSED_SIZE:
-                        logger.warning(
-                            "Skipping %s in %s: uncompressed size %d bytes exceeds limit",
-                            name,
-                            url,
-                            file_size,
-                        )
-                        continue
-                    raw = zf.read(name)
-                    # Try common encodings; latin-1 always succeeds so no else needed
-                    for enc in ("utf-8-sig", "utf-8", "latin-1"):
-                        try:
-                            text = raw.decode(enc)
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    total += _parse_csv_content(text, country_code, overwrite=overwrite)
-    except zipfile.BadZipFile:
-        logger.warning("Bad ZIP file from %s", url)
-    return total
+        for item in itertools.islice(items, window):
+            pending.append((item, pool.submit(fn, item)))
+        while pending:
+            item, future = pending.popleft()
+            result = future.result()
+            nxt = next(items, _END)
+            if nxt is not _END:
+                pending.append((nxt, pool.submit(fn, nxt)))
+            yield item, result
+    finally:
+        for _, future in pending:
+            future.cancel()
 
 
 def _db_path() -> Path:
@@ -400,8 +732,11 @@ def _db_path() -> Path:
     return Path(settings.data_dir) / f"postalcode2nuts_NUTS-{settings.nuts_version}.db"
 
 
-def _db_is_valid(db: Path) -> bool:
-    """Check if the SQLite cache DB exists, matches current version, and is fresh."""
+def _db_is_valid(db: Path, *, refetch: bool = False) -> bool:
+    """Check if the SQLite cache DB exists, matches current version, and is fresh.
+
+    With `refetch`, a DB saved from a partial (timed-out) load is rejected too.
+    """
     if not db.is_file():
         return False
     try:
@@ -419,6 +754,9 @@ def _db_is_valid(db: Path) -> bool:
         if age_days > settings.db_cache_ttl_days:
             logger.info("DB cache expired (%.0f days old), will rebuild", age_days)
             return False
+        if refetch and meta.get("stale") == "1":
+            logger.info("DB cache holds a partial load, will refetch")
+            return False
         # Check if extra sources configuration changed
         stored_hash = meta.get("extra_sources_hash", "")
         if stored_hash != _extra_sources_hash():
@@ -444,15 +782,9 @@ def _load_estimates_from_db(db: Path) -> bool:
             ).fetchall()
         if not rows:
             return False
+        shared: dict[tuple, dict] = {}
         for cc, pc, n3, n2, n1, c3, c2, c1 in rows:
-            _estimates[(cc, pc)] = {
-                "nuts3": n3,
-                "nuts2": n2,
-                "nuts1": n1,
-                "nuts3_confidence": c3,
-                "nuts2_confidence": c2,
-                "nuts1_confidence": c1,
-            }
+            _estimates[(sys.intern(cc), pc)] = _estimate_row(shared, n3, n2, n1, c3, c2, c1)
         logger.info("Loaded %d estimates from SQLite cache %s", len(rows), db.name)
         return True
     except sqlite3.Error as exc:
@@ -460,18 +792,51 @@ def _load_estimates_from_db(db: Path) -> bool:
         return False
 
 
+def _estimate_row(
+    shared: dict[tuple, dict], n3: str, n2: str, n1: str, c3: float, c2: float, c1: float
+) -> dict:
+    """Return the estimate row for these values, reusing an equal row already in `shared`.
+
+    Thousands of estimates point at the same region with the same confidence
+    label, so each distinct row is stored once. Rows are never mutated.
+    """
+    key = (n3, n2, n1, c3, c2, c1)
+    row = shared.get(key)
+    if row is None:
+        row = shared[key] = {
+            "nuts3": n3,
+            "nuts2": n2,
+            "nuts1": n1,
+            "nuts3_confidence": c3,
+            "nuts2_confidence": c2,
+            "nuts1_confidence": c1,
+        }
+    return row
+
+
 def parse_estimates_from_text(text: str) -> tuple[dict[tuple[str, str], dict], int]:
     """Parse an estimates CSV from a string into a fresh dict.
 
+    Returns (parsed_dict, skipped_count), as parse_estimates_from_lines().
+    Used by _load_estimates_from_csv (file path).
+    """
+    return parse_estimates_from_lines(io.StringIO(text.removeprefix("\ufeff")))
+
+
+def parse_estimates_from_lines(lines: Iterable[str]) -> tuple[dict[tuple[str, str], dict], int]:
+    """Parse estimates CSV lines (decoded, without a BOM) into a fresh dict.
+
     Returns (parsed_dict, skipped_count). Rows with unknown confidence labels
-    are counted in skipped_count and not included in the dict. Used both by
-    _load_estimates_from_csv (file path) and app.estimates_refresh (HTTP body).
+    are counted in skipped_count and not included in the dict. Rows are parsed
+    as `lines` yields them, so app.estimates_refresh feeds it the HTTP body
+    while it downloads, and a missing column fails on the first row.
     """
     out: dict[tuple[str, str], dict] = {}
+    shared: dict[tuple, dict] = {}
     skipped = 0
-    reader = csv.DictReader(io.StringIO(text.removeprefix("﻿")))
+    reader = csv.DictReader(lines)
     for row in reader:
-        cc = row["COUNTRY_CODE"].strip().upper()
+        cc = sys.intern(row["COUNTRY_CODE"].strip().upper())
         pc = normalize_postal_code(row["POSTAL_CODE"])
         n3 = row["ESTIMATED_NUTS3"].strip()
         n2 = row["ESTIMATED_NUTS2"].strip()
@@ -481,14 +846,7 @@ def parse_estimates_from_text(text: str) -> tuple[dict[tuple[str, str], dict], i
         if conf is None:
             skipped += 1
             continue
-        out[(cc, pc)] = {
-            "nuts3": n3,
-            "nuts2": n2,
-            "nuts1": n1,
-            "nuts3_confidence": conf["nuts3"],
-            "nuts2_confidence": conf["nuts2"],
-            "nuts1_confidence": conf["nuts1"],
-        }
+        out[(cc, pc)] = _estimate_row(shared, n3, n2, n1, conf["nuts3"], conf["nuts2"], conf["nuts1"])
     return out, skipped
 
 
@@ -510,22 +868,28 @@ def _load_estimates_from_csv(csv_path: Path) -> bool:
     return len(parsed) > 0
 
 
-def _revalidate_estimates() -> int:
+def _revalidate_estimates(
+    estimates: dict[tuple[str, str], dict] | None = None, table: LookupStore | None = None
+) -> int:
     """Remove estimates that now have exact matches and warn about inconsistencies.
 
-    Returns count removed.
+    Defaults to the working _estimates and _lookup. Returns count removed.
     """
+    if estimates is None:
+        estimates = _estimates
+    if table is None:
+        table = _lookup
     to_remove = []
     inconsistent = 0
-    for key, est in _estimates.items():
-        exact = _lookup.get(key)
+    for key, est in estimates.items():
+        exact = table.get(key)
         if exact is not None:
             to_remove.append(key)
             # Warn if the estimate pointed to a different NUTS3 than the exact match
             if est["nuts3"] != exact:
                 inconsistent += 1
     for key in to_remove:
-        del _estimates[key]
+        del estimates[key]
     if to_remove:
         logger.info("Removed %d estimates that now have exact TERCET matches", len(to_remove))
     if inconsistent:
@@ -602,39 +966,116 @@ def _load_nuts_names_from_db(db: Path) -> bool:
         return False
 
 
-def _resolve_names(nuts1: str, nuts2: str, nuts3: str) -> dict:
-    """Return a dict with nuts1_name, nuts2_name, nuts3_name from _nuts_names."""
-    return {
-        "nuts1_name": _nuts_names.get(nuts1),
-        "nuts2_name": _nuts_names.get(nuts2),
-        "nuts3_name": _nuts_names.get(nuts3),
-    }
+def _first_most_common(counts: dict[str, int]) -> tuple[str, int]:
+    """Return (key, count) of the largest count; ties go to the first-inserted key.
+
+    Same winner as Counter(counts).most_common(1)[0].
+    """
+    return max(counts.items(), key=lambda kv: kv[1])
+
+
+def _pack_votes(votes: _PrefixVotes, code_ids: dict[str, int]) -> int:
+    """Encode `votes` as one int, registering its codes in `code_ids` (code -> id)."""
+    if votes.total > _COUNT_MASK:
+        raise ValueError(f"prefix vote total {votes.total} does not fit in 32 bits")
+    ids = []
+    for code in (votes.nuts1, votes.nuts2, votes.nuts3):
+        code_id = code_ids.get(code)
+        if code_id is None:
+            if len(code_ids) > _ID_MASK:
+                raise ValueError("too many distinct NUTS codes for a 16-bit id")
+            code_id = code_ids[code] = len(code_ids)
+        ids.append(code_id)
+    return (
+        votes.total
+        | votes.nuts1_count << 32
+        | votes.nuts2_count << 64
+        | votes.nuts3_count << 96
+        | ids[0] << 128
+        | ids[1] << 144
+        | ids[2] << 160
+    )
+
+
+def _unpack_votes(packed: int, codes: tuple[str, ...]) -> tuple:
+    """Decode a _pack_votes() int against the generation's NUTS code registry.
+
+    Returns a plain tuple in _PrefixVotes field order; building the NamedTuple
+    itself would add a Python-level call to every Tier 3 lookup.
+    """
+    return (
+        packed & _COUNT_MASK,
+        codes[packed >> 128 & _ID_MASK],
+        packed >> 32 & _COUNT_MASK,
+        codes[packed >> 144 & _ID_MASK],
+        packed >> 64 & _COUNT_MASK,
+        codes[packed >> 160],
+        packed >> 96 & _COUNT_MASK,
+    )
+
+
+def _summarize_votes(nuts3_counts: dict[str, int]) -> _PrefixVotes:
+    """Collapse per-NUTS3 counts (in first-seen order) into a _PrefixVotes."""
+    nuts2_counts: dict[str, int] = {}
+    nuts1_counts: dict[str, int] = {}
+    for n3, n in nuts3_counts.items():
+        # Iterating in first-seen NUTS3 order keeps first-seen NUTS2/NUTS1 order too
+        nuts2_counts[n3[:4]] = nuts2_counts.get(n3[:4], 0) + n
+        nuts1_counts[n3[:3]] = nuts1_counts.get(n3[:3], 0) + n
+    nuts1, nuts1_count = _first_most_common(nuts1_counts)
+    nuts2, nuts2_count = _first_most_common(nuts2_counts)
+    nuts3, nuts3_count = _first_most_common(nuts3_counts)
+    return _PrefixVotes(
+        sum(nuts3_counts.values()), nuts1, nuts1_count, nuts2, nuts2_count, nuts3, nuts3_count
+    )
 
 
 def _build_prefix_index() -> None:
-    """Build a prefix index over all TERCET codes for runtime estimation."""
-    _prefix_index.clear()
-    for (cc, pc), nuts3 in _lookup.items():
-        if cc not in _prefix_index:
-            _prefix_index[cc] = {}
-        idx = _prefix_index[cc]
+    """Build a prefix index over all TERCET codes for runtime estimation.
+
+    Each prefix stores the precomputed majority vote at every NUTS level, so
+    Tier 3 is a dict read rather than a vote over every code under the prefix.
+    The same pass collects the per-country NUTS3 counts behind the single-NUTS3
+    map, the country-level fallback and the country registry.
+    The results replace the working-set globals rather than being written into
+    them, so a table already published in a generation is never touched.
+    """
+    global _prefix_index, _nuts_codes, _single_nuts3, _country_fallback
+
+    # Accumulate per-prefix NUTS3 counts, then reduce each to a fixed-size summary
+    counts: dict[str, dict[str, dict[str, int]]] = {}
+    country_nuts3: dict[str, dict[str, int]] = {}
+    for (cc, pc), nuts3 in _lookup.ordered_items():
+        if cc not in counts:
+            counts[cc] = {}
+            country_nuts3[cc] = {}
+        idx = counts[cc]
         # Index all prefixes from length 1 to len(pc)-1
         for length in range(1, len(pc)):
             prefix = pc[:length]
-            if prefix not in idx:
-                idx[prefix] = []
-            idx[prefix].append(nuts3)
+            votes = idx.get(prefix)
+            if votes is None:
+                votes = idx[prefix] = {}
+            votes[nuts3] = votes.get(nuts3, 0) + 1
+        nuts3_counts = country_nuts3[cc]
+        nuts3_counts[nuts3] = nuts3_counts.get(nuts3, 0) + 1
+    code_ids: dict[str, int] = {}
+    _prefix_index = {
+        cc: _PrefixTable.build(
+            {prefix: _pack_votes(_summarize_votes(votes), code_ids) for prefix, votes in idx.items()}
+        )
+        for cc, idx in counts.items()
+    }
+    _nuts_codes = tuple(code_ids)
+    del counts
     total_prefixes = sum(len(v) for v in _prefix_index.values())
     logger.info("Built prefix index: %d prefixes across %d countries", total_prefixes, len(_prefix_index))
 
     # Detect countries with a single NUTS3 region (e.g. LI → LI000)
-    _single_nuts3.clear()
-    country_nuts3: dict[str, set[str]] = {}
-    for (cc, _pc), nuts3 in _lookup.items():
-        country_nuts3.setdefault(cc, set()).add(nuts3)
-    for cc, nuts3_set in country_nuts3.items():
-        if len(nuts3_set) == 1:
-            _single_nuts3[cc] = next(iter(nuts3_set))
+    _single_nuts3 = {}
+    for cc, nuts3_counts in country_nuts3.items():
+        if len(nuts3_counts) == 1:
+            _single_nuts3[cc] = next(iter(nuts3_counts))
     # Merge in countries Eurostat treats as a single nationwide unit but for which
     # no TERCET file is published (e.g. ME → ME000).
     for cc, nuts3 in settings.single_nuts3_fallback.items():
@@ -644,24 +1085,18 @@ def _build_prefix_index() -> None:
 
     # Country-level majority-vote fallback for countries NOT in _single_nuts3
     # where NUTS1 and NUTS2 are unanimous but NUTS3 has a dominant winner
-    _country_fallback.clear()
+    _country_fallback = {}
     caps = settings.approximate_confidence_caps
-    for cc, nuts3_set in country_nuts3.items():
+    for cc, nuts3_counts in country_nuts3.items():
         if cc in _single_nuts3:
             continue
-        nuts1_set = {n[:3] for n in nuts3_set}
-        nuts2_set = {n[:4] for n in nuts3_set}
+        nuts1_set = {n[:3] for n in nuts3_counts}
+        nuts2_set = {n[:4] for n in nuts3_counts}
         if len(nuts1_set) != 1 or len(nuts2_set) != 1:
             continue
-        # Count postal codes per NUTS3 to find dominant region
-        nuts3_counts: Counter[str] = Counter()
-        for (c, _), n3 in _lookup.items():
-            if c == cc:
-                nuts3_counts[n3] += 1
+        # Dominant NUTS3 region by postal code count
         total = sum(nuts3_counts.values())
-        if total == 0:
-            continue
-        winner, winner_count = nuts3_counts.most_common(1)[0]
+        winner, winner_count = _first_most_common(nuts3_counts)
         ratio = winner_count / total
         _country_fallback[cc] = {
             "nuts1": next(iter(nuts1_set)),
@@ -677,40 +1112,42 @@ def _build_prefix_index() -> None:
             ", ".join(f"{cc}→{v['nuts3']}" for cc, v in sorted(_country_fallback.items())),
         )
 
+    country_counts = {cc: sum(nuts3_counts.values()) for cc, nuts3_counts in country_nuts3.items()}
+    _build_country_registry(country_counts)
+
+
+def _build_country_registry(country_counts: dict[str, int]) -> None:
+    """Swap in a fresh _countries registry for the current _lookup/_single_nuts3."""
+    global _countries
+
+    loaded = frozenset(country_counts) | frozenset(_single_nuts3)
+    _countries = _CountryRegistry(country_counts, loaded, ", ".join(sorted(loaded)))
 
-def _estimate_by_prefix(cc: str, postal_code: str) -> dict | None:
+
+def _estimate_by_prefix(cc: str, postal_code: str, gen: _Generation | None = None) -> dict | None:
     """Runtime estimation via longest prefix match + majority vote.
 
-    Returns a result dict with match_type='approximate' or None.
+    Uses `gen`, or the live generation. Returns a result dict with
+    match_type='approximate' or None.
     """
-    idx = _prefix_index.get(cc)
+    if gen is None:
+        gen = _gen
+    idx = gen.prefix_index.get(cc)
     if not idx:
         return None
 
     # Find the longest matching prefix
-    best_prefix = None
     for length in range(len(postal_code), 0, -1):
-        prefix = postal_code[:length]
-        if prefix in idx:
-            best_prefix = prefix
+        row = idx.find(postal_code[:length])
+        if row >= 0:
             break
-
-    if best_prefix is None:
+    else:
         return None
 
-    neighbors = idx[best_prefix]
-    prefix_ratio = len(best_prefix) / len(postal_code)
-
-    # Majority vote at each NUTS level
-    nuts3_counts = Counter(neighbors)
-    nuts2_counts = Counter(n[:4] for n in neighbors)
-    nuts1_counts = Counter(n[:3] for n in neighbors)
-
-    total = len(neighbors)
-
-    nuts3_winner, nuts3_count = nuts3_counts.most_common(1)[0]
-    nuts2_winner, nuts2_count = nuts2_counts.most_common(1)[0]
-    nuts1_winner, nuts1_count = nuts1_counts.most_common(1)[0]
+    total, nuts1, nuts1_count, nuts2, nuts2_count, nuts3, nuts3_count = _unpack_votes(
+        idx.packed(row), gen.nuts_codes
+    )
+    prefix_ratio = length / len(postal_code)
 
     # Confidence = agreement_ratio * prefix_ratio, capped per level
     caps = settings.approximate_confidence_caps
@@ -722,29 +1159,32 @@ def _estimate_by_prefix(cc: str, postal_code: str) -> dict | None:
     if c1 < settings.approximate_min_confidence:
         return None
 
-    return _build_result(
-        "approximate",
-        nuts3_winner,
-        nuts1=nuts1_winner,
-        nuts2=nuts2_winner,
-        nuts1_confidence=c1,
-        nuts2_confidence=c2,
-        nuts3_confidence=c3,
-    )
+    return _tier_result(gen, "approximate", nuts3, nuts1, nuts2, c1, c2, c3)
 
 
 def _load_from_db(db: Path) -> bool:
     """Load the lookup table from SQLite cache. Returns True on success."""
     try:
         with _db_connection(db) as con:
-            rows = con.execute("SELECT country_code, postal_code, nuts3 FROM lookup").fetchall()
-        if not rows:
+            widths = dict(
+                con.execute("SELECT country_code, MAX(LENGTH(postal_code)) FROM lookup GROUP BY country_code")
+            )
+            # Stream rows in primary-key order straight into the packed columns
+            # rather than fetchall() a list copy of every row; rowids were
+            # assigned in load order, so they carry each row's insertion ordinal
+            count = _lookup.load_sorted(
+                con.execute(
+                    "SELECT country_code, postal_code, nuts3, rowid FROM lookup "
+                    "ORDER BY country_code, postal_code"
+                ),
+                widths,
+                ordered=True,
+            )
+        if not count:
             return False
-        for cc, pc, nuts3 in rows:
-            _lookup[(cc, pc)] = nuts3
-        logger.info("Loaded %d entries from SQLite cache %s", len(rows), db.name)
+        logger.info("Loaded %d entries from SQLite cache %s", count, db.name)
         return True
-    except sqlite3.Error as exc:
+    except (sqlite3.Error, ValueError) as exc:
         logger.warning("Failed to load from DB cache: %s", exc)
         _lookup.clear()
         return False
@@ -778,7 +1218,7 @@ def _save_to_db(db: Path) -> None:
             )
             con.executemany(
                 "INSERT INTO lookup (country_code, postal_code, nuts3) VALUES (?, ?, ?)",
-                [(cc, pc, nuts3) for (cc, pc), nuts3 in _lookup.items()],
+                [(cc, pc, nuts3) for (cc, pc), nuts3 in _lookup.ordered_items()],
             )
             con.executemany(
                 "INSERT INTO estimates "
@@ -809,6 +1249,7 @@ def _save_to_db(db: Path) -> None:
                 [
                     ("nuts_version", settings.nuts_version),
                     ("created_at", datetime.now(timezone.utc).isoformat()),
+                    ("stale", "1" if _data_stale else "0"),
                     ("entry_count", str(len(_lookup))),
                     ("estimate_count", str(len(_estimates))),
                     ("nuts_names_count", str(len(_nuts_names))),
@@ -829,11 +1270,179 @@ def _save_to_db(db: Path) -> None:
         tmp.unlink(missing_ok=True)
 
 
-def load_data() -> None:
-    """Download all TERCET flat files and build the in-memory lookup table."""
-    global _data_stale, _data_loaded_at, _extra_source_count
+def _snapshot_path() -> Path:
+    """Return the path for the fast-start snapshot, next to the SQLite cache."""
+    return _db_path().with_suffix(".snapshot")
 
-    with _data_lock:
+
+def _derived_settings_hash() -> str:
+    """SHA-256 (16 hex chars) of the settings baked into the snapshot's derived data.
+
+    Covers the confidence map used to parse estimates and the single-NUTS3
+    fallback and approximate caps used by _build_prefix_index().
+    """
+    blob = json.dumps(
+        [settings.confidence_map, settings.single_nuts3_fallback, settings.approximate_confidence_caps],
+        sort_keys=True,
+    )
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+
+def _estimates_source() -> str:
+    """Identify the estimates CSV load_data() would read, by path, mtime and size.
+
+    Empty when the file is absent (estimates then come from the SQLite cache,
+    which only changes together with the snapshot).
+    """
+    csv_path = Path(settings.estimates_csv)
+    try:
+        st = csv_path.stat()
+    except OSError:
+        return ""
+    return f"{csv_path.resolve()}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _snapshot_is_valid(meta: dict, *, built_since: float, refetch: bool = False) -> bool:
+    """Apply the _db_is_valid() checks, plus the inputs to the derived data, to snapshot metadata.
+
+    A snapshot a sibling worker wrote while we waited on the lock is accepted
+    even past its TTL, or when `refetch` asks us to replace a partial load: it
+    is the result of the refresh we would attempt ourselves (e.g. a
+    stale-cache fallback after a failed download).
+    """
+    if meta.get("nuts_version") != settings.nuts_version:
+        logger.info("Snapshot version mismatch, will rebuild")
+        return False
+    if int(meta.get("entry_count", 0)) == 0:
+        logger.info("Snapshot is empty, will rebuild")
+        return False
+    if meta.get("extra_sources_hash", "") != _extra_sources_hash():
+        logger.info("Extra sources configuration changed, will rebuild snapshot")
+        return False
+    if meta.get("settings_hash") != _derived_settings_hash():
+        logger.info("Confidence settings changed, will rebuild snapshot")
+        return False
+    if meta.get("estimates_source", "") != _estimates_source():
+        logger.info("Estimates CSV changed, will rebuild snapshot")
+        return False
+    if float(meta.get("written_at", 0)) >= built_since:
+        return True
+    if refetch and meta.get("stale"):
+        logger.info("Snapshot holds a partial load, will refetch")
+        return False
+    try:
+        created = datetime.fromisoformat(meta["created_at"])
+    except (KeyError, ValueError):
+        logger.info("Snapshot has no usable created_at, will rebuild")
+        return False
+    age_days = (datetime.now(timezone.utc) - created).total_seconds() / 86400
+    if age_days > settings.db_cache_ttl_days:
+        logger.info("Snapshot expired (%.0f days old), will rebuild", age_days)
+        return False
+    return True
+
+
+def _load_from_snapshot(snap: Path, *, built_since: float, refetch: bool = False) -> bool:
+    """Restore every table and derived index from a valid snapshot. Returns True on success."""
+    global _data_stale, _data_loaded_at, _nuts_codes, _prefix_index
+
+    if not snap.is_file():
+        return False
+    start = time.monotonic()
+    try:
+        if not _snapshot_is_valid(snapshot.read_meta(snap), built_since=built_since, refetch=refetch):
+            return False
+        tables, meta, payload, prefix_index = snapshot.open_snapshot(snap)
+        nuts_codes = tuple(payload["nuts_codes"])
+        single_nuts3 = payload["single_nuts3"]
+        country_fallback = payload["country_fallback"]
+        estimates = payload["estimates"]
+        nuts_names = payload["nuts_names"]
+    except (snapshot.SnapshotError, KeyError, TypeError) as exc:
+        logger.info("Snapshot unusable (%s), will rebuild", exc)
+        return False
+
+    _lookup.replace_tables(tables)
+    _prefix_index = prefix_index
+    _nuts_codes = nuts_codes
+    _single_nuts3.update(single_nuts3)
+    _country_fallback.update(country_fallback)
+    _estimates.update(estimates)
+    _nuts_names.update(nuts_names)
+    _build_country_registry(_lookup.countries())
+    _data_loaded_at = meta.get("created_at", "")
+    _data_stale = bool(meta.get("stale", False))
+    logger.info(
+        "Loaded %d entries + %d estimates + %d names from snapshot %s (%.2fs)",
+        len(_lookup),
+        len(_estimates),
+        len(_nuts_names),
+        snap.name,
+        time.monotonic() - start,
+    )
+    return True
+
+
+def _write_snapshot(snap: Path) -> None:
+    """Write the loaded tables and derived indexes to `snap` and switch the packed tables to the mapping."""
+    global _prefix_index
+
+    if not _lookup:
+        return
+    _lookup.compact()
+    meta = {
+        "nuts_version": settings.nuts_version,
+        "created_at": _data_loaded_at,
+        "written_at": time.time(),
+        "stale": _data_stale,
+        "entry_count": len(_lookup),
+        "extra_sources_hash": _extra_sources_hash(),
+        "settings_hash": _derived_settings_hash(),
+        "estimates_source": _estimates_source(),
+    }
+    payload = {
+        "nuts_codes": _nuts_codes,
+        "single_nuts3": _single_nuts3,
+        "country_fallback": _country_fallback,
+        "estimates": _estimates,
+        "nuts_names": _nuts_names,
+    }
+    try:
+        snapshot.write_snapshot(snap, _lookup.tables(), meta, payload, _prefix_index)
+        mapped = snapshot.open_snapshot(snap)
+    except (OSError, ValueError, snapshot.SnapshotError) as exc:
+        logger.error("Failed to write snapshot %s: %s", snap, exc)
+        return
+    # Drop this worker's private copies in favour of the shared pages
+    _lookup.replace_tables(mapped.tables)
+    _prefix_index = mapped.prefixes
+    logger.info("Wrote snapshot %s (%d entries)", snap.name, len(_lookup))
+
+
+def load_data() -> None:
+    """Download all TERCET flat files and build a new generation of in-memory data.
+
+    Everything is built into fresh working tables while the live generation
+    keeps serving requests, then published in one swap (double-buffered: both
+    generations are in memory until the old one's last reader lets go). If a
+    reload comes up empty while data is being served, the live generation is
+    kept. Build phase timings are recorded on the generation for /health.
+    Unless PC2NUTS_GC_FREEZE is off, the heap is collected and frozen just
+    before publishing, so full GC passes skip the new tables.
+
+    While the live generation is stale (a partial load after a startup
+    timeout), a reload skips the SQLite cache and snapshot that load left
+    behind and downloads again; the generation only stops being stale once a
+    load completes.
+
+    With snapshots enabled, a warm start restores everything from the
+    snapshot file in one read. The lookup table and the prefix index are
+    shared between the workers of a host: whichever worker takes the snapshot
+    lock first loads and indexes the data as usual and writes the snapshot,
+    and every worker then memory-maps that file. Estimates, names and the
+    small per-country maps are still decoded into each worker.
+    """
+    with _reload_lock:
         if settings.nuts_version == "unknown":
             logger.warning(
                 "Could not derive NUTS version from base URL '%s'. "
@@ -846,139 +1455,347 @@ def load_data() -> None:
                 settings.db_cache_ttl_days,
             )
 
-        _lookup.clear()
-        _estimates.clear()
-        _nuts_names.clear()
-        _data_stale = False
-        _extra_source_count = len(settings.extra_source_urls)
-
-        start_time = time.monotonic()
-        deadline = start_time + settings.startup_timeout
+        started = time.monotonic()
+        timings: dict[str, float] = {}
+        refetch = _gen.stale
+        _begin_build()
 
         # Ensure data directory exists
-        data_dir = Path(settings.data_dir)
-        data_dir.mkdir(parents=True, exist_ok=True)
+        Path(settings.data_dir).mkdir(parents=True, exist_ok=True)
 
-        estimates_csv = Path(settings.estimates_csv)
+        if not settings.snapshot_enabled:
+            _build_tables(timings, refetch=refetch)
+        else:
+            snap = _snapshot_path()
+            wait_started = time.time()
+            # Other workers block here while the first one in builds the snapshot
+            with snapshot.snapshot_lock(snap):
+                phase = time.monotonic()
+                if _load_from_snapshot(snap, built_since=wait_started, refetch=refetch):
+                    timings["snapshot_load_s"] = round(time.monotonic() - phase, 3)
+                else:
+                    _build_tables(timings, refetch=refetch)
+                    phase = time.monotonic()
+                    _write_snapshot(snap)
+                    timings["snapshot_write_s"] = round(time.monotonic() - phase, 3)
+
+        if not _lookup and _gen.lookup:
+            logger.warning("Reload produced no data, keeping generation %d", _gen.id)
+            return
+        if settings.gc_freeze:
+            # The new tables live until the next reload; take them out of full collections
+            phase = time.monotonic()
+            frozen = gc_stats.freeze_heap()
+            timings["gc_freeze_s"] = round(time.monotonic() - phase, 3)
+            logger.info("Froze %d objects out of GC tracking (%.2fs)", frozen, timings["gc_freeze_s"])
+        timings["total_s"] = round(time.monotonic() - started, 3)
+        gen = _publish(timings)
+        logger.info("Published data generation %d (%.1fs)", gen.id, timings["total_s"])
+
+
+def _build_tables(timings: dict[str, float], *, refetch: bool = False) -> None:
+    """Load the working tables from the cache or TERCET and build the derived indexes."""
+    phase = time.monotonic()
+    _load_tables(refetch=refetch)
+    _lookup.compact()
+    timings["load_s"] = round(time.monotonic() - phase, 3)
+    phase = time.monotonic()
+    _build_prefix_index()
+    timings["index_s"] = round(time.monotonic() - phase, 3)
+
+
+def _begin_build() -> None:
+    """Point the working-set globals at fresh, empty tables for the next generation.
+
+    The live generation holds its own references, so requests keep reading
+    the old tables until _publish().
+    """
+    global _lookup, _estimates, _prefix_index, _nuts_codes, _single_nuts3, _country_fallback, _nuts_names
+    global _countries, _data_stale, _data_loaded_at, _extra_source_count, _load_timings
+
+    _lookup = LookupStore()
+    _estimates = {}
+    _prefix_index = {}
+    _nuts_codes = ()
+    _single_nuts3 = {}
+    _country_fallback = {}
+    _nuts_names = {}
+    _countries = _CountryRegistry({}, frozenset(), "")
+    _data_stale = False
+    _data_loaded_at = ""
+    _extra_source_count = len(settings.extra_source_urls)
+    _load_timings = {}
+
+
+def _publish(build_timings: dict[str, float] | None = None) -> _Generation:
+    """Swap the working tables in as the live generation and return it.
+
+    Estimates pushed by app.estimates_refresh into the outgoing generation are
+    newer than anything the build read from disk, so while remote refresh is
+    configured they carry over (revalidated against the new lookup table).
+    """
+    global _gen, _estimates
 
-        # Fast path: load from SQLite cache if valid
-        db = _db_path()
-        if _db_is_valid(db) and _load_from_db(db):
-            _data_loaded_at = _read_db_created_at(db)
-            if not _load_estimates_from_csv(estimates_csv):
-                _load_estimates_from_db(db)
+    with _data_lock:
+        live = _gen
+        carry = live.remote_estimates and bool(settings.estimates_refresh_url)
+        if carry and live.estimates is not _estimates:
+            _estimates = dict(live.estimates)
             _revalidate_estimates()
-            _load_nuts_names_from_db(db)
-            _build_prefix_index()
-            return
+        _gen = _working_generation(live.id + 1, build_timings or {}, carry)
+        _lookup_cache.bind(_gen)
+        return _gen
 
-        _lookup.clear()
-        cache_dir = data_dir / f"NUTS-{settings.nuts_version}"
-        cache_dir.mkdir(parents=True, exist_ok=True)
 
-        base_url = settings.tercet_base_url
-        countries = settings.countries
-        timed_out = False
+class EstimatesDiff(NamedTuple):
+    """What replace_estimates() changed in the live estimates, by row."""
+
+    added: int
+    removed: int
+    changed: int
+    count: int  # rows live afterwards
+
+
+def replace_estimates(estimates: dict[tuple[str, str], dict]) -> EstimatesDiff:
+    """Publish `estimates` as the live generation's estimates, applying only the difference.
+
+    Rows are compared with the live table by key. Only added and changed rows
+    are checked against the live lookup table (those with exact matches are
+    dropped), without holding _data_lock; the live table was checked already.
+    The diff is applied to a copy, which goes live with a single swap of _gen,
+    like any other generation table, and is never mutated after. Lookups see
+    the old table or the new one, never a partial one, and _lookup_cache keeps
+    every result the diff does not touch. If a build publishes in between, the
+    diff is computed again against its tables. A build in progress picks the
+    new table up when it publishes. Blocking: call it from a worker thread,
+    not the event loop.
+    """
+    global _gen
+
+    while True:
+        live = _gen
+        current = live.estimates
+        removed = current.keys() - estimates.keys()
+        upserts = {key: est for key, est in estimates.items() if current.get(key) != est}
+        _revalidate_estimates(upserts, live.lookup)
+        added = sum(1 for key in upserts if key not in current)
+        diff = EstimatesDiff(added, len(removed), len(upserts) - added, len(current) + added - len(removed))
+        if not (removed or upserts) and live.remote_estimates:
+            return diff
+        fresh = dict(current)
+        for key in removed:
+            del fresh[key]
+        fresh.update(upserts)
+        with _data_lock:
+            if _gen is live:
+                _gen = _gen._replace(estimates=fresh, remote_estimates=True)
+                # Estimates only answer lookups whose extracted key they hold
+                touched = removed | upserts.keys()
+                dropped = _lookup_cache.rebind(_gen, lambda entry: entry[2] in touched)
+                logger.debug("Estimates diff %s dropped %d cached lookups", diff, dropped)
+                return diff
+
+
+def reload_due() -> bool:
+    """True when the live data is stale, missing or older than PC2NUTS_DB_CACHE_TTL_DAYS."""
+    gen = _gen
+    if gen.stale or not gen.lookup:
+        return True
+    try:
+        created = datetime.fromisoformat(gen.loaded_at)
+    except ValueError:
+        return True
+    age_days = (datetime.now(timezone.utc) - created).total_seconds() / 86400
+    return age_days > settings.db_cache_ttl_days
+
 
-        with httpx.Client() as client:
-            # Strategy 1: discover files from directory listing
-            discovered = _discover_zip_urls(client, base_url)
-            loaded_countries: set[str] = set()
+def _load_tables(*, refetch: bool = False) -> None:
+    """Fill _lookup, _estimates and _nuts_names from the SQLite cache or TERCET downloads.
 
-            if discovered:
-                logger.info("Discovered %d ZIP files from directory listing", len(discovered))
-                for url in discovered:
+    With `refetch`, a cache saved from a partial load is not reused, and if
+    the downloads yield nothing _lookup is left empty so load_data() keeps the
+    live generation instead of republishing the same partial data.
+    """
+    global _data_stale, _data_loaded_at
+
+    start_time = time.monotonic()
+    deadline = start_time + settings.startup_timeout
+
+    data_dir = Path(settings.data_dir)
+    estimates_csv = Path(settings.estimates_csv)
+
+    # Fast path: load from SQLite cache if valid
+    db = _db_path()
+    if _db_is_valid(db, refetch=refetch) and _load_from_db(db):
+        _data_loaded_at = _read_db_created_at(db)
+        _data_stale = _read_db_metadata(db, "stale") == "1"
+        if not _load_estimates_from_csv(estimates_csv):
+            _load_estimates_from_db(db)
+        _revalidate_estimates()
+        _load_nuts_names_from_db(db)
+        return
+
+    _lookup.clear()
+    cache_dir = data_dir / f"NUTS-{settings.nuts_version}"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    base_url = settings.tercet_base_url
+    countries = settings.countries
+    timed_out = False
+
+    concurrency = settings.download_concurrency
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timings: dict[str, dict[str, float]] = {}
+
+    def ingest(cc: str, fetched: _FetchedZip) -> int:
+        # Only this thread parses into _lookup, streaming each cached ZIP in a
+        # fixed order, so first-write-wins resolves exactly as it would
+        # downloading one file at a time
+        ingest_start = time.monotonic()
+        count = _merge_rows(_iter_zip_rows(fetched.path, fetched.url, cc))
+        # Pack this file's rows now so the staging dict never holds more than one ZIP
+        _lookup.compact()
+        t = timings.setdefault(cc, {"files": 0, "entries": 0, "fetch_s": 0.0, "ingest_s": 0.0})
+        t["files"] += 1
+        t["entries"] += count
+        t["fetch_s"] += fetched.fetch_seconds
+        t["ingest_s"] += time.monotonic() - ingest_start
+        return count
+
+    with (
+        httpx.Client(limits=limits) as client,
+        ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="tercet") as pool,
+    ):
+        # NUTS region names are independent of the ZIPs; fetch them alongside
+        names = pool.submit(_download_nuts_names, client)
+
+        # Strategy 1: discover files from directory listing
+        discovered = _discover_zip_urls(client, base_url)
+        loaded_countries: set[str] = set()
+
+        if discovered:
+            logger.info("Discovered %d ZIP files from directory listing", len(discovered))
+            jobs = [(url, cc) for url in discovered if (cc := _infer_country_from_url(url))]
+            for (url, cc), result in _ordered_results(
+                pool,
+                lambda job: _fetch_for_ingest(client, job[0], cache_dir, deadline=deadline),
+                jobs,
+                2 * concurrency,
+            ):
+                if result is None:
                     if time.monotonic() > deadline:
                         logger.warning("Startup timeout reached during discovery downloads")
                         timed_out = True
                         break
-                    cc = _infer_country_from_url(url)
-                    if not cc:
-                        continue
-                    count = _download_and_parse_zip(client, url, cc, cache_dir, deadline=deadline)
-                    if count > 0:
-                        loaded_countries.add(cc)
-                        logger.info("Loaded %d entries for %s", count, cc)
-
-            # Strategy 2: for countries not yet loaded, try guessed URLs per-country
-            remaining = [c for c in countries if c not in loaded_countries]
-            if remaining and not timed_out:
-                logger.info("Trying guessed URLs for %d remaining countries", len(remaining))
-                for cc in remaining:
-                    if time.monotonic() > deadline:
-                        logger.warning("Startup timeout reached during country downloads")
-                        timed_out = True
-                        break
-                    for url in _guess_zip_urls_for_country(base_url, cc):
-                        count = _download_and_parse_zip(client, url, cc, cache_dir, deadline=deadline)
-                        if count > 0:
-                            loaded_countries.add(cc)
-                            logger.info("Loaded %d entries for %s", count, cc)
-                            break
-
-            # Extra data sources (overwrite TERCET entries)
-            if not timed_out:
-                extra_count = _load_extra_sources(client, cache_dir, deadline=deadline)
-                if extra_count:
-                    logger.info("Extra sources added %d entries (overwrite mode)", extra_count)
-
-            # NUTS region names
-            if not timed_out:
-                _download_nuts_names(client)
-
-        elapsed = time.monotonic() - start_time
+                    continue
+                if ingest(cc, result) > 0:
+                    loaded_countries.add(cc)
+
+        # Strategy 2: for countries not yet loaded, try guessed URLs per-country.
+        # Countries are probed in parallel; each walks its own candidates in order.
+        remaining = [c for c in countries if c not in loaded_countries]
+        if remaining and not timed_out:
+            logger.info("Trying guessed URLs for %d remaining countries", len(remaining))
+            for cc, (index, result) in _ordered_results(
+                pool,
+                lambda cc: _fetch_first_guess(client, cc, cache_dir, deadline=deadline),
+                remaining,
+                2 * concurrency,
+            ):
+                while result is not None and ingest(cc, result) == 0:
+                    # Every row was already loaded — move on to the next candidate
+                    index, result = _fetch_first_guess(
+                        client, cc, cache_dir, deadline=deadline, start=index + 1
+                    )
+                if result is not None:
+                    loaded_countries.add(cc)
+                elif time.monotonic() > deadline:
+                    logger.warning("Startup timeout reached during country downloads")
+                    timed_out = True
+                    break
+
+        # Extra data sources (overwrite TERCET entries)
+        if not timed_out:
+            extra_count = _load_extra_sources(client, cache_dir, deadline=deadline)
+            if extra_count:
+                logger.info("Extra sources added %d entries (overwrite mode)", extra_count)
+
+        names.result()
+
+    for cc, t in timings.items():
         logger.info(
-            "Data loading complete: %d postal codes across %d countries (%.1fs)",
-            len(_lookup),
-            len(loaded_countries),
-            elapsed,
+            "Loaded %d entries for %s from %d file(s) (fetch %.2fs, parse+merge %.2fs)",
+            t["entries"],
+            cc,
+            t["files"],
+            t["fetch_s"],
+            t["ingest_s"],
         )
+    _load_timings.clear()
+    _load_timings.update(timings)
+
+    elapsed = time.monotonic() - start_time
+    logger.info(
+        "Data loading complete: %d postal codes across %d countries (%.1fs)",
+        len(_lookup),
+        len(loaded_countries),
+        elapsed,
+    )
 
-        if _lookup:
-            # Fresh download succeeded (possibly partial on timeout)
-            _data_loaded_at = datetime.now(timezone.utc).isoformat()
-            if not _load_estimates_from_csv(estimates_csv):
-                _load_estimates_from_db(db)
-            _revalidate_estimates()
-            _save_to_db(db)
-            if timed_out:
-                _data_stale = True
-                logger.warning("Startup timed out — partial data loaded")
-        elif db.is_file():
-            # Download failed but stale DB exists — fallback
-            _load_from_db(db)
-            _data_loaded_at = _read_db_created_at(db)
-            if not _load_estimates_from_csv(estimates_csv):
-                _load_estimates_from_db(db)
-            _revalidate_estimates()
-            _load_nuts_names_from_db(db)
+    if _lookup:
+        # Fresh download succeeded (possibly partial on timeout)
+        _data_loaded_at = datetime.now(timezone.utc).isoformat()
+        if not _load_estimates_from_csv(estimates_csv):
+            _load_estimates_from_db(db)
+        _revalidate_estimates()
+        if timed_out:
             _data_stale = True
-            logger.warning("TERCET refresh failed — serving stale cache")
-
-        _build_prefix_index()
-
-
-def _build_result(match_type: str, nuts3: str, nuts1: str = "", nuts2: str = "", **confidence) -> dict:
-    """Construct a lookup result dict with names resolved.
-
-    If nuts1/nuts2 are not provided, they are derived from nuts3.
-    Confidence keys: nuts1_confidence, nuts2_confidence, nuts3_confidence.
+            logger.warning("Startup timed out — partial data loaded")
+        _save_to_db(db)
+    elif db.is_file() and not refetch:
+        # Download failed but stale DB exists — fallback
+        _load_from_db(db)
+        _data_loaded_at = _read_db_created_at(db)
+        if not _load_estimates_from_csv(estimates_csv):
+            _load_estimates_from_db(db)
+        _revalidate_estimates()
+        _load_nuts_names_from_db(db)
+        _data_stale = True
+        logger.warning("TERCET refresh failed — serving stale cache")
+
+
+def _nuts3(gen: _Generation, nuts3: str) -> _Nuts3Record:
+    """The generation's record for `nuts3`; built on the fly for a code it has none for."""
+    record = gen.nuts3_records.get(nuts3)
+    if record is None:
+        record = _nuts3_record(nuts3, gen.nuts_names)
+    return record
+
+
+def _tier_result(
+    gen: _Generation, match_type: str, nuts3: str, nuts1: str, nuts2: str, c1: float, c2: float, c3: float
+) -> dict:
+    """Construct an estimated/approximate lookup result from `nuts3`'s record.
+
+    NUTS1/NUTS2 can come from separate votes and need not be nuts3's own
+    parents; names for those are looked up directly.
     """
-    n1 = nuts1 or nuts3[:3]
-    n2 = nuts2 or nuts3[:4]
+    record = _nuts3(gen, nuts3)
     return {
         "match_type": match_type,
-        "nuts1": n1,
-        "nuts1_confidence": confidence.get("nuts1_confidence", 1.0),
-        "nuts2": n2,
-        "nuts2_confidence": confidence.get("nuts2_confidence", 1.0),
+        "nuts1": nuts1,
+        "nuts1_confidence": c1,
+        "nuts2": nuts2,
+        "nuts2_confidence": c2,
         "nuts3": nuts3,
-        "nuts3_confidence": confidence.get("nuts3_confidence", 1.0),
-        **_resolve_names(n1, n2, nuts3),
+        "nuts3_confidence": c3,
+        "nuts1_name": record.nuts1_name if nuts1 == record.nuts1 else gen.nuts_names.get(nuts1),
+        "nuts2_name": record.nuts2_name if nuts2 == record.nuts2 else gen.nuts_names.get(nuts2),
+        "nuts3_name": record.nuts3_name,
     }
 
 
-def lookup(country_code: str, postal_code: str) -> dict | None:
+def lookup(country_code: str, postal_code: str) -> Mapping[str, object] | None:
     """Look up NUTS codes for a given country + postal code.
 
     Five-tier fall-through:
@@ -988,54 +1805,99 @@ def lookup(country_code: str, postal_code: str) -> dict | None:
     4. Country-level majority vote → unanimous NUTS1/2, dominant NUTS3 (e.g. MT)
     5. Single-NUTS3 country fallback → confidence 1.0 (e.g. LI, CY, LU)
 
-    Returns a dict with nuts1/2/3, match_type, and per-level confidence, or None.
+    Returns a mapping with nuts1/2/3, names, match_type, and per-level
+    confidence, or None. The mapping may be shared (a NUTS3 record's result,
+    or a repeat answered from _lookup_cache) and must not be mutated. Each
+    call is counted in metrics under the tier that answered it.
     """
-    from app.postal_patterns import extract_postal_code
-
     cc = normalize_country(country_code)
+    # Every tier reads the same generation, even if a reload publishes mid-lookup
+    gen = _gen
+    cache_key = (cc, postal_code)
+    # Entries carry the answering tier's counter, so repeats are counted under it too,
+    # and the key the waterfall ran on, so replace_estimates() can tell which it affects
+    entry = _lookup_cache.get(gen, cache_key)
+    if entry is MISSING:
+        tier, result, key = _lookup_in(gen, cc, postal_code)
+        entry = (metrics.LOOKUPS.labels(tier), result, key)
+        _lookup_cache.put(gen, cache_key, entry)
+    entry[0].inc()
+    return entry[1]
+
+
+_extract_seconds = metrics.LOOKUP_STAGE_SECONDS.labels("extract")
+_waterfall_seconds = metrics.LOOKUP_STAGE_SECONDS.labels("waterfall")
 
+
+def get_lookup_cache_stats() -> dict[str, int]:
+    """Hit/miss/eviction counters and size of the lookup() result cache."""
+    return _lookup_cache.stats()
+
+
+def _lookup_in(
+    gen: _Generation, cc: str, postal_code: str
+) -> tuple[str, Mapping[str, object] | None, tuple[str, str]]:
+    """Extract the postal code and run the tier waterfall, timing both stages.
+
+    Returns the name of the tier that answered ("none" without a match), the
+    result, and the (country, extracted postal code) key the waterfall ran on.
+    """
+    from app.postal_patterns import extract_postal_code
+
+    started = time.perf_counter()
     extracted = extract_postal_code(cc, postal_code)
+    extracted_at = time.perf_counter()
+    tier, result = _waterfall(gen, cc, extracted)
+    _extract_seconds.observe(extracted_at - started)
+    _waterfall_seconds.observe(time.perf_counter() - extracted_at)
+    return tier, result, (cc, extracted)
+
+
+def _waterfall(gen: _Generation, cc: str, extracted: str) -> tuple[str, Mapping[str, object] | None]:
+    """Run the five-tier fall-through for normalized country `cc` against `gen`."""
     key = (cc, extracted)
 
     # Tier 1: Exact TERCET match
-    nuts3 = _lookup.get(key)
+    nuts3 = gen.lookup.get(key)
     if nuts3 is not None:
-        return _build_result("exact", nuts3)
+        return "exact", _nuts3(gen, nuts3).exact
 
     # Tier 2: Pre-computed estimate
-    est = _estimates.get(key)
+    est = gen.estimates.get(key)
     if est is not None:
-        return _build_result(
+        return "estimated", _tier_result(
+            gen,
             "estimated",
             est["nuts3"],
-            nuts1=est["nuts1"],
-            nuts2=est["nuts2"],
-            nuts1_confidence=est["nuts1_confidence"],
-            nuts2_confidence=est["nuts2_confidence"],
-            nuts3_confidence=est["nuts3_confidence"],
+            est["nuts1"],
+            est["nuts2"],
+            est["nuts1_confidence"],
+            est["nuts2_confidence"],
+            est["nuts3_confidence"],
         )
 
     # Tier 3: Runtime prefix-based estimation
-    approx = _estimate_by_prefix(cc, extracted)
+    approx = _estimate_by_prefix(cc, extracted, gen)
     if approx is not None:
-        return approx
+        return "prefix", approx
 
     # Tier 4: Country-level majority vote (unanimous NUTS1/2, dominant NUTS3)
-    fallback = _country_fallback.get(cc)
+    fallback = gen.country_fallback.get(cc)
     if fallback is not None:
-        return _build_result(
+        return "country_fallback", _tier_result(
+            gen,
             "approximate",
             fallback["nuts3"],
-            nuts1=fallback["nuts1"],
-            nuts2=fallback["nuts2"],
-            nuts1_confidence=fallback["nuts1_confidence"],
-            nuts2_confidence=fallback["nuts2_confidence"],
-            nuts3_confidence=fallback["nuts3_confidence"],
+            fallback["nuts1"],
+            fallback["nuts2"],
+            fallback["nuts1_confidence"],
+            fallback["nuts2_confidence"],
+            fallback["nuts3_confidence"],
         )
 
     # Tier 5: Single-NUTS3 country fallback (e.g. LI → LI000)
-    nuts3 = _single_nuts3.get(cc)
+    nuts3 = gen.single_nuts3.get(cc)
     if nuts3 is not None:
-        return _build_result("estimated", nuts3)
+        return "single_nuts3", _nuts3(gen, nuts3).single
 
-    return None
+    return "none", None
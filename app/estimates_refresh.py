@@ -2,27 +2,54 @@
 
 When PC2NUTS_ESTIMATES_REFRESH_URL is set, a per-worker asyncio task fetches
 the URL on every PC2NUTS_ESTIMATES_REFRESH_INTERVAL_SECONDS tick (default 24 h),
-parses the body, and full-replaces the in-memory _estimates dict if the
-content has changed and passes a 50% relative-row sanity guard.
+parses the body, and full-replaces the live estimates table if the
+content has changed and passes a 50% relative-row sanity guard. The body is
+hashed and parsed while it downloads, up to PC2NUTS_ESTIMATES_REFRESH_MAX_MB;
+parsing and the swap run in worker threads, so the event loop keeps serving
+meanwhile. Only the rows that differ from the live table are applied, and the
+new table goes live with one generation swap.
 
 Defaults preserve the current single-source behaviour: when the URL setting
 is unset, this module exposes refresh_estimates_once() that returns a
 "disabled" RefreshResult and refresh_estimates_loop() that returns immediately.
+
+With PC2NUTS_WORKERS > 1, one worker per host fetches for all of them: the
+one holding the lock on estimates_refresh.lock in PC2NUTS_DATA_DIR. It
+publishes each accepted generation to estimates_refresh.marshal, and the
+outcome of every attempt (content hash, ETag, stale flag) to
+estimates_refresh.json. The other workers check that file every
+PC2NUTS_ESTIMATES_FOLLOW_SECONDS and adopt a generation whose hash they do not
+have yet. A follower asked to refresh (bootstrap, admin endpoint) requests a
+fetch and adopts its outcome. If the fetching worker exits, the lock passes to
+whichever follower tries next, and it picks up the published ETag and hash.
 """
 
 from __future__ import annotations
 
 import asyncio
+import codecs
 import csv
 import hashlib
+import json
 import logging
+import marshal
+import os
+import queue
+import time
+from collections.abc import Iterator
 from dataclasses import dataclass
-from typing import Optional
+from pathlib import Path
+from typing import NamedTuple, Optional
 
 import httpx
 
 from app.config import settings
-from app.data_loader import _data_lock, _estimates, _revalidate_estimates, parse_estimates_from_text
+from app.data_loader import get_estimates_table, parse_estimates_from_lines, replace_estimates
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover — non-POSIX dev machines; Docker is Linux
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +67,13 @@ _stale: Optional[bool] = None  # None when feature disabled
 # older response would overwrite newer state.
 _refresh_lock: asyncio.Lock = asyncio.Lock()
 
+# Lock file held open while this worker is the host's fetcher (shared mode only)
+_leader_file = None
+
+# Longest a follower waits for the fetcher to answer a refresh request: one
+# follow tick plus the fetch timeout, with margin.
+_REQUEST_WAIT_EXTRA = 15.0
+
 
 @dataclass
 class RefreshResult:
@@ -48,6 +82,10 @@ class RefreshResult:
     new_count: int
     skipped_rows: int = 0
     reason: str = ""
+    # Rows the swap added, removed and changed ("refreshed" only)
+    added: int = 0
+    removed: int = 0
+    changed: int = 0
 
 
 def get_refresh_stale() -> Optional[bool]:
@@ -62,14 +100,252 @@ def _passes_sanity_guard(new_count: int, current_count: int) -> bool:
     return new_count >= 0.5 * current_count
 
 
+# ── Sharing across workers ───────────────────────────────────────────────────
+
+
+def _shared() -> bool:
+    return settings.workers > 1
+
+
+def _shared_path(suffix: str) -> Path:
+    return Path(settings.data_dir) / f"estimates_refresh{suffix}"
+
+
+def _try_lead() -> bool:
+    """Become the host's fetcher if no other worker is. True while this worker is it.
+
+    Where fcntl is unavailable every worker fetches for itself, as with one worker.
+    """
+    global _leader_file
+    if _leader_file is not None or fcntl is None:
+        return True
+    path = _shared_path(".lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(path, "a+b")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _leader_file = f
+    logger.info("This worker (pid %d) now fetches remote estimates for the host", os.getpid())
+    return True
+
+
+def _read_state() -> Optional[dict]:
+    try:
+        return json.loads(_shared_path(".json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _publish(result: RefreshResult) -> None:
+    """Fetcher: record this attempt's outcome, and the new generation if it was accepted.
+
+    The generation is written before the state that names it, so a follower
+    that sees a new hash finds its payload (or a newer one, and retries).
+    """
+    try:
+        if result.status == "refreshed":
+            payload = {"hash": _last_hash, "estimates": dict(get_estimates_table())}
+            _write_atomic(_shared_path(".marshal"), marshal.dumps(payload))
+        state = {
+            "hash": _last_hash,
+            "etag": _last_etag,
+            "last_modified": _last_modified,
+            "stale": bool(_stale),
+            "status": result.status,
+            "reason": result.reason,
+            "checked_at": time.time(),
+            "pid": os.getpid(),
+        }
+        _write_atomic(_shared_path(".json"), json.dumps(state).encode())
+    except (OSError, ValueError) as exc:
+        logger.warning("Could not publish remote estimates to the other workers: %s", exc)
+
+
+def _adopt() -> RefreshResult:
+    """Follower: swap in the generation the fetcher published last, if it is new to us."""
+    global _last_hash, _last_etag, _last_modified, _stale
+
+    previous_count = len(get_estimates_table())
+    unchanged = RefreshResult(status="unchanged", previous_count=previous_count, new_count=previous_count)
+    state = _read_state()
+    if state is None:
+        return unchanged
+    _stale = bool(state.get("stale"))
+    if not state.get("hash") or state["hash"] == _last_hash:
+        return unchanged
+    try:
+        published = marshal.loads(_shared_path(".marshal").read_bytes())
+        estimates = published["estimates"]
+    except (OSError, EOFError, ValueError, TypeError, KeyError) as exc:
+        logger.warning("Published remote estimates unreadable: %s", exc)
+        return unchanged
+    if published.get("hash") != state["hash"]:
+        return unchanged  # the fetcher is mid-publish; the next check picks it up
+    diff = replace_estimates(estimates)
+    _last_hash = state["hash"]
+    _last_etag = state.get("etag")
+    _last_modified = state.get("last_modified")
+    logger.info(
+        "Adopted remote estimates published by pid %s: %d -> %d (+%d -%d ~%d)",
+        state.get("pid"),
+        previous_count,
+        diff.count,
+        diff.added,
+        diff.removed,
+        diff.changed,
+    )
+    return RefreshResult(
+        status="refreshed",
+        previous_count=previous_count,
+        new_count=diff.count,
+        added=diff.added,
+        removed=diff.removed,
+        changed=diff.changed,
+    )
+
+
+def _fetch_due(interval: int) -> bool:
+    """Fetcher: True when the last attempt is `interval` old or a follower requested one since.
+
+    With `interval` 0 (no periodic fetches) only a request makes a fetch due.
+    """
+    state = _read_state()
+    checked_at = float(state.get("checked_at", 0)) if state is not None else 0.0
+    try:
+        requested_at = float(_shared_path(".request").read_text())
+    except (OSError, ValueError):
+        requested_at = 0.0
+    if interval > 0 and time.time() - checked_at >= interval:
+        return True
+    return requested_at > checked_at
+
+
+async def _request_from_leader() -> RefreshResult:
+    """Follower: ask the fetcher for a fresh attempt, wait for it and adopt its outcome."""
+    global _stale
+
+    previous_count = len(get_estimates_table())
+    requested_at = time.time()
+    try:
+        _write_atomic(_shared_path(".request"), str(requested_at).encode())
+    except OSError as exc:
+        logger.warning("Could not request a remote estimates fetch: %s", exc)
+    deadline = time.monotonic() + settings.estimates_follow_seconds + _REQUEST_WAIT_EXTRA
+    while True:
+        state = await asyncio.to_thread(_read_state)
+        if state is not None and float(state.get("checked_at", 0)) >= requested_at:
+            break
+        if time.monotonic() >= deadline:
+            _stale = True
+            return RefreshResult(
+                status="failed",
+                previous_count=previous_count,
+                new_count=previous_count,
+                reason="no answer from the fetching worker",
+            )
+        await asyncio.sleep(0.2)
+    if state.get("status") in ("failed", "rejected"):
+        _stale = bool(state.get("stale"))
+        return RefreshResult(
+            status=state["status"],
+            previous_count=previous_count,
+            new_count=previous_count,
+            reason=state.get("reason", ""),
+        )
+    async with _refresh_lock:
+        return await asyncio.to_thread(_adopt)
+
+
+# Size of the body chunks handed to the parser thread, and how many may wait for it
+_CHUNK = 64 * 1024
+_CHUNK_QUEUE = 16
+
+
+class FetchedCsv(NamedTuple):
+    """A 200 response body, parsed while it downloaded.
+
+    `estimates` is None when the body failed to parse but hashes to _last_hash.
+    """
+
+    estimates: Optional[dict[tuple[str, str], dict]]
+    skipped: int
+    sha256: str
+    size: int
+
+
+class BodyTooLarge(Exception):
+    """The response body is larger than PC2NUTS_ESTIMATES_REFRESH_MAX_MB."""
+
+
+def _parse_chunks(chunks: queue.Queue) -> tuple[dict, int]:
+    """Decode and parse body chunks from `chunks` up to a None; runs in a worker thread."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    def lines() -> Iterator[str]:
+        rest = ""
+        while True:
+            chunk = chunks.get()
+            final = chunk is None
+            *complete, rest = (rest + decoder.decode(b"" if final else chunk, final)).split("\n")
+            for line in complete:
+                yield line + "\n"
+            if final:
+                if rest:
+                    yield rest
+                return
+
+    return parse_estimates_from_lines(lines())
+
+
+async def _hand_over(chunks: queue.Queue, chunk: Optional[bytes], parser: asyncio.Future) -> bool:
+    """Queue `chunk` for the parser thread, waiting while the queue is full. False once the parser stopped."""
+    while not parser.done():
+        try:
+            chunks.put_nowait(chunk)
+            return True
+        except queue.Full:
+            await asyncio.wait([parser], timeout=0.01)
+    return False
+
+
+def _abandon(chunks: queue.Queue, parser: asyncio.Future) -> None:
+    """Stop the parser thread at its next chunk, dropping what is still queued."""
+    while True:
+        try:
+            chunks.get_nowait()
+        except queue.Empty:
+            break
+    chunks.put_nowait(None)
+    # The partial result (or error) is of no interest
+    parser.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
 async def fetch_remote_csv(
     client: httpx.AsyncClient,
-) -> tuple[Optional[bytes], int, dict[str, str]]:
+) -> tuple[Optional[FetchedCsv], int, dict[str, str]]:
     """GET settings.estimates_refresh_url with conditional headers.
 
-    Returns (body, status_code, response_headers). body is None on 304 Not
-    Modified, on any non-200 status, and on transport errors. Caller decides
+    Returns (fetched, status_code, response_headers). fetched is None on 304
+    Not Modified, on any non-200 status, and on transport errors. Caller decides
     what to log based on the status code (304 is silent; non-200 is a warning).
+
+    A 200 body is streamed: each chunk is hashed and handed to a parser thread,
+    so the body is never held whole. The first parse error is raised
+    (UnicodeDecodeError, ValueError, csv.Error, KeyError) and stops the
+    download, unless there is a _last_hash to compare against: then the rest
+    of the body is still hashed, and a body identical to the last applied one
+    comes back with `estimates` None instead of the error, as the hash check
+    ran before the parse used to. BodyTooLarge is raised once the body passes
+    PC2NUTS_ESTIMATES_REFRESH_MAX_MB.
     """
     headers: dict[str, str] = {}
     if _last_etag:
@@ -77,18 +353,48 @@ async def fetch_remote_csv(
     if _last_modified:
         headers["If-Modified-Since"] = _last_modified
 
+    max_mb = settings.estimates_refresh_max_mb
+    limit = max_mb * 1024 * 1024
+    chunks: queue.Queue = queue.Queue(_CHUNK_QUEUE)
+    parser: Optional[asyncio.Future] = None
     try:
-        r = await client.get(settings.estimates_refresh_url, headers=headers, timeout=10.0)
+        async with client.stream("GET", settings.estimates_refresh_url, headers=headers, timeout=10.0) as r:
+            response_headers = {k.lower(): v for k, v in r.headers.items()}
+            if r.status_code != 200:
+                return None, r.status_code, response_headers
+            declared = response_headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > limit:
+                raise BodyTooLarge(f"Content-Length {declared} exceeds {max_mb} MB")
+
+            digest = hashlib.sha256()
+            size = 0
+            parsing, complete = True, False
+            parser = asyncio.ensure_future(asyncio.to_thread(_parse_chunks, chunks))
+            async for chunk in r.aiter_bytes(_CHUNK):
+                size += len(chunk)
+                if size > limit:
+                    raise BodyTooLarge(f"body exceeds {max_mb} MB")
+                digest.update(chunk)
+                if parsing and not await _hand_over(chunks, chunk, parser):
+                    if not _last_hash:
+                        break  # the parser failed; its error is raised below
+                    parsing = False  # hash the rest, it may be the body already applied
+            else:
+                await _hand_over(chunks, None, parser)
+                complete = True
+            try:
+                estimates, skipped = await parser
+            except (UnicodeDecodeError, ValueError, csv.Error, KeyError):
+                if not complete or digest.hexdigest() != _last_hash:
+                    raise
+                estimates, skipped = None, 0  # the caller reports it unchanged
     except httpx.HTTPError as exc:
         logger.debug("Remote estimates fetch transport error: %s", exc)
         return None, 0, {}
-
-    response_headers = {k.lower(): v for k, v in r.headers.items()}
-    if r.status_code == 304:
-        return None, 304, response_headers
-    if r.status_code != 200:
-        return None, r.status_code, response_headers
-    return r.content, 200, response_headers
+    finally:
+        if parser is not None and not parser.done():
+            _abandon(chunks, parser)
+    return FetchedCsv(estimates, skipped, digest.hexdigest(), size), 200, response_headers
 
 
 async def refresh_estimates_once(
@@ -101,10 +407,12 @@ async def refresh_estimates_once(
     None, an ephemeral httpx.AsyncClient is created and closed. Production
     callers (the lifespan loop, the admin endpoint) should pass a long-lived
     client to reuse connections.
-    """
-    global _last_hash, _last_etag, _last_modified, _stale
 
-    previous_count = len(_estimates)
+    In shared mode (PC2NUTS_WORKERS > 1) only the host's fetcher fetches; it
+    publishes the outcome for the other workers. On any other worker this
+    requests a fetch from it and adopts the outcome.
+    """
+    previous_count = len(get_estimates_table())
 
     if not settings.estimates_refresh_url:
         return RefreshResult(
@@ -113,114 +421,147 @@ async def refresh_estimates_once(
             new_count=previous_count,
         )
 
+    if _shared() and not _try_lead():
+        return await _request_from_leader()
+
     async with _refresh_lock:
-        # Recompute previous_count under the lock so the result reflects the
-        # state we're actually transitioning from (a previous concurrent call
-        # may have just finished and changed _estimates while we were waiting).
-        previous_count = len(_estimates)
+        if _shared():
+            # Take over what an earlier fetcher published (hash, ETag)
+            await asyncio.to_thread(_adopt)
+        result = await _fetch_and_swap(client)
+        if _shared():
+            await asyncio.to_thread(_publish, result)
+        return result
 
-        own_client = client is None
-        if own_client:
-            client = httpx.AsyncClient()
-        try:
-            body, status, headers = await fetch_remote_csv(client)
-        finally:
-            if own_client:
-                await client.aclose()
-
-        # 304 Not Modified — content unchanged, refresh succeeded
-        if status == 304:
-            _stale = False
-            return RefreshResult(
-                status="unchanged",
-                previous_count=previous_count,
-                new_count=previous_count,
-            )
 
-        # Any other non-200 (including transport errors with status=0)
-        if body is None:
-            was_stale_before = _stale is True
-            _stale = True
-            if not was_stale_before:
-                logger.warning(
-                    "Remote estimates fetch failed (status=%d); keeping current state",
-                    status,
-                )
-            return RefreshResult(
-                status="failed",
-                previous_count=previous_count,
-                new_count=previous_count,
-                reason=f"http={status}",
-            )
+async def _fetch_and_swap(client: Optional[httpx.AsyncClient]) -> RefreshResult:
+    """The body of refresh_estimates_once(); the caller holds `_refresh_lock`."""
+    global _last_hash, _last_etag, _last_modified, _stale
 
-        new_hash = hashlib.sha256(body).hexdigest()
-        if new_hash == _last_hash:
-            _stale = False
-            return RefreshResult(
-                status="unchanged",
-                previous_count=previous_count,
-                new_count=previous_count,
-            )
+    # Recompute previous_count under the lock so the result reflects the
+    # state we're actually transitioning from (a previous concurrent call
+    # may have just finished and changed the estimates while we were waiting).
+    previous_count = len(get_estimates_table())
 
-        try:
-            text = body.decode("utf-8-sig")
-            new_dict, skipped = parse_estimates_from_text(text)
-        except (UnicodeDecodeError, ValueError, csv.Error, KeyError) as exc:
-            _stale = True
-            logger.warning("Remote estimates parse failed: %s", exc)
-            return RefreshResult(
-                status="failed",
-                previous_count=previous_count,
-                new_count=previous_count,
-                reason=f"parse: {exc}",
-            )
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient()
+    try:
+        fetched, status, headers = await fetch_remote_csv(client)
+    except BodyTooLarge as exc:
+        _stale = True
+        logger.warning("Remote estimates body too large: %s", exc)
+        return RefreshResult(
+            status="failed",
+            previous_count=previous_count,
+            new_count=previous_count,
+            reason=f"size: {exc}",
+        )
+    except (UnicodeDecodeError, ValueError, csv.Error, KeyError) as exc:
+        _stale = True
+        logger.warning("Remote estimates parse failed: %s", exc)
+        return RefreshResult(
+            status="failed",
+            previous_count=previous_count,
+            new_count=previous_count,
+            reason=f"parse: {exc}",
+        )
+    finally:
+        if own_client:
+            await client.aclose()
 
-        if not _passes_sanity_guard(len(new_dict), previous_count):
-            _stale = True
+    # 304 Not Modified — content unchanged, refresh succeeded
+    if status == 304:
+        _stale = False
+        return RefreshResult(
+            status="unchanged",
+            previous_count=previous_count,
+            new_count=previous_count,
+        )
+
+    # Any other non-200 (including transport errors with status=0)
+    if fetched is None:
+        was_stale_before = _stale is True
+        _stale = True
+        if not was_stale_before:
             logger.warning(
-                "Remote estimates sanity guard rejected swap (new=%d, current=%d)",
-                len(new_dict),
-                previous_count,
-            )
-            return RefreshResult(
-                status="rejected",
-                previous_count=previous_count,
-                new_count=len(new_dict),
-                reason=f"sanity guard: {len(new_dict)} < 50% of {previous_count}",
+                "Remote estimates fetch failed (status=%d); keeping current state",
+                status,
             )
+        return RefreshResult(
+            status="failed",
+            previous_count=previous_count,
+            new_count=previous_count,
+            reason=f"http={status}",
+        )
 
-        # Swap. _data_lock is a threading.Lock; acquiring it briefly from an async
-        # context is fine — the swap is microseconds.
-        with _data_lock:
-            _estimates.clear()
-            _estimates.update(new_dict)
-            _revalidate_estimates()
-        new_count = len(_estimates)
-
-        _last_hash = new_hash
-        _last_etag = headers.get("etag")
-        _last_modified = headers.get("last-modified")
+    # The body was parsed while it downloaded; an identical one is still dropped here
+    if fetched.sha256 == _last_hash:
         _stale = False
+        return RefreshResult(
+            status="unchanged",
+            previous_count=previous_count,
+            new_count=previous_count,
+        )
 
-        logger.info(
-            "Remote estimates refreshed: %d -> %d (skipped %d rows during parse)",
+    new_dict, skipped = fetched.estimates, fetched.skipped
+    if not _passes_sanity_guard(len(new_dict), previous_count):
+        _stale = True
+        logger.warning(
+            "Remote estimates sanity guard rejected swap (new=%d, current=%d)",
+            len(new_dict),
             previous_count,
-            new_count,
-            skipped,
         )
         return RefreshResult(
-            status="refreshed",
+            status="rejected",
             previous_count=previous_count,
-            new_count=new_count,
-            skipped_rows=skipped,
+            new_count=len(new_dict),
+            reason=f"sanity guard: {len(new_dict)} < 50% of {previous_count}",
         )
 
+    # The diff, its revalidation and the swap run in a worker thread; requests
+    # keep reading the old table until replace_estimates() swaps the generation.
+    diff = await asyncio.to_thread(replace_estimates, new_dict)
+
+    _last_hash = fetched.sha256
+    _last_etag = headers.get("etag")
+    _last_modified = headers.get("last-modified")
+    _stale = False
+
+    logger.info(
+        "Remote estimates refreshed: %d -> %d (+%d -%d ~%d, skipped %d rows during parse)",
+        previous_count,
+        diff.count,
+        diff.added,
+        diff.removed,
+        diff.changed,
+        skipped,
+    )
+    return RefreshResult(
+        status="refreshed",
+        previous_count=previous_count,
+        new_count=diff.count,
+        skipped_rows=skipped,
+        added=diff.added,
+        removed=diff.removed,
+        changed=diff.changed,
+    )
+
 
 async def refresh_estimates_loop() -> None:
-    """Periodic refresh task. Returns immediately when feature is disabled."""
+    """Periodic refresh task. Returns immediately when feature is disabled.
+
+    With an interval of 0 there are no periodic fetches, and with one worker
+    it returns at once. With several it still runs: the fetching worker has
+    to answer the fetches other workers request (bootstrap, admin endpoint),
+    and they adopt the outcome.
+    """
     if not settings.estimates_refresh_url:
         return
     interval = settings.estimates_refresh_interval_seconds
+    if _shared():
+        await _shared_loop(interval)
+        return
     if interval <= 0:
         return
     while True:
@@ -231,3 +572,22 @@ async def refresh_estimates_loop() -> None:
             raise
         except Exception:
             logger.exception("refresh_estimates_loop iteration crashed; will retry")
+
+
+async def _shared_loop(interval: int) -> None:
+    """Every PC2NUTS_ESTIMATES_FOLLOW_SECONDS: fetch if this worker leads and a fetch is due, else adopt."""
+    tick = settings.estimates_follow_seconds
+    if interval > 0:
+        tick = min(tick, interval)
+    while True:
+        await asyncio.sleep(tick)
+        try:
+            if _try_lead() and await asyncio.to_thread(_fetch_due, interval):
+                await refresh_estimates_once()
+            else:
+                async with _refresh_lock:
+                    await asyncio.to_thread(_adopt)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("refresh_estimates_loop iteration crashed; will retry")
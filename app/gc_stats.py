@@ -0,0 +1,106 @@
+"""Cyclic-GC pause histogram and post-load heap freezing.
+
+A loaded data generation is long-lived and never becomes cyclic garbage, but
+CPython's collector still walks every tracked object in it on each full
+(generation 2) collection, pausing whichever request happens to trigger one.
+freeze_heap() moves everything alive after a build into the permanent
+generation, which the collector skips. Frozen objects are still freed by
+reference counting, so an outgoing generation is released as usual once its
+last reader lets go.
+
+install() registers a gc callback that times every collection into
+per-generation histograms, so the effect on tail latency can be read off
+/admin/memory under load.
+"""
+
+import gc
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds; a final bucket catches anything slower
+PAUSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class _PauseHistogram:
+    """Collection pauses for one GC generation."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(PAUSE_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        i = 0
+        while i < len(PAUSE_BUCKETS) and seconds > PAUSE_BUCKETS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "max_s": round(self.max, 6),
+            "buckets": {
+                **{str(bound): n for bound, n in zip(PAUSE_BUCKETS, self.buckets)},
+                "+Inf": self.buckets[-1],
+            },
+        }
+
+
+_histograms = tuple(_PauseHistogram() for _ in range(3))
+_started: float = 0.0
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _on_gc(phase: str, info: dict) -> None:
+    # Collections never overlap (they run under the GIL), so one start time suffices
+    global _started
+    if phase == "start":
+        _started = time.perf_counter()
+    elif _started:
+        _histograms[info["generation"]].observe(time.perf_counter() - _started)
+        _started = 0.0
+
+
+def install() -> None:
+    """Start timing collections. Idempotent."""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            gc.callbacks.append(_on_gc)
+            _installed = True
+
+
+def uninstall() -> None:
+    """Stop timing collections; recorded pauses are kept."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            gc.callbacks.remove(_on_gc)
+            _installed = False
+
+
+def freeze_heap() -> int:
+    """Collect garbage, then move every surviving object out of GC tracking.
+
+    Returns the number of objects now in the permanent generation.
+    """
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def get_pause_stats() -> dict[str, object]:
+    """Pause histograms by generation, plus the current frozen-object count."""
+    return {
+        "frozen_objects": gc.get_freeze_count(),
+        "generations": {str(gen): hist.as_dict() for gen, hist in enumerate(_histograms)},
+    }
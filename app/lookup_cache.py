@@ -0,0 +1,102 @@
+"""Bounded LRU of lookup() results for hot postal codes.
+
+Traffic is heavily skewed towards a few big-city codes, and each repeat
+would otherwise rerun postal-code extraction and the tier waterfall. Entries
+are keyed on the normalized country and the postal code exactly as given,
+so two spellings of one code are cached separately.
+
+The cache belongs to one data generation at a time: data_loader rebinds it
+whenever a generation is published, which empties it, and results computed
+against an outgoing generation are not stored. When only estimates change,
+it keeps the entries the change cannot affect. Cached results are shared
+between callers and must not be mutated. Values are opaque here; data_loader
+stores each result with the tier that produced it and the key it ran on.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+# get() return value for "not cached"; None is a cacheable lookup result (no match)
+MISSING = object()
+
+
+class LookupCache:
+    """Thread-safe LRU with a per-entry TTL, tied to one owner (data generation).
+
+    `maxsize` 0 disables caching; `ttl` 0 keeps entries until evicted or the
+    owner changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[str, str], tuple[object, float]] = OrderedDict()
+        self._owner: object = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def bind(self, owner: object) -> None:
+        """Drop every entry and accept results for `owner` only from now on."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries = OrderedDict()
+            self._owner = owner
+
+    def rebind(self, owner: object, stale: Callable[[object], bool]) -> int:
+        """Accept results for `owner` only from now on, keeping the entries `stale` does not reject.
+
+        For a new owner that differs from the old one in a known set of keys.
+        Returns the number of entries dropped.
+        """
+        with self._lock:
+            kept = OrderedDict((key, entry) for key, entry in self._entries.items() if not stale(entry[0]))
+            dropped = len(self._entries) - len(kept)
+            self._entries = kept
+            self._owner = owner
+        return dropped
+
+    def get(self, owner: object, key: tuple[str, str]):
+        """Return the cached result for `key`, or MISSING."""
+        if not self.maxsize:
+            return MISSING
+        with self._lock:
+            entry = self._entries.get(key) if owner is self._owner else None
+            if entry is not None:
+                if not self.ttl or entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def put(self, owner: object, key: tuple[str, str], result: object) -> None:
+        """Cache `result` for `key` if `owner` is still the current owner."""
+        if not self.maxsize:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            if owner is not self._owner:
+                return
+            self._entries[key] = (result, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        """Counters since startup, plus the current and maximum entry counts."""
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,543 @@
+"""Compact per-country columnar storage for the postal code → NUTS3 table.
+
+A plain ``dict[tuple[str, str], str]`` pays for a tuple, two key strings, a
+value string and a hash-table slot on every row — a few hundred bytes each,
+which adds up to most of the worker RSS at full-EU scale. LookupStore keeps,
+per country, one sorted ``bytes`` blob of fixed-width postal codes plus an
+``array('H')`` of small ids into that country's table of distinct NUTS3 codes:
+roughly ``width + 2`` bytes per row, plus 4 for the insertion ordinal (below). Lookups binary-search the blob.
+
+Writes land in a plain dict staging area first, since the loaders need cheap
+first-write-wins checks while parsing; compact() folds them into the packed
+tables once a load is done. Reads see staged writes immediately. Warm starts
+skip the staging area entirely via load_sorted().
+
+compact() also records each key's insertion ordinal in an `order` column, so
+ordered_items() can still replay a country's rows in the order they were first
+written — the order majority-vote ties are broken in, as with a plain dict.
+
+Keys are normalized postal codes (see data_loader.normalize_postal_code), so
+they are always ASCII.
+
+_PrefixTable packs the Tier 3 prefix index the same way: sorted fixed-width
+prefixes, each with its vote summary spread over fixed-width count and code
+id columns, so it too can be read straight out of a snapshot mapping.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from collections.abc import ItemsView, Iterable, Iterator, Mapping, MutableMapping
+from mmap import mmap
+from operator import itemgetter
+
+# Every _FENCE_STEP-th key is kept as a separate bytes object, so find() can
+# bisect that list in C and only binary-search one short block in Python
+_FENCE_STEP = 32
+
+
+class _SortedKeys:
+    """Binary search over `count` sorted, NUL-padded keys of `width` bytes.
+
+    `keys` may be an in-process buffer or a read-only snapshot mapping (see
+    app.snapshot); `base` is where this table's keys start inside `keys`.
+    """
+
+    __slots__ = ("width", "keys", "base", "count", "_fences")
+
+    def __init__(self, width: int, keys: bytes | mmap, count: int, base: int = 0) -> None:
+        self.width = width  # every key is NUL-padded to this many bytes
+        self.keys = keys  # count * width bytes from `base`, sorted
+        self.base = base
+        self.count = count
+        self._fences: list[bytes] | None = None  # built on first find()
+
+    def find(self, key: str) -> int:
+        """Return the row index of `key`, or -1 if absent."""
+        width = self.width
+        if len(key) > width or not key.isascii():
+            return -1
+        target = key.encode("ascii").ljust(width, b"\0")
+        keys, base = self.keys, self.base
+        fences = self._fences
+        if fences is None:
+            fences = self._fences = self._build_fences()
+        block = bisect_right(fences, target) - 1
+        if block < 0:
+            return -1
+        lo = block * _FENCE_STEP
+        hi = min(lo + _FENCE_STEP, self.count)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * width
+            probe = keys[start : start + width]
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def _build_fences(self) -> list[bytes]:
+        keys, width, base = self.keys, self.width, self.base
+        stride = width * _FENCE_STEP
+        return [keys[i : i + width] for i in range(base, base + self.count * width, stride)]
+
+    def key(self, row: int) -> str:
+        """The key at `row`, without its padding."""
+        start = self.base + row * self.width
+        return self.keys[start : start + self.width].rstrip(b"\0").decode("ascii")
+
+
+class _CountryTable(_SortedKeys):
+    """Immutable sorted table for one country.
+
+    `ids` may be an in-process array or a view into a snapshot mapping.
+    `order`, when tracked, holds each row's insertion ordinal.
+    """
+
+    __slots__ = ("ids", "codes", "order")
+
+    def __init__(
+        self,
+        width: int,
+        keys: bytes | mmap,
+        ids: array | memoryview,
+        codes: tuple[str, ...],
+        base: int = 0,
+        order: array | None = None,
+    ) -> None:
+        super().__init__(width, keys, len(ids), base)
+        self.ids = ids  # ids[i] indexes codes for the i-th key
+        self.codes = codes  # distinct NUTS3 codes, in order of first insertion
+        self.order = order  # order[i] is the i-th key's insertion ordinal; None if untracked
+
+    @classmethod
+    def build(cls, entries: dict[str, str], order: dict[str, int] | None = None) -> _CountryTable:
+        """Pack a postal_code → NUTS3 dict, with each key's insertion ordinal if `order` is given."""
+        builder = _TableBuilder(max(map(len, entries), default=0), ordered=order is not None)
+        for pc in sorted(entries):
+            builder.append(pc, entries[pc], order[pc] if order is not None else 0)
+        return builder.finish()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get(self, postal_code: str) -> str | None:
+        i = self.find(postal_code)
+        return None if i < 0 else self.codes[self.ids[i]]
+
+    def items(self) -> Iterator[tuple[str, str]]:
+        """Yield (postal_code, nuts3) in postal-code order."""
+        keys, width, codes = self.keys, self.width, self.codes
+        start = self.base
+        for code_id in self.ids:
+            yield keys[start : start + width].rstrip(b"\0").decode("ascii"), codes[code_id]
+            start += width
+
+    def ordered_items(self) -> Iterator[tuple[str, str]]:
+        """Yield (postal_code, nuts3) in insertion order, or postal-code order if untracked."""
+        order = self.order
+        if order is None:
+            yield from self.items()
+            return
+        codes, ids = self.codes, self.ids
+        for row in sorted(range(self.count), key=order.__getitem__):
+            yield self.key(row), codes[ids[row]]
+
+    def ordinals(self) -> dict[str, int] | None:
+        """Return postal_code → insertion ordinal, or None if untracked."""
+        if self.order is None:
+            return None
+        return dict(zip(map(self.key, range(self.count)), self.order))
+
+    def nbytes(self) -> int:
+        """Approximate size of the packed buffers in bytes."""
+        size = len(self.ids) * (self.width + self.ids.itemsize)
+        if self.order is not None:
+            size += len(self.order) * self.order.itemsize
+        return size
+
+    def merged(self, entries: dict[str, str], order: dict[str, int] | None = None) -> _CountryTable:
+        """Return a new table holding these rows plus `entries`, none of which may already be present.
+
+        Existing rows keep their ids (new codes are appended), so they are
+        copied as raw key/id pairs rather than decoded; the two sorted runs
+        are then combined by one timsort merge. `order` gives the new keys'
+        insertion ordinals; the result tracks order only if this table does too.
+        """
+        ordered = order is not None and self.order is not None
+        width = max(self.width, max(map(len, entries), default=0))
+        code_id = {code: i for i, code in enumerate(self.codes)}
+        rows = []
+        for pc, nuts3 in entries.items():
+            i = code_id.get(nuts3)
+            if i is None:
+                if len(code_id) > 0xFFFF:
+                    raise ValueError("too many distinct NUTS3 codes for a 16-bit id")
+                i = code_id[nuts3] = len(code_id)
+            key = pc.encode("ascii").ljust(width, b"\0")
+            rows.append((key, i, order[pc]) if ordered else (key, i))
+        keys, w = self.keys, self.width
+        starts = range(self.base, self.base + len(self) * w, w)
+        if w == width:
+            old = [keys[i : i + w] for i in starts]
+        else:
+            old = [keys[i : i + w].ljust(width, b"\0") for i in starts]
+        rows += zip(old, self.ids, self.order) if ordered else zip(old, self.ids)
+        del old
+        rows.sort()
+        return _CountryTable(
+            width,
+            b"".join(map(itemgetter(0), rows)),
+            array("H", map(itemgetter(1), rows)),
+            tuple(code_id),
+            order=array("I", map(itemgetter(2), rows)) if ordered else None,
+        )
+
+
+class _TableBuilder:
+    """Append-only builder for a _CountryTable from keys in ascending order."""
+
+    __slots__ = ("width", "keys", "ids", "order", "code_id", "last")
+
+    def __init__(self, width: int, ordered: bool = False) -> None:
+        self.width = width
+        self.keys = bytearray()
+        self.ids = array("H")
+        self.order = array("I") if ordered else None
+        self.code_id: dict[str, int] = {}
+        self.last = b""
+
+    def append(self, postal_code: str, nuts3: str, ordinal: int = 0) -> None:
+        key = postal_code.encode("ascii").ljust(self.width, b"\0")
+        if len(key) != self.width:
+            raise ValueError(f"postal code {postal_code!r} is wider than {self.width}")
+        if self.ids and key <= self.last:
+            raise ValueError(f"postal code {postal_code!r} is out of order")
+        code_id = self.code_id.get(nuts3)
+        if code_id is None:
+            if len(self.code_id) > 0xFFFF:
+                raise ValueError("too many distinct NUTS3 codes for a 16-bit id")
+            code_id = self.code_id[nuts3] = len(self.code_id)
+        self.keys += key
+        self.ids.append(code_id)
+        if self.order is not None:
+            self.order.append(ordinal)
+        self.last = key
+
+    def finish(self) -> _CountryTable:
+        return _CountryTable(self.width, bytes(self.keys), self.ids, tuple(self.code_id), order=self.order)
+
+
+class _PrefixTable(Mapping):
+    """Immutable ``prefix → packed vote summary`` mapping for one country's Tier 3 index.
+
+    Values are the ints data_loader._pack_votes() builds (four 32-bit counts,
+    then three 16-bit code ids), stored as `counts` (four native uint32 per
+    row) and `ids` (three native uint16 per row) alongside the sorted
+    prefixes in `index`. The whole table is flat buffers: nothing per prefix
+    for the GC to track, and nothing to decode when it is mapped from a
+    snapshot.
+    """
+
+    __slots__ = ("index", "counts", "ids")
+
+    def __init__(
+        self,
+        width: int,
+        keys: bytes | mmap,
+        counts: array | memoryview,
+        ids: array | memoryview,
+        base: int = 0,
+    ) -> None:
+        self.index = _SortedKeys(width, keys, len(counts) // 4, base)
+        self.counts = counts
+        self.ids = ids
+
+    @classmethod
+    def build(cls, votes: dict[str, int]) -> _PrefixTable:
+        """Pack a prefix → _pack_votes() int dict."""
+        width = max(map(len, votes), default=0)
+        keys = bytearray()
+        counts = array("I")
+        ids = array("H")
+        for prefix in sorted(votes):
+            packed = votes[prefix]
+            keys += prefix.encode("ascii").ljust(width, b"\0")
+            counts.extend((packed >> shift & 0xFFFFFFFF for shift in (0, 32, 64, 96)))
+            ids.extend((packed >> shift & 0xFFFF for shift in (128, 144, 160)))
+        return cls(width, bytes(keys), counts, ids)
+
+    def find(self, prefix: str) -> int:
+        """Return the row index of `prefix`, or -1 if absent."""
+        return self.index.find(prefix)
+
+    def packed(self, row: int) -> int:
+        """The _pack_votes() int for the prefix at `row` (see find())."""
+        counts, ids = self.counts, self.ids
+        i, j = row * 4, row * 3
+        return (
+            counts[i]
+            | counts[i + 1] << 32
+            | counts[i + 2] << 64
+            | counts[i + 3] << 96
+            | ids[j] << 128
+            | ids[j + 1] << 144
+            | ids[j + 2] << 160
+        )
+
+    def __getitem__(self, prefix: str) -> int:
+        row = self.index.find(prefix)
+        if row < 0:
+            raise KeyError(prefix)
+        return self.packed(row)
+
+    def __contains__(self, prefix: object) -> bool:
+        return isinstance(prefix, str) and self.index.find(prefix) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.index.key, range(self.index.count))
+
+    def __len__(self) -> int:
+        return self.index.count
+
+    def nbytes(self) -> int:
+        """Approximate size of the packed buffers in bytes."""
+        return self.index.count * (self.index.width + 4 * self.counts.itemsize + 3 * self.ids.itemsize)
+
+
+class _StoreItemsView(ItemsView):
+    def __iter__(self):
+        return self._mapping._iter_items()
+
+
+class LookupStore(MutableMapping):
+    """``(country_code, postal_code) → nuts3`` mapping backed by _CountryTable columns."""
+
+    def __init__(self) -> None:
+        self._tables: dict[str, _CountryTable] = {}
+        self._pending: dict[tuple[str, str], str] = {}
+        self._overridden: set[str] = set()  # countries with a staged write over a packed key
+        self._len = 0
+        self._next_ordinal = 0  # insertion ordinal compact() gives the next new key
+
+    # ── Reads ───────────────────────────────────────────────────────────────
+
+    def get(self, key: tuple[str, str], default: str | None = None) -> str | None:
+        if self._pending:
+            nuts3 = self._pending.get(key)
+            if nuts3 is not None:
+                return nuts3
+        table = self._tables.get(key[0])
+        if table is None:
+            return default
+        nuts3 = table.get(key[1])
+        return default if nuts3 is None else nuts3
+
+    def __getitem__(self, key: tuple[str, str]) -> str:
+        nuts3 = self.get(key)
+        if nuts3 is None:
+            raise KeyError(key)
+        return nuts3
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, tuple) and len(key) == 2 and self.get(key) is not None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        for key, _ in self._iter_items():
+            yield key
+
+    def items(self) -> ItemsView:
+        return _StoreItemsView(self)
+
+    def _iter_items(self) -> Iterator[tuple[tuple[str, str], str]]:
+        pending = self._pending
+        for cc, table in list(self._tables.items()):
+            for pc, nuts3 in table.items():
+                key = (cc, pc)
+                yield key, pending.get(key, nuts3) if pending else nuts3
+        for key, nuts3 in list(pending.items()):
+            table = self._tables.get(key[0])
+            if table is None or table.find(key[1]) < 0:
+                yield key, nuts3
+
+    def ordered_items(self) -> Iterator[tuple[tuple[str, str], str]]:
+        """Yield (key, nuts3) with each country's keys in the order they were first written.
+
+        Same per-country order a plain dict would iterate in, as long as the
+        packed tables were built by compact() or load_sorted(ordered=True);
+        tables without an `order` column (e.g. snapshot mappings) fall back to
+        postal-code order.
+        """
+        pending = self._pending
+        for cc, table in list(self._tables.items()):
+            for pc, nuts3 in table.ordered_items():
+                key = (cc, pc)
+                yield key, pending.get(key, nuts3) if pending else nuts3
+        for key, nuts3 in list(pending.items()):
+            table = self._tables.get(key[0])
+            if table is None or table.find(key[1]) < 0:
+                yield key, nuts3
+
+    def tables(self) -> dict[str, _CountryTable]:
+        """Return the packed per-country tables (staged writes excluded)."""
+        return self._tables
+
+    def nuts3_codes(self) -> set[str]:
+        """Return every distinct NUTS3 code held, staged writes included."""
+        codes = {code for table in self._tables.values() for code in table.codes}
+        codes.update(self._pending.values())
+        return codes
+
+    def countries(self) -> dict[str, int]:
+        """Return country_code → number of packed entries (staged writes excluded)."""
+        return {cc: len(table) for cc, table in self._tables.items()}
+
+    def nbytes(self) -> int:
+        """Approximate size of all packed buffers in bytes (staged writes excluded)."""
+        return sum(table.nbytes() for table in self._tables.values())
+
+    # ── Writes ──────────────────────────────────────────────────────────────
+
+    def __setitem__(self, key: tuple[str, str], nuts3: str) -> None:
+        if key not in self._pending:
+            table = self._tables.get(key[0])
+            if table is not None and table.find(key[1]) >= 0:
+                self._overridden.add(key[0])
+            else:
+                self._len += 1
+        self._pending[key] = nuts3
+
+    def add(self, key: tuple[str, str], nuts3: str) -> bool:
+        """Stage `nuts3` under `key` unless the key is already present; return True if added.
+
+        First-write-wins insert with a single lookup (vs `in` then `[]=`).
+        """
+        if key in self._pending:
+            return False
+        table = self._tables.get(key[0])
+        if table is not None and table.find(key[1]) >= 0:
+            return False
+        self._pending[key] = nuts3
+        self._len += 1
+        return True
+
+    def __delitem__(self, key: tuple[str, str]) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._pending.pop(key, None)
+        cc, pc = key
+        table = self._tables.get(cc)
+        if table is not None and table.find(pc) >= 0:
+            entries = dict(table.items())
+            del entries[pc]
+            if entries:
+                self._tables[cc] = _CountryTable.build(entries, table.ordinals())
+            else:
+                del self._tables[cc]
+        self._len -= 1
+
+    def clear(self) -> None:
+        self._tables = {}
+        self._pending = {}
+        self._overridden = set()
+        self._len = 0
+        self._next_ordinal = 0
+
+    def copy(self) -> LookupStore:
+        """Shallow copy — packed tables are immutable and shared."""
+        other = LookupStore()
+        other._tables = dict(self._tables)
+        other._pending = dict(self._pending)
+        other._overridden = set(self._overridden)
+        other._len = self._len
+        other._next_ordinal = self._next_ordinal
+        return other
+
+    def load_sorted(self, rows: Iterable[tuple], widths: dict[str, int], ordered: bool = False) -> int:
+        """Replace the contents with (country_code, postal_code, nuts3) rows.
+
+        Rows must be sorted by (country_code, postal_code) and `widths` must give
+        each country's longest postal code. With `ordered`, each row carries a
+        fourth element, its insertion ordinal (see ordered_items()). Each
+        country's columns are filled in place, so no per-row Python objects
+        outlive the iteration — unlike writing through the staging dict, the
+        load leaves nothing behind for the allocator to hold on to. Returns the
+        row count.
+        """
+        tables: dict[str, _CountryTable] = {}
+        builder: _TableBuilder | None = None
+        current = None
+        count = 0
+        next_ordinal = 0
+        for cc, pc, nuts3, *ordinal in rows:
+            if cc != current:
+                if builder is not None:
+                    tables[current] = builder.finish()
+                if cc in tables:
+                    raise ValueError(f"rows for {cc} are not contiguous")
+                builder = _TableBuilder(widths[cc], ordered)
+                current = cc
+            if ordered:
+                builder.append(pc, nuts3, ordinal[0])
+                next_ordinal = max(next_ordinal, ordinal[0] + 1)
+            else:
+                builder.append(pc, nuts3)
+            count += 1
+        if builder is not None:
+            tables[current] = builder.finish()
+        self._tables = tables
+        self._pending = {}
+        self._overridden = set()
+        self._len = count
+        self._next_ordinal = next_ordinal
+        return count
+
+    def replace_tables(self, tables: dict[str, _CountryTable]) -> None:
+        """Swap in already-packed tables (e.g. from a snapshot), dropping staged writes."""
+        self._tables = tables
+        self._pending = {}
+        self._overridden = set()
+        self._len = sum(len(table) for table in tables.values())
+
+    def compact(self) -> None:
+        """Fold staged writes into the packed per-country tables.
+
+        Each affected country's table is rebuilt off to the side and swapped in
+        before the staging area is dropped, so concurrent readers never miss a key.
+        Countries that only gained keys are merged without decoding their packed
+        rows, so compacting repeatedly while a large file streams in stays cheap.
+        Staged keys are numbered in staging order for ordered_items(); a write
+        over an already packed key keeps that key's original ordinal.
+        """
+        if not self._pending:
+            return
+        by_country: dict[str, dict[str, str]] = {}
+        ordinals: dict[str, dict[str, int]] = {}
+        ordinal = self._next_ordinal
+        for (cc, pc), nuts3 in self._pending.items():
+            by_country.setdefault(cc, {})[pc] = nuts3
+            ordinals.setdefault(cc, {})[pc] = ordinal
+            ordinal += 1
+        self._next_ordinal = ordinal
+        for cc, updates in by_country.items():
+            table = self._tables.get(cc)
+            if table is None:
+                self._tables[cc] = _CountryTable.build(updates, ordinals[cc])
+            elif cc not in self._overridden:
+                self._tables[cc] = table.merged(updates, ordinals[cc])
+            else:
+                entries = dict(table.items())
+                entries.update(updates)
+                order = table.ordinals()
+                if order is not None:
+                    order = ordinals[cc] | order  # packed keys keep their first ordinal
+                self._tables[cc] = _CountryTable.build(entries, order)
+        self._pending = {}
+        self._overridden = set()
@@ -6,35 +6,47 @@ Data source: GISCO TERCET flat files
 
 import asyncio
 import logging
+import re
 import time
 from contextlib import asynccontextmanager
-from logging.handlers import RotatingFileHandler
 
-from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from slowapi.errors import RateLimitExceeded
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app import __version__, config as _config
+from app import __version__, access_log, config as _config, gc_stats, metrics
+from app.admission import AdmissionMiddleware, get_admission_stats
 from app.auth import AuthMiddleware, is_trusted_request
 from app.estimates_refresh import get_refresh_stale as _get_estimates_refresh_stale
 from app.config import settings
 from app.limiter import limiter
 from app.data_loader import (
-    get_data_loaded_at,
+    get_available_countries,
     get_data_stale,
     get_estimates_table,
     get_extra_source_count,
+    get_generation,
     get_loaded_countries,
+    get_lookup_cache_stats,
     get_lookup_table,
     get_nuts_names,
     load_data,
     lookup,
     normalize_country,
+    reload_due,
+)
+from app.models import (
+    BatchLookupError,
+    BatchLookupItem,
+    ErrorResponse,
+    HealthResponse,
+    NUTSResult,
+    PatternResponse,
 )
-from app.models import ErrorResponse, HealthResponse, NUTSResult, PatternResponse
 from app.postal_patterns import PATTERNS_META, POSTAL_PATTERNS
+from app.response_cache import encode_lookup
 
 logging.basicConfig(
     level=logging.INFO,
@@ -43,44 +55,93 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Access logger — separate from app logger.
-# Propagates to the root logger so pytest caplog can capture records.
-# When access_log_file is set, also writes to a dedicated rotating file.
-access_logger = logging.getLogger("app.access")
-access_logger.setLevel(logging.INFO)
-if settings.access_log_file:
-    _handler = RotatingFileHandler(
-        settings.access_log_file,
-        maxBytes=settings.access_log_max_mb * 1024 * 1024,
-        backupCount=settings.access_log_backup_count,
-    )
-    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
-    access_logger.addHandler(_handler)
-    access_logger.propagate = False
+# Text lines propagate to the root logger so pytest caplog can capture records.
+# With access_log_file set (or the JSON format), lines go through a queue to a
+# writer thread instead; see app/access_log.py.
+access_log.configure()
+
+
+class AccessLogMiddleware:
+    """Log one line per HTTP request: client, method, path, status, latency.
+
+    Plain ASGI: the status is read off the ``http.response.start`` message as
+    it is sent, and the latency runs to that point (time to response headers),
+    so the response itself passes through untouched.
+    """
 
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class AccessLogMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next) -> Response:
         start = time.monotonic()
-        response = await call_next(request)
-        duration_ms = (time.monotonic() - start) * 1000
-        log_suffix = ""
-        tid = getattr(request.state, "token_id", None)
-        if tid:
-            log_suffix = f" token_id={tid}"
-        access_logger.info(
-            "%s %s %s %d %.1fms%s",
-            request.client.host if request.client else "-",
-            request.method,
-            request.url.path,
-            response.status_code,
+        status_code = 500
+        duration_ms = 0.0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, duration_ms
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = (time.monotonic() - start) * 1000
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        client = scope.get("client")
+        access_log.log_request(
+            client[0] if client else "-",
+            scope["method"],
+            scope["path"],
+            status_code,
             duration_ms,
-            log_suffix,
+            scope.get("state", {}).get("token_id"),
         )
-        return response
+
+
+class BatchBodyLimitMiddleware:
+    """Refuse a POST /lookup/batch body over PC2NUTS_BATCH_MAX_BYTES before it is parsed.
+
+    FastAPI reads and validates the whole body before lookup_batch() can count
+    its items. A declared Content-Length over the cap gets a 413 without the
+    body being read; a body sent without one is counted as it arrives and cut
+    off at the cap. The item count is still checked in lookup_batch().
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] != "/lookup/batch":
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.batch_max_bytes
+        detail = f"Request body exceeds the maximum of {limit} bytes."
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI passes an HTTPException raised while reading the body through as is
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, receive_limited, send)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    gc_stats.install()
     logger.info("Loading TERCET data (NUTS %s)...", settings.nuts_version)
     load_data()
     table = get_lookup_table()
@@ -146,21 +207,82 @@ async def lifespan(app: FastAPI):
             logger.exception("Estimates bootstrap fetch crashed; continuing with bundled CSV")
             _estimates_refresh._stale = True
 
-        if _config.settings.estimates_refresh_interval_seconds > 0:
+        # With several workers the task also answers (or adopts) fetches other
+        # workers request, so it runs even without periodic fetches
+        if _config.settings.estimates_refresh_interval_seconds > 0 or _config.settings.workers > 1:
             estimates_refresh_task = asyncio.create_task(_estimates_refresh.refresh_estimates_loop())
             logger.info(
                 "Estimates refresh task started (interval %ds)",
                 _config.settings.estimates_refresh_interval_seconds,
             )
 
+    # ── TERCET hot reload ───────────────────────────────────────────────────
+    # Once the live data is stale or past PC2NUTS_DB_CACHE_TTL_DAYS, build the
+    # next generation in a thread and swap it in, instead of waiting for a restart.
+    reload_task: asyncio.Task | None = None
+    if _config.settings.data_reload_interval_seconds > 0:
+
+        async def _reload_loop():
+            interval = _config.settings.data_reload_interval_seconds
+            while True:
+                try:
+                    await asyncio.sleep(interval)
+                except asyncio.CancelledError:
+                    return
+                if not reload_due():
+                    continue
+                logger.info("Data is stale or expired, reloading TERCET data in the background")
+                try:
+                    await asyncio.to_thread(load_data)
+                except Exception:
+                    logger.exception(
+                        "Background data reload crashed; keeping generation %d", get_generation().id
+                    )
+
+        reload_task = asyncio.create_task(_reload_loop())
+
+    # ── Metrics sharing ─────────────────────────────────────────────────────
+    # With several workers, each one publishes its counters for whichever
+    # worker answers the next /metrics scrape to sum.
+    metrics_task: asyncio.Task | None = None
+    if _config.settings.workers > 1:
+
+        async def _metrics_loop():
+            while True:
+                try:
+                    await asyncio.to_thread(metrics.write_worker_snapshot)
+                except OSError as exc:
+                    logger.warning("Could not write worker metrics: %s", exc)
+                try:
+                    await asyncio.sleep(_config.settings.metrics_flush_seconds)
+                except asyncio.CancelledError:
+                    return
+
+        metrics_task = asyncio.create_task(_metrics_loop())
+
     yield
 
+    if metrics_task is not None:
+        metrics_task.cancel()
+        try:
+            await metrics_task
+        except asyncio.CancelledError:
+            pass
+
+    if reload_task is not None:
+        reload_task.cancel()
+        try:
+            await reload_task
+        except asyncio.CancelledError:
+            pass
+
     if refresh_task is not None:
         refresh_task.cancel()
         try:
             await refresh_task
         except asyncio.CancelledError:
             pass
+        token_db.close()
 
     if estimates_refresh_task is not None:
         estimates_refresh_task.cancel()
@@ -185,6 +307,7 @@ app.state.limiter = limiter
 
 
 def _rate_limit_handler(request: Request, exc: RateLimitExceeded) -> JSONResponse:
+    metrics.RATE_LIMITED.inc(request.url.path)
     headers = {}
     if settings.rate_limit_headers:
         window_seconds = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
@@ -214,18 +337,30 @@ if settings.cors_origins:
         app.add_middleware(
             CORSMiddleware,
             allow_origins=origins,
-            allow_methods=["GET"],
+            allow_methods=["GET", "POST"],
             allow_headers=["*"],
         )
 
 
+# Admission runs inside auth, which marks trusted requests for the priority lane
+app.add_middleware(BatchBodyLimitMiddleware)
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(AuthMiddleware)
 app.add_middleware(AccessLogMiddleware)
 
+# Same constraints GET /lookup puts on its query parameters
+_COUNTRY_RE = re.compile(r"^[A-Za-z]{2}$")
+_POSTAL_CODE_MAX_LENGTH = 20
+
+
+def _unsupported_country_detail(cc: str) -> str:
+    return f"Country '{cc}' is not supported. Available countries: {get_available_countries()}"
+
 
-def _available_countries_str() -> str:
-    """Sorted comma-separated list of country codes with loaded data."""
-    return ", ".join(sorted(get_loaded_countries()))
+def _not_found_detail(postal_code: str, cc: str) -> str:
+    pattern = POSTAL_PATTERNS.get(cc)
+    hint = f" Expected format: {pattern['example']}" if pattern else ""
+    return f"No NUTS mapping found for postal code '{postal_code}' in country '{cc}'.{hint}"
 
 
 @app.get(
@@ -235,13 +370,13 @@ def _available_countries_str() -> str:
         400: {"model": ErrorResponse, "description": "Unsupported country"},
         404: {"model": ErrorResponse, "description": "Postal code not found"},
         429: {"model": ErrorResponse, "description": "Rate limit exceeded"},
+        503: {"model": ErrorResponse, "description": "Worker overloaded; retry after `Retry-After` seconds"},
     },
     summary="Look up NUTS codes for a postal code",
 )
 @limiter.limit(settings.rate_limit, exempt_when=is_trusted_request)
 def lookup_postal_code(
     request: Request,
-    response: Response,
     postal_code: str = Query(
         ...,
         max_length=20,
@@ -260,25 +395,75 @@ def lookup_postal_code(
     cc = normalize_country(country)
 
     if cc not in get_loaded_countries():
-        raise HTTPException(
-            status_code=400,
-            detail=(f"Country '{cc}' is not supported. Available countries: {_available_countries_str()}"),
-        )
+        metrics.LOOKUP_ERRORS.inc("400", cc)
+        raise HTTPException(status_code=400, detail=_unsupported_country_detail(cc))
 
     result = lookup(country, postal_code)
     if result is None:
-        pattern = POSTAL_PATTERNS.get(cc)
-        hint = f" Expected format: {pattern['example']}" if pattern else ""
+        metrics.LOOKUP_ERRORS.inc("404", cc)
+        raise HTTPException(status_code=404, detail=_not_found_detail(postal_code, cc))
+    # Pre-encoded NUTSResult body; response_model still documents the schema
+    return Response(
+        content=encode_lookup(postal_code, cc, result),
+        media_type="application/json",
+        headers={"Cache-Control": f"public, max-age={settings.cache_max_age}"},
+    )
+
+
+@app.post(
+    "/lookup/batch",
+    response_model=list[NUTSResult | BatchLookupError],
+    responses={
+        413: {
+            "model": ErrorResponse,
+            "description": "More items than PC2NUTS_BATCH_MAX_SIZE, or a body over PC2NUTS_BATCH_MAX_BYTES",
+        },
+        429: {"model": ErrorResponse, "description": "Rate limit exceeded"},
+    },
+    summary="Look up NUTS codes for many postal codes at once",
+    description=(
+        "Runs the same lookup as `GET /lookup` for every item and returns one entry per "
+        "item, in input order: a result, or an error object carrying the `status` and "
+        "`detail` `GET /lookup` would have returned for it. The whole batch counts as a "
+        "single request against the rate limit."
+    ),
+)
+@limiter.limit(settings.rate_limit, exempt_when=is_trusted_request)
+def lookup_batch(
+    request: Request,
+    response: Response,
+    items: list[BatchLookupItem] = Body(..., description="Items to look up, at most PC2NUTS_BATCH_MAX_SIZE"),
+):
+    if len(items) > settings.batch_max_size:
         raise HTTPException(
-            status_code=404,
-            detail=(f"No NUTS mapping found for postal code '{postal_code}' in country '{cc}'.{hint}"),
+            status_code=413,
+            detail=f"Batch of {len(items)} items exceeds the maximum of {settings.batch_max_size}.",
         )
-    response.headers["Cache-Control"] = f"public, max-age={settings.cache_max_age}"
-    return NUTSResult(
-        postal_code=postal_code,
-        country_code=cc,
-        **result,
-    )
+
+    loaded = get_loaded_countries()
+    results: list[dict] = []
+    append = results.append
+    for item in items:
+        country, postal_code = item.country, item.postal_code
+        cc = normalize_country(country)
+        if not _COUNTRY_RE.match(country):
+            error = (422, f"Invalid country code '{country}'; expected two letters.")
+        elif len(postal_code) > _POSTAL_CODE_MAX_LENGTH:
+            error = (422, f"Postal code is longer than {_POSTAL_CODE_MAX_LENGTH} characters.")
+        elif cc not in loaded:
+            error = (400, _unsupported_country_detail(cc))
+        else:
+            result = lookup(cc, postal_code)
+            if result is not None:
+                append({"postal_code": postal_code, "country_code": cc, **result})
+                continue
+            error = (404, _not_found_detail(postal_code, cc))
+        if error[0] != 422:
+            metrics.LOOKUP_ERRORS.inc(str(error[0]), cc)
+        append({"postal_code": postal_code, "country_code": cc, "status": error[0], "detail": error[1]})
+    # The items are plain dicts already in the documented shape; skipping
+    # per-item response-model validation is most of the batch's speed-up
+    return JSONResponse(results)
 
 
 @app.get(
@@ -287,6 +472,7 @@ def lookup_postal_code(
     responses={
         404: {"model": ErrorResponse, "description": "No pattern for this country"},
         429: {"model": ErrorResponse, "description": "Rate limit exceeded"},
+        503: {"model": ErrorResponse, "description": "Worker overloaded; retry after `Retry-After` seconds"},
     },
     summary="Get postal code regex pattern for a country",
 )
@@ -353,9 +539,7 @@ def root(request: Request, response: Response):
 )
 def health(response: Response):
     response.headers["Cache-Control"] = "no-cache, no-store"
-    table = get_lookup_table()
-    estimates = get_estimates_table()
-    stale = get_data_stale()
+    gen = get_generation()
 
     # Token DB staleness — only meaningful when the feature is enabled.
     from app import auth as auth_mod
@@ -363,20 +547,45 @@ def health(response: Response):
     token_db_stale = auth_mod._token_db_stale if _config.settings.token_db_url else None
 
     return HealthResponse(
-        status="ok" if len(table) > 0 else "no_data",
-        total_postal_codes=len(table),
-        total_estimates=len(estimates),
-        total_nuts_names=len(get_nuts_names()),
+        status="ok" if len(gen.lookup) > 0 else "no_data",
+        total_postal_codes=len(gen.lookup),
+        total_estimates=len(gen.estimates),
+        total_nuts_names=len(gen.nuts_names),
         nuts_version=settings.nuts_version,
-        extra_sources=get_extra_source_count(),
+        extra_sources=gen.extra_source_count,
         patterns_version=PATTERNS_META.get("version", "unknown"),
-        data_stale=stale,
-        last_updated=get_data_loaded_at(),
+        data_stale=gen.stale,
+        last_updated=gen.loaded_at,
+        data_generation=gen.id,
+        data_built_at=gen.built_at,
+        data_build_timings=gen.build_timings,
+        lookup_cache=get_lookup_cache_stats(),
+        admission=get_admission_stats(),
+        access_log=access_log.get_access_log_stats(),
         token_db_stale=token_db_stale,
         estimates_refresh_stale=_get_estimates_refresh_stale(),
     )
 
 
+@app.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description=(
+        "Prometheus text exposition format: lookups per answering tier, stage latency "
+        "histograms, 400/404 counts per country, rate-limit and admission rejections, "
+        "dropped access-log lines and GC pauses. Summed over all workers on the host "
+        "when `PC2NUTS_WORKERS` > 1."
+    ),
+    response_class=PlainTextResponse,
+)
+def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        metrics.render(metrics.collect()),
+        media_type=metrics.CONTENT_TYPE,
+        headers={"Cache-Control": "no-cache, no-store"},
+    )
+
+
 @app.post(
     "/admin/refresh-estimates",
     summary="Force-refresh estimates from the configured remote URL",
@@ -428,6 +637,9 @@ async def admin_refresh_estimates(request: Request) -> JSONResponse:
             "previous_count": result.previous_count,
             "new_count": result.new_count,
             "skipped_rows": result.skipped_rows,
+            "added": result.added,
+            "removed": result.removed,
+            "changed": result.changed,
             "source_url": settings.estimates_refresh_url,
         },
     )
@@ -439,7 +651,8 @@ async def admin_refresh_estimates(request: Request) -> JSONResponse:
     description=(
         "Operator-only — requires `Authorization: Bearer <trusted-token>`. "
         "Returns sizes of in-memory state, /proc process counters, asyncio task / "
-        "thread / file-descriptor counts, and a `gc.get_objects()` type histogram. "
+        "thread / file-descriptor counts, GC pause histograms by generation, and a "
+        "`gc.get_objects()` type histogram. "
         "Intended for one-off leak investigations; safe to call repeatedly but "
         "the gc walk takes ~hundreds of ms on large heaps."
     ),
@@ -457,18 +670,21 @@ async def admin_memory(request: Request) -> JSONResponse:
 
     from app import auth as _auth
     from app import data_loader as _dl
+    from app import response_cache as _rc
     from app.limiter import limiter as _limiter
 
+    gen = _dl.get_generation()
     sizes: dict[str, int] = {
-        "data_loader._lookup": len(_dl._lookup),
-        "data_loader._estimates": len(_dl._estimates),
-        "data_loader._prefix_index_countries": len(_dl._prefix_index),
-        "data_loader._prefix_index_total_entries": sum(
-            sum(len(v) for v in idx.values()) for idx in _dl._prefix_index.values()
-        ),
-        "data_loader._nuts_names": len(_dl._nuts_names),
-        "data_loader._single_nuts3": len(_dl._single_nuts3),
-        "data_loader._country_fallback": len(_dl._country_fallback),
+        "data_loader._lookup": len(gen.lookup),
+        "data_loader._lookup_packed_bytes": gen.lookup.nbytes(),
+        "data_loader._estimates": len(gen.estimates),
+        "data_loader._prefix_index_countries": len(gen.prefix_index),
+        "data_loader._prefix_index_prefixes": sum(len(idx) for idx in gen.prefix_index.values()),
+        "data_loader._nuts_names": len(gen.nuts_names),
+        "data_loader._single_nuts3": len(gen.single_nuts3),
+        "data_loader._country_fallback": len(gen.country_fallback),
+        "data_loader._countries": len(gen.countries.loaded),
+        "response_cache._templates": len(_rc._templates),
         "auth._db_tokens": len(_auth._db_tokens),
     }
     storage = getattr(_limiter, "_storage", None)
@@ -526,5 +742,6 @@ async def admin_memory(request: Request) -> JSONResponse:
             "asyncio_tasks": task_info,
             "thread_count": threading.active_count(),
             "gc_top_30_types": top_types,
+            "gc_pauses": gc_stats.get_pause_stats(),
         },
     )
@@ -0,0 +1,341 @@
+"""Prometheus metrics for GET /metrics, summed across the workers of a host.
+
+Counters and histograms are kept in process and updated on the request path
+(which lookup() tier answered, how long postal-code extraction and the tier
+waterfall took, 400/404s per country, rate-limit rejections). Per-worker
+state owned by other modules (lookup cache, admission control, access log
+writer, GC pauses) is read when a snapshot is taken.
+
+With PC2NUTS_WORKERS > 1 a scrape reaches one worker at random, so every
+worker also writes its snapshot to `<data_dir>/metrics/<pid>.json` every
+PC2NUTS_METRICS_FLUSH_SECONDS. The answering worker flushes its own file and
+sums the files, so every worker's share of the total only ever grows,
+whichever worker answers. A file not rewritten for a minute (or three flush
+intervals, if longer) belongs to a worker that has exited. Its totals are
+folded into `retired.json`, which is summed with the rest, so they stay in
+the total instead of reading as a counter reset.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from app.config import settings
+from app.snapshot import snapshot_lock
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds for the lookup stage histograms (a few µs to 10 ms)
+STAGE_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.001, 0.01)
+
+# Guards creating label children and walking them for a snapshot. Updates to
+# a child take no lock: `+=` on an attribute cannot be interrupted by another
+# thread under the GIL, and a lock would double the cost of a cached lookup.
+_lock = threading.Lock()
+_registry: list["Counter | Histogram"] = []
+
+# Orders this worker's flushes, so an older snapshot never replaces a newer one
+_flush_lock = threading.Lock()
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _HistogramSeries:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Counter:
+    """Monotonic counter with one value per combination of label values.
+
+    Hot paths should bind `labels(...)` once and call `.inc()` on the child.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.children: dict[tuple[str, ...], _CounterValue] = {}
+        _registry.append(self)
+
+    def labels(self, *values: str) -> _CounterValue:
+        child = self.children.get(values)
+        if child is None:
+            with _lock:
+                child = self.children.setdefault(values, _CounterValue())
+        return child
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.labels(*labels).inc(amount)
+
+    def family(self) -> dict:
+        samples = [[list(k), child.value] for k, child in self.children.items()]
+        return _family("counter", self.help, self.labelnames, samples)
+
+
+class Histogram:
+    """Histogram with fixed bucket upper bounds and one series per combination of label values."""
+
+    def __init__(
+        self, name: str, help: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self.children: dict[tuple[str, ...], _HistogramSeries] = {}
+        _registry.append(self)
+
+    def labels(self, *values: str) -> _HistogramSeries:
+        child = self.children.get(values)
+        if child is None:
+            with _lock:
+                child = self.children.setdefault(values, _HistogramSeries(self.buckets))
+        return child
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.labels(*labels).observe(value)
+
+    def family(self) -> dict:
+        samples = [[list(k), list(c.counts), c.sum, c.count] for k, c in self.children.items()]
+        return _family("histogram", self.help, self.labelnames, samples, self.buckets)
+
+
+def _family(kind: str, help: str, labelnames, samples: list, buckets=None) -> dict:
+    family = {"type": kind, "help": help, "labels": list(labelnames), "samples": samples}
+    if buckets is not None:
+        family["buckets"] = list(buckets)
+    return family
+
+
+LOOKUPS = Counter(
+    "pc2nuts_lookups_total",
+    "lookup() calls by the tier that answered (none = no match), including repeats served from cache",
+    ("tier",),
+)
+LOOKUP_STAGE_SECONDS = Histogram(
+    "pc2nuts_lookup_stage_seconds",
+    "Time spent in extract_postal_code and in the tier waterfall, per uncached lookup",
+    STAGE_BUCKETS,
+    ("stage",),
+)
+LOOKUP_ERRORS = Counter(
+    "pc2nuts_lookup_errors_total",
+    "Lookups answered 400 (unsupported country) or 404 (no match), by country",
+    ("status", "country"),
+)
+RATE_LIMITED = Counter(
+    "pc2nuts_rate_limited_total",
+    "Requests rejected with 429 by the per-IP rate limit",
+    ("path",),
+)
+
+
+def _runtime_families() -> dict[str, dict]:
+    """Counters and histograms kept by other modules, read at snapshot time."""
+    from app import access_log, admission, data_loader, gc_stats
+
+    cache = data_loader.get_lookup_cache_stats()
+    shed = admission.get_admission_stats()
+    log = access_log.get_access_log_stats()
+    families = {
+        "pc2nuts_lookup_cache_requests_total": _family(
+            "counter",
+            "lookup() result-cache probes by outcome",
+            ("result",),
+            [[["hit"], cache["hits"]], [["miss"], cache["misses"]]],
+        ),
+        "pc2nuts_admission_shed_total": _family(
+            "counter",
+            "Requests shed with 503 by admission control, by lane",
+            ("lane",),
+            [[["anonymous"], shed["shed"]], [["trusted"], shed["trusted_shed"]]],
+        ),
+        "pc2nuts_access_log_dropped_total": _family(
+            "counter",
+            "Access log lines dropped because the writer queue was full",
+            (),
+            [[[], log["dropped"]]],
+        ),
+    }
+    samples = []
+    for generation, hist in enumerate(gc_stats._histograms):
+        samples.append([[str(generation)], list(hist.buckets), hist.total, hist.count])
+    families["pc2nuts_gc_pause_seconds"] = _family(
+        "histogram",
+        "Cyclic GC pause duration by collected generation",
+        ("generation",),
+        samples,
+        gc_stats.PAUSE_BUCKETS,
+    )
+    return families
+
+
+def snapshot() -> dict[str, dict]:
+    """This worker's metric families in the JSON-serialisable form merge() and render() take."""
+    with _lock:
+        families = {metric.name: metric.family() for metric in _registry}
+    families.update(_runtime_families())
+    return families
+
+
+def merge(snapshots: list[dict[str, dict]]) -> dict[str, dict]:
+    """Sum metric families sample by sample (matched on label values) across workers."""
+    merged: dict[str, dict] = {}
+    for snap in snapshots:
+        for name, family in snap.items():
+            target = merged.get(name)
+            if target is None:
+                merged[name] = {**family, "samples": [_copy_sample(s) for s in family["samples"]]}
+                continue
+            if family.get("buckets") != target.get("buckets"):
+                continue  # written by a worker running a different version
+            by_labels = {tuple(s[0]): s for s in target["samples"]}
+            for sample in family["samples"]:
+                existing = by_labels.get(tuple(sample[0]))
+                if existing is None:
+                    target["samples"].append(_copy_sample(sample))
+                elif family["type"] == "counter":
+                    existing[1] += sample[1]
+                else:
+                    existing[1] = [a + b for a, b in zip(existing[1], sample[1])]
+                    existing[2] += sample[2]
+                    existing[3] += sample[3]
+    return merged
+
+
+def _copy_sample(sample: list) -> list:
+    return [list(part) if isinstance(part, list) else part for part in sample]
+
+
+def _labels(names: list[str], values: list[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(families: dict[str, dict]) -> str:
+    """Prometheus text exposition format (0.0.4) for `families`."""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        names = family["labels"]
+        for sample in sorted(family["samples"], key=lambda s: s[0]):
+            values = sample[0]
+            if family["type"] == "counter":
+                lines.append(f"{name}{_labels(names, values)} {_number(sample[1])}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*family["buckets"], "+Inf"], sample[1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{float(bound)!r}"'
+                lines.append(f"{name}_bucket{_labels(names, values, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, values)} {_number(float(sample[2]))}")
+            lines.append(f"{name}_count{_labels(names, values)} {sample[3]}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Sharing across workers ──────────────────────────────────────────────────
+
+
+def _metrics_dir() -> Path:
+    return Path(settings.data_dir) / "metrics"
+
+
+def _stale_after() -> float:
+    return max(60.0, 3.0 * settings.metrics_flush_seconds)
+
+
+def _write_json(path: Path, families: dict[str, dict]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(families))
+    os.replace(tmp, path)
+
+
+def write_worker_snapshot() -> None:
+    """Write this worker's snapshot for the other workers to sum. Atomic rename."""
+    directory = _metrics_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with _flush_lock:
+        _write_json(directory / f"{os.getpid()}.json", snapshot())
+
+
+def collect() -> dict[str, dict]:
+    """Metric families for /metrics: this worker's, plus the other workers' when there are several.
+
+    Only flushed files are summed, this worker's included, and an exited
+    worker's file is folded into `retired.json` rather than dropped, so no
+    total ever goes down between scrapes. Scrapes hold a lock on the
+    directory while they read, so none sees a file both before and after it
+    is folded.
+    """
+    if settings.workers <= 1:
+        return snapshot()
+    write_worker_snapshot()
+    directory = _metrics_dir()
+    retired_path = directory / "retired.json"
+    snapshots = []
+    with snapshot_lock(retired_path):
+        try:
+            retired = json.loads(retired_path.read_text())
+        except FileNotFoundError:
+            retired = {}
+        except (OSError, ValueError) as exc:
+            logger.warning("Skipping unreadable retired worker metrics: %s", exc)
+            retired = {}
+        cutoff = time.time() - _stale_after()
+        for path in directory.glob("*.json"):
+            if path == retired_path:
+                continue
+            try:
+                exited = path.stat().st_mtime < cutoff
+                families = json.loads(path.read_text())
+            except (OSError, ValueError) as exc:
+                logger.warning("Skipping unreadable worker metrics %s: %s", path.name, exc)
+                continue
+            if not exited:
+                snapshots.append(families)
+                continue
+            retired = merge([retired, families])
+            try:
+                _write_json(retired_path, retired)
+                path.unlink()
+            except OSError as exc:
+                logger.warning("Could not retire worker metrics %s: %s", path.name, exc)
+        snapshots.append(retired)
+    return merge(snapshots)
@@ -20,6 +20,18 @@ class NUTSResult(BaseModel):
     nuts3_confidence: float = Field(description="Confidence score for NUTS3 (0.0–1.0)", ge=0.0, le=1.0)
 
 
+class BatchLookupItem(BaseModel):
+    country: str = Field(description="ISO 3166-1 alpha-2 country code (e.g. 'PL', 'AT', 'DE')")
+    postal_code: str = Field(description="Postal code to look up (e.g. '00-950', '1010', '10115')")
+
+
+class BatchLookupError(BaseModel):
+    postal_code: str = Field(description="The queried postal code, as given")
+    country_code: str = Field(description="The queried country code (normalized)")
+    status: int = Field(description="Status GET /lookup would have returned for this item (400, 404 or 422)")
+    detail: str = Field(description="Human-readable error message, as from GET /lookup")
+
+
 class ErrorResponse(BaseModel):
     detail: str
 
@@ -42,5 +54,25 @@ class HealthResponse(BaseModel):
     last_updated: str = Field(
         description="ISO 8601 timestamp of when TERCET data was last successfully loaded"
     )
+    data_generation: int = Field(
+        default=0, description="Id of the live data generation; increments on every reload"
+    )
+    data_built_at: str = Field(
+        default="", description="ISO 8601 timestamp of when the live generation was swapped in"
+    )
+    data_build_timings: dict[str, float] = Field(
+        default_factory=dict, description="Seconds spent in each phase of building the live generation"
+    )
+    lookup_cache: dict[str, int] = Field(
+        default_factory=dict, description="Size and hit/miss/eviction counters of this worker's lookup cache"
+    )
+    admission: dict[str, int | float] = Field(
+        default_factory=dict,
+        description="In-flight requests, cap, shed counts and queue delay of this worker's admission control",
+    )
+    access_log: dict[str, int] = Field(
+        default_factory=dict,
+        description="Queue depth and written/dropped/blocked line counts of this worker's access log writer",
+    )
     token_db_stale: bool | None = None
     estimates_refresh_stale: bool | None = None
@@ -44,6 +44,7 @@ _COMPILED: dict[str, re.Pattern] = {
 
 
 _THOUSANDS_RE = re.compile(r"^\d{1,3}(\.\d{3})+$")
+_FLOAT_SUFFIX_RE = re.compile(r"\.0+$")
 
 
 def _preprocess(raw: str, entry: dict | None) -> str:
@@ -53,12 +54,14 @@ def _preprocess(raw: str, entry: dict | None) -> str:
     exports, or database dumps.
     """
     code = raw
-    # 1. Remove dot thousand-separators: "13.600" → "13600"
-    #    Must run before .0 stripping so "13.000" → "13000" (not "13").
-    if _THOUSANDS_RE.match(code):
-        code = code.replace(".", "")
-    # 2. Strip Excel float suffix: "28040.0" → "28040"
-    code = re.sub(r"\.0+$", "", code)
+    # Steps 1 and 2 only apply to inputs with a dot, which most are not
+    if "." in code:
+        # 1. Remove dot thousand-separators: "13.600" → "13600"
+        #    Must run before .0 stripping so "13.000" → "13000" (not "13").
+        if _THOUSANDS_RE.match(code):
+            code = code.replace(".", "")
+        # 2. Strip Excel float suffix: "28040.0" → "28040"
+        code = _FLOAT_SUFFIX_RE.sub("", code)
     # 3. Country-aware leading-zero padding (digit-only, exactly 1 short)
     if entry:
         expected = entry.get("expected_digits")
@@ -0,0 +1,76 @@
+"""Pre-encoded JSON bodies for successful /lookup responses.
+
+A /lookup body is the NUTSResult fields in declaration order. Everything after
+the echoed postal_code and country_code — match type, NUTS codes, names and
+confidences — comes from a small set of distinct results (a few per NUTS3
+region), however many postal codes point at them. Each distinct tail is
+encoded once and spliced behind the two echoed fields, so a successful lookup
+skips NUTSResult construction, response_model validation and JSON encoding.
+
+The body is byte-for-byte what FastAPI renders for NUTSResult; /lookup keeps
+response_model=NUTSResult, so the OpenAPI schema is unchanged. Templates are
+dropped whenever a new data generation is published, since a reload can
+change names and estimates.
+"""
+
+import json
+import threading
+from collections.abc import Mapping
+
+from app.data_loader import get_generation
+from app.models import NUTSResult
+
+# Upper bound on cached tails; reached only if a generation yields an unusual
+# spread of estimate confidences. The cache starts over rather than evicting.
+_MAX_TEMPLATES = 100_000
+
+# NUTSResult fields after the two echoed ones, in the order FastAPI emits them
+_TAIL_FIELDS = tuple(name for name in NUTSResult.model_fields if name not in ("postal_code", "country_code"))
+_CONFIDENCE_FIELDS = frozenset(name for name in _TAIL_FIELDS if name.endswith("_confidence"))
+
+# Same output as pydantic's JSON mode for these field types: compact, UTF-8, floats as repr
+_encode = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode
+
+_templates: dict[tuple, bytes] = {}
+_templates_generation: int = -1
+_templates_lock = threading.Lock()
+
+
+def _encode_tail(result: Mapping) -> bytes:
+    parts = []
+    for name in _TAIL_FIELDS:
+        value = result[name]
+        if name in _CONFIDENCE_FIELDS:
+            value = float(value)
+        parts.append(f'"{name}":{_encode(value)}')
+    return ("," + ",".join(parts) + "}").encode()
+
+
+def _tail(result: Mapping) -> bytes:
+    """Encoded body after country_code for `result`, cached per data generation."""
+    global _templates, _templates_generation
+    key = tuple(result[name] for name in _TAIL_FIELDS)
+    generation = get_generation().id
+    if generation == _templates_generation:
+        tail = _templates.get(key)
+        if tail is not None:
+            return tail
+    tail = _encode_tail(result)
+    with _templates_lock:
+        if generation != _templates_generation or len(_templates) >= _MAX_TEMPLATES:
+            # Rebind rather than clear: a reader still holding the old dict is unaffected
+            _templates = {}
+            _templates_generation = generation
+        _templates[key] = tail
+    return tail
+
+
+def encode_lookup(postal_code: str, country_code: str, result: Mapping) -> bytes:
+    """Return the JSON body /lookup serves for `result`, echoing the given codes."""
+    return (
+        b'{"postal_code":'
+        + _encode(postal_code).encode()
+        + b',"country_code":'
+        + _encode(country_code).encode()
+        + _tail(result)
+    )
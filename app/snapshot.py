@@ -0,0 +1,268 @@
+"""Read-only binary snapshot of the loaded data, shared by all workers via mmap.
+
+With PC2NUTS_WORKERS=N every worker runs load_data(), and each used to build
+its own private copy of the lookup table from SQLite. Instead, the first worker
+to take the snapshot lock loads the table as before and writes it out as a
+snapshot file next to the SQLite cache; every worker, the builder included,
+then memory-maps that file read-only. LookupStore reads the packed columns
+straight from the mapping, and so does each country's _PrefixTable (the Tier
+3 prefix summaries, the largest derived index), so those pages sit once in
+the OS page cache however many workers there are.
+
+The rest of what load_data() would otherwise derive on a warm start — the
+single-NUTS3 map, country fallback, estimates and names — rides along as a
+marshal-encoded payload, so a worker goes from snapshot to ready without
+touching SQLite or rebuilding an index. The payload is decoded into private
+objects in every worker; it is small next to the mapped tables.
+
+Layout:
+
+    magic      8 bytes   b"PC2NSNAP"
+    version    u32 (LE)  FORMAT_VERSION
+    meta_len   u32 (LE)  length of the JSON metadata that follows
+    meta       JSON      see write_snapshot(); per-country table descriptors
+                         give offsets relative to the data section
+    padding    to an 8-byte boundary
+    data       per country: keys blob, then native-endian uint16 ids;
+               then per country: prefix keys blob, native uint32 vote
+               counts, native uint16 vote code ids; then the payload.
+               Every blob starts on an 8-byte boundary
+
+marshal's format is only stable within one Python minor version, so a snapshot
+written by another interpreter is rejected like any other format mismatch.
+"""
+
+from __future__ import annotations
+
+import json
+import marshal
+import mmap
+import struct
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NamedTuple
+
+from app.lookup_store import _CountryTable, _PrefixTable
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover — non-POSIX dev machines; Docker is Linux
+    fcntl = None
+
+MAGIC = b"PC2NSNAP"
+FORMAT_VERSION = 3
+
+_HEADER = struct.Struct("<8sII")
+_ALIGN = 8
+_PYTHON = "{}.{}".format(*sys.version_info[:2])
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated or in an unknown format."""
+
+
+class Snapshot(NamedTuple):
+    tables: dict[str, _CountryTable]
+    meta: dict
+    payload: object  # whatever was passed to write_snapshot(), or None
+    prefixes: dict[str, _PrefixTable]
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+@contextmanager
+def snapshot_lock(path: Path):
+    """Hold an exclusive advisory lock on `<path>.lock` for the duration.
+
+    Serialises verify-or-build across the workers of one host: the first
+    worker in builds the snapshot, the rest wait and then map the finished
+    file. A no-op where fcntl is unavailable.
+    """
+    if fcntl is None:
+        yield
+        return
+    lock_path = path.with_name(path.name + ".lock")
+    with open(lock_path, "a+b") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def write_snapshot(
+    path: Path,
+    tables: dict[str, _CountryTable],
+    meta: dict,
+    payload: object = None,
+    prefixes: dict[str, _PrefixTable] | None = None,
+) -> None:
+    """Write `tables`, `prefixes`, caller-supplied `meta` and `payload` to `path` via an atomic rename.
+
+    `meta` must be JSON-serialisable and `payload` marshal-serialisable (plain
+    dicts, tuples, strings and numbers); the table and payload descriptors,
+    byte order and Python version are added to `meta` here. Raises OSError on
+    write failure and ValueError if `payload` cannot be marshalled.
+    """
+    prefixes = prefixes or {}
+    descriptors: dict[str, dict] = {}
+    offset = 0
+    for cc, table in tables.items():
+        n = len(table)
+        keys_len = n * table.width
+        ids_offset = _aligned(offset + keys_len)
+        descriptors[cc] = {
+            "width": table.width,
+            "count": n,
+            "codes": list(table.codes),
+            "keys": offset,
+            "ids": ids_offset,
+        }
+        offset = _aligned(ids_offset + n * 2)
+    prefix_descriptors: dict[str, dict] = {}
+    for cc, prefix_table in prefixes.items():
+        index = prefix_table.index
+        counts_offset = _aligned(offset + index.count * index.width)
+        ids_offset = _aligned(counts_offset + index.count * 16)
+        prefix_descriptors[cc] = {
+            "width": index.width,
+            "count": index.count,
+            "keys": offset,
+            "counts": counts_offset,
+            "ids": ids_offset,
+        }
+        offset = _aligned(ids_offset + index.count * 6)
+    payload_bytes = marshal.dumps(payload)
+    payload_offset = offset
+    offset = _aligned(payload_offset + len(payload_bytes))
+    meta_bytes = json.dumps(
+        {
+            **meta,
+            "byteorder": sys.byteorder,
+            "python": _PYTHON,
+            "tables": descriptors,
+            "prefixes": prefix_descriptors,
+            "payload": {"offset": payload_offset, "length": len(payload_bytes)},
+        },
+        separators=(",", ":"),
+    ).encode()
+    data_start = _aligned(_HEADER.size + len(meta_bytes))
+
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes)))
+            f.write(meta_bytes)
+            for cc, table in tables.items():
+                d = descriptors[cc]
+                f.seek(data_start + d["keys"])
+                start = table.base
+                f.write(table.keys[start : start + d["count"] * table.width])
+                f.seek(data_start + d["ids"])
+                f.write(table.ids.tobytes())
+            for cc, prefix_table in prefixes.items():
+                d = prefix_descriptors[cc]
+                index = prefix_table.index
+                f.seek(data_start + d["keys"])
+                f.write(index.keys[index.base : index.base + d["count"] * index.width])
+                f.seek(data_start + d["counts"])
+                f.write(prefix_table.counts.tobytes())
+                f.seek(data_start + d["ids"])
+                f.write(prefix_table.ids.tobytes())
+            f.seek(data_start + payload_offset)
+            f.write(payload_bytes)
+            f.truncate(data_start + offset)
+        tmp.replace(path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _read_header(f) -> tuple[dict, int]:
+    raw = f.read(_HEADER.size)
+    if len(raw) != _HEADER.size:
+        raise SnapshotError("truncated header")
+    magic, version, meta_len = _HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise SnapshotError("not a snapshot file")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"format version {version}, expected {FORMAT_VERSION}")
+    meta_bytes = f.read(meta_len)
+    if len(meta_bytes) != meta_len:
+        raise SnapshotError("truncated metadata")
+    try:
+        meta = json.loads(meta_bytes)
+    except ValueError as exc:
+        raise SnapshotError(f"corrupt metadata: {exc}") from exc
+    if meta.get("byteorder") != sys.byteorder:
+        raise SnapshotError(f"written on a {meta.get('byteorder')}-endian host")
+    if meta.get("python") != _PYTHON:
+        raise SnapshotError(f"written by Python {meta.get('python')}, this is {_PYTHON}")
+    return meta, _aligned(_HEADER.size + meta_len)
+
+
+def read_meta(path: Path) -> dict:
+    """Return the snapshot metadata without mapping the data section."""
+    try:
+        with open(path, "rb") as f:
+            meta, _ = _read_header(f)
+    except OSError as exc:
+        raise SnapshotError(str(exc)) from exc
+    return meta
+
+
+def open_snapshot(path: Path) -> Snapshot:
+    """Memory-map `path` read-only and return its tables, meta, decoded payload and prefix tables.
+
+    The returned tables and prefix tables reference the mapping directly; it
+    stays open for as long as any of them is alive. The payload is decoded
+    into ordinary per-process objects.
+    """
+    try:
+        with open(path, "rb") as f:
+            meta, data_start = _read_header(f)
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as exc:
+        raise SnapshotError(str(exc)) from exc
+
+    view = memoryview(mapping)
+    tables: dict[str, _CountryTable] = {}
+    for cc, d in meta["tables"].items():
+        n, width = d["count"], d["width"]
+        ids_start = data_start + d["ids"]
+        if ids_start + n * 2 > len(mapping):
+            raise SnapshotError(f"table {cc} runs past the end of the file")
+        tables[cc] = _CountryTable(
+            width,
+            mapping,
+            view[ids_start : ids_start + n * 2].cast("H"),
+            tuple(d["codes"]),
+            base=data_start + d["keys"],
+        )
+
+    prefixes: dict[str, _PrefixTable] = {}
+    for cc, d in meta["prefixes"].items():
+        n = d["count"]
+        counts_start, ids_start = data_start + d["counts"], data_start + d["ids"]
+        if ids_start + n * 6 > len(mapping):
+            raise SnapshotError(f"prefix table {cc} runs past the end of the file")
+        prefixes[cc] = _PrefixTable(
+            d["width"],
+            mapping,
+            view[counts_start : counts_start + n * 16].cast("I"),
+            view[ids_start : ids_start + n * 6].cast("H"),
+            base=data_start + d["keys"],
+        )
+
+    start = data_start + meta["payload"]["offset"]
+    end = start + meta["payload"]["length"]
+    if end > len(mapping):
+        raise SnapshotError("payload runs past the end of the file")
+    try:
+        payload = marshal.loads(view[start:end])
+    except (EOFError, ValueError, TypeError) as exc:
+        raise SnapshotError(f"corrupt payload: {exc}") from exc
+    return Snapshot(tables, meta, payload, prefixes)
@@ -10,12 +10,19 @@ stmt: {sql, args}}]}``; rows are returned as arrays of typed value objects
 that gives column names. This adapter converts back and forth between
 Python-native types and the typed-value envelope so callers get plain dicts.
 
+Several statements can share one request: ``pipeline()`` sends them as
+consecutive ``execute`` requests and returns one row list per statement.
+Requests go through one pooled ``httpx.Client`` per TokenDB, so only the first
+request (or one after an idle connection is dropped) pays for the TCP and TLS
+handshake.
+
 Authentication: a Bearer token in the Authorization header. Both URL and
 token come from environment configuration; no values are committed.
 """
 
 from __future__ import annotations
 
+import threading
 from typing import Any
 
 import httpx
@@ -64,7 +71,8 @@ class TokenDB:
     """Minimal HTTP client over a libsql managed database.
 
     All methods are blocking. Callers running inside an asyncio loop should
-    wrap calls in asyncio.to_thread().
+    wrap calls in asyncio.to_thread(). The pooled client is created on first
+    use and released by close().
     """
 
     def __init__(self, url: str, auth_token: str = "") -> None:  # nosec B107 — empty default means "no auth", not a hardcoded credential
@@ -74,6 +82,22 @@ class TokenDB:
             u = "https://" + u[len("libsql://") :]
         self.url = u.rstrip("/")
         self.auth_token = auth_token
+        self._client: httpx.Client | None = None
+        self._client_lock = threading.Lock()
+
+    def _get_client(self) -> httpx.Client:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(timeout=10)
+        return self._client
+
+    def close(self) -> None:
+        """Close the pooled HTTP client. The next request opens a new one."""
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
 
     def execute(self, sql: str, params: list[Any] | None = None) -> list[dict]:
         """Send a SQL statement. Returns the result rows as a list of dicts.
@@ -83,55 +107,75 @@ class TokenDB:
 
         Raises TokenDBError on transport failure or libsql-reported error.
         """
-        stmt: dict = {"sql": sql}
-        if params:
-            stmt["args"] = [_to_libsql_arg(p) for p in params]
-        payload = {"requests": [{"type": "execute", "stmt": stmt}]}
+        return self.pipeline([(sql, params)])[0]
+
+    def pipeline(self, statements: list[tuple[str, list[Any] | None]]) -> list[list[dict]]:
+        """Send several SQL statements in one request. Returns one row list per statement.
+
+        The server runs them in order. Raises TokenDBError on transport failure
+        or if any statement fails.
+        """
+        requests = []
+        for sql, params in statements:
+            stmt: dict = {"sql": sql}
+            if params:
+                stmt["args"] = [_to_libsql_arg(p) for p in params]
+            requests.append({"type": "execute", "stmt": stmt})
+        payload = {"requests": requests}
         headers = {}
         if self.auth_token:
             headers["Authorization"] = f"Bearer {self.auth_token}"
 
         try:
-            with httpx.Client(timeout=10) as client:
-                resp = client.post(f"{self.url}/v2/pipeline", json=payload, headers=headers)
-                resp.raise_for_status()
-                body = resp.json()
+            resp = self._get_client().post(f"{self.url}/v2/pipeline", json=payload, headers=headers)
+            resp.raise_for_status()
+            body = resp.json()
         except (httpx.HTTPError, ValueError) as exc:
             raise TokenDBError(f"DB request failed: {exc}") from exc
 
         results = body.get("results") or []
-        if not results:
-            return []
-        first = results[0]
-        if first.get("type") != "ok":
-            err = (first.get("error") or {}).get("message", "unknown error")
-            raise TokenDBError(f"DB statement failed: {err}")
-        result = (first.get("response") or {}).get("result") or {}
-        cols = [c.get("name") for c in (result.get("cols") or [])]
-        rows = result.get("rows") or []
-        return [{cols[i]: _from_libsql_value(cell) for i, cell in enumerate(row)} for row in rows]
+        out = []
+        for i in range(len(statements)):
+            if i >= len(results):
+                out.append([])
+                continue
+            item = results[i]
+            if item.get("type") != "ok":
+                err = (item.get("error") or {}).get("message", "unknown error")
+                raise TokenDBError(f"DB statement failed: {err}")
+            result = (item.get("response") or {}).get("result") or {}
+            cols = [c.get("name") for c in (result.get("cols") or [])]
+            rows = result.get("rows") or []
+            out.append([{cols[j]: _from_libsql_value(cell) for j, cell in enumerate(row)} for row in rows])
+        return out
 
     # ── Schema ──────────────────────────────────────────────────────────────
 
     def init_schema(self) -> None:
-        """Idempotently create the trusted_tokens table and index."""
-        self.execute(
-            """
-            CREATE TABLE IF NOT EXISTS trusted_tokens (
-                id          INTEGER PRIMARY KEY AUTOINCREMENT,
-                value       TEXT NOT NULL UNIQUE,
-                label       TEXT,
-                created_at  TEXT NOT NULL DEFAULT (datetime('now')),
-                revoked_at  TEXT
-            )
-            """
-        )
-        self.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_trusted_tokens_active
-                ON trusted_tokens (value)
-                WHERE revoked_at IS NULL
-            """
+        """Idempotently create the trusted_tokens table and index, in one request."""
+        self.pipeline(
+            [
+                (
+                    """
+                    CREATE TABLE IF NOT EXISTS trusted_tokens (
+                        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                        value       TEXT NOT NULL UNIQUE,
+                        label       TEXT,
+                        created_at  TEXT NOT NULL DEFAULT (datetime('now')),
+                        revoked_at  TEXT
+                    )
+                    """,
+                    None,
+                ),
+                (
+                    """
+                    CREATE INDEX IF NOT EXISTS idx_trusted_tokens_active
+                        ON trusted_tokens (value)
+                        WHERE revoked_at IS NULL
+                    """,
+                    None,
+                ),
+            ]
         )
 
     # ── Mutations ───────────────────────────────────────────────────────────
@@ -168,6 +212,23 @@ class TokenDB:
             "SELECT id, value, label, created_at FROM trusted_tokens WHERE revoked_at IS NULL"
         )
 
+    def sync_rows(self, since: str | None = None) -> tuple[str, list[dict]]:
+        """Return the DB clock and the rows a token refresh needs, in one request.
+
+        With `since` None: every active row (a full sync). Otherwise every row
+        created or revoked at or after `since`, revoked ones included, so the
+        caller can apply them as a delta. The clock is read before the rows, so
+        it is a safe `since` for the next call: timestamps have one-second
+        resolution and the boundary second is fetched again.
+        """
+        select = "SELECT id, value, created_at, revoked_at FROM trusted_tokens "
+        if since is None:
+            query = (select + "WHERE revoked_at IS NULL", None)
+        else:
+            query = (select + "WHERE created_at >= ? OR revoked_at >= ?", [since, since])
+        clock, rows = self.pipeline([("SELECT datetime('now') AS now", None), query])
+        return clock[0]["now"], rows
+
     def list_all(self) -> list[dict]:
         """Return all rows, never including the raw value column."""
         return self.execute("SELECT id, label, created_at, revoked_at FROM trusted_tokens ORDER BY id")
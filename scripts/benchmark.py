@@ -0,0 +1,927 @@
+#!/usr/bin/env python3
+"""Offline benchmark for the /lookup hot path.
+
+Populates the in-memory tables with a synthetic TERCET-shaped dataset at
+several sizes and times in-process `GET /lookup` requests against each one.
+No network access or live deployment is needed (compare scripts/perf_test.sh,
+which drives a real deployment end to end).
+
+The per-request cost should stay flat as the table grows; a cost that scales
+with the table size points at an O(N) scan on the request path.
+
+With --memory, instead reports the RSS a tuple-keyed dict and the packed
+LookupStore each need for the same rows. With --startup, times a warm
+load_data() from the SQLite cache against one from the fast-start snapshot.
+With --worker-rss, reports how much private (anonymous) and file-backed
+memory one fresh worker's warm start adds, from SQLite and from the snapshot.
+With --batch N, times `POST /lookup/batch` with N items per request and
+reports lookups per second. With --middleware, drives the Auth and access-log
+middleware pair as raw ASGI calls and reports its per-request overhead. With
+--gc, times full collections and lookup() tail latency before and after the
+loaded heap is frozen out of GC tracking. With --estimates-refresh N, runs a
+remote estimates refresh of N rows and reports the longest event-loop stall
+and how many concurrent lookups missed an estimate that was live throughout.
+
+With --suite, runs the regression suite instead: scripts/synthetic_tercet.py
+writes a TERCET mirror of each size, a cold load_data() is served from it
+through an in-process HTTP mock, and the suite times warm starts, the index
+and SQLite cache phases, lookup() per answering tier, extract_postal_code()
+and ASGI /lookup throughput. --json writes the results for later runs to be
+checked against with --compare, which exits 1 when a timing got more than
+--tolerance slower.
+
+Usage:
+    python -m scripts.benchmark [--sizes 10000,100000,1000000] [--requests 2000]
+    python -m scripts.benchmark --memory [--sizes 1000000,5000000]
+    python -m scripts.benchmark --startup [--sizes 1000000]
+    python -m scripts.benchmark --worker-rss [--sizes 1000000]
+    python -m scripts.benchmark --batch 1000 [--sizes 1000000] [--requests 50]
+    python -m scripts.benchmark --middleware [--requests 20000]
+    python -m scripts.benchmark --gc [--sizes 1000000] [--requests 200000]
+    python -m scripts.benchmark --estimates-refresh 100000 [--sizes 1000000]
+    python -m scripts.benchmark --suite [--sizes 100000,2000000,10000000] [--json out.json]
+        [--compare baseline.json] [--requests 20000] [--concurrency 16] [--seed 1]
+
+The loader's INFO logs are kept out of the report; --verbose shows them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import data_loader
+
+# Five-digit numeric schemes; NUTS3 derives from the leading digits so the
+# prefix index sees the same kind of regional clustering as real TERCET data.
+SYNTHETIC_COUNTRIES = ("DE", "FR", "IT", "ES", "PL")
+
+
+def synthetic_width(size: int) -> int:
+    """Postal code width synthetic_rows(size) uses for every country."""
+    return max(5, len(str(-(-size // len(SYNTHETIC_COUNTRIES)))))
+
+
+def synthetic_rows(size: int):
+    """Yield `size` unique (country_code, postal_code, nuts3) rows over SYNTHETIC_COUNTRIES.
+
+    Codes are evenly spaced through each country's five-digit (or wider) space,
+    so every leading-digit prefix is populated.
+    """
+    per_country = -(-size // len(SYNTHETIC_COUNTRIES))
+    width = synthetic_width(size)
+    step = max(1, 10**width // per_country)
+    emitted = 0
+    for cc in SYNTHETIC_COUNTRIES:
+        for i in range(per_country):
+            if emitted == size:
+                return
+            pc = str(i * step).zfill(width)
+            yield cc, pc, f"{cc}{pc[0]}{pc[1]}{pc[2]}"
+            emitted += 1
+
+
+def synthetic_lookup(size: int) -> dict[tuple[str, str], str]:
+    """Return synthetic_rows(size) as a plain lookup dict."""
+    return {(cc, pc): nuts3 for cc, pc, nuts3 in synthetic_rows(size)}
+
+
+def populate(table: dict[tuple[str, str], str]) -> None:
+    """Replace the live data_loader tables with `table`, rebuild the indexes and publish them."""
+    data_loader._begin_build()
+    data_loader._lookup.update(table)
+    data_loader._lookup.compact()
+    data_loader._build_prefix_index()
+    data_loader._publish()
+
+
+def _rss_kb(field: str = "VmRSS") -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _measure_rss(kind: str, size: int, out) -> None:
+    """Child-process body: build one table kind and report its RSS growth in KB."""
+    from app.lookup_store import LookupStore
+
+    before = _rss_kb()
+    if kind == "dict":
+        table: object = {(cc, pc): nuts3 for cc, pc, nuts3 in synthetic_rows(size)}
+    else:
+        # Same path as a warm start from the SQLite cache: rows arrive sorted
+        table = LookupStore()
+        table.load_sorted(synthetic_rows(size), dict.fromkeys(SYNTHETIC_COUNTRIES, synthetic_width(size)))
+    out.put(_rss_kb() - before)
+    del table
+
+
+def bench_memory(size: int) -> dict[str, float]:
+    """RSS growth of a tuple-keyed dict vs a packed LookupStore holding `size` rows.
+
+    Each variant is built in a fresh forked process so one cannot reuse pages
+    the other freed. Linux-only (reads /proc/self/status).
+    """
+    ctx = multiprocessing.get_context("fork")
+    result: dict[str, float] = {"size": size}
+    for kind in ("dict", "store"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_measure_rss, args=(kind, size, queue))
+        proc.start()
+        result[f"{kind}_mb"] = queue.get() / 1024
+        proc.join()
+    return result
+
+
+def _measure_worker_rss(data_dir: str, snapshot_enabled: bool, out) -> None:
+    """Child-process body: warm-start load_data() as a fresh worker would and report its RSS growth in KB."""
+    from app.config import settings
+
+    logging.disable(logging.INFO)
+    settings.data_dir = data_dir
+    settings.estimates_csv = str(Path(data_dir) / "none.csv")
+    settings.snapshot_enabled = snapshot_enabled
+    before = {field: _rss_kb(field) for field in ("RssAnon", "RssFile")}
+    data_loader.load_data()
+    out.put({field: _rss_kb(field) - kb for field, kb in before.items()})
+
+
+def bench_worker_rss(size: int) -> dict[str, float]:
+    """Per-worker memory of a warm start from the SQLite cache vs from the shared snapshot.
+
+    Each warm start runs in a freshly spawned process, as a uvicorn worker
+    would, so no pages are inherited from this one. RssAnon is what every
+    extra worker costs on its own; RssFile is the mapped snapshot, which
+    workers on one host share through the page cache. Linux-only (reads
+    /proc/self/status).
+    """
+    from app.config import settings
+
+    populate(synthetic_lookup(size))
+    ctx = multiprocessing.get_context("spawn")
+    result: dict[str, float] = {"size": size}
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        patch.multiple(
+            settings, data_dir=tmp, estimates_csv=str(Path(tmp) / "none.csv"), snapshot_enabled=True
+        ),
+    ):
+        data_loader._save_to_db(data_loader._db_path())
+        data_loader.load_data()  # writes the snapshot
+        for label, enabled in (("sqlite", False), ("snapshot", True)):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_measure_worker_rss, args=(tmp, enabled, queue))
+            proc.start()
+            growth = queue.get()
+            proc.join()
+            result[f"{label}_anon_mb"] = growth["RssAnon"] / 1024
+            result[f"{label}_file_mb"] = growth["RssFile"] / 1024
+    return result
+
+
+def bench_startup(size: int) -> dict[str, float]:
+    """Time load_data() warm starts from the SQLite cache and from the snapshot.
+
+    Runs against a throwaway data directory seeded with `size` synthetic rows.
+    """
+    from app.config import settings
+
+    populate(synthetic_lookup(size))
+    result: dict[str, float] = {"size": size}
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        patch.multiple(
+            settings, data_dir=tmp, estimates_csv=str(Path(tmp) / "none.csv"), snapshot_enabled=False
+        ),
+    ):
+        data_loader._save_to_db(data_loader._db_path())
+        for label, enabled in (("sqlite", False), ("build", True), ("snapshot", True)):
+            settings.snapshot_enabled = enabled
+            start = time.perf_counter()
+            data_loader.load_data()
+            result[f"{label}_s"] = time.perf_counter() - start
+        if len(data_loader._lookup) != size:
+            raise SystemExit(f"snapshot restored {len(data_loader._lookup)} rows, expected {size}")
+    return result
+
+
+def bench_lookup_endpoint(size: int, requests: int) -> dict[str, float]:
+    """Time `requests` GET /lookup calls against a synthetic table of `size` rows."""
+    from fastapi.testclient import TestClient
+
+    table = synthetic_lookup(size)
+    populate(table)
+    keys = random.Random(1).sample(list(table), min(requests, len(table)))
+    del table
+
+    with patch.object(data_loader, "load_data"):
+        from app.main import app
+
+        with TestClient(app) as client:
+            timings = []
+            for cc, pc in keys:
+                start = time.perf_counter()
+                resp = client.get("/lookup", params={"country": cc, "postal_code": pc})
+                timings.append(time.perf_counter() - start)
+                if resp.status_code != 200:
+                    raise SystemExit(f"unexpected {resp.status_code} for {cc}/{pc}: {resp.text}")
+
+    timings.sort()
+    return {
+        "size": size,
+        "requests": len(timings),
+        "p50_us": statistics.median(timings) * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99) - 1] * 1e6,
+    }
+
+
+def bench_batch_endpoint(size: int, requests: int, batch: int) -> dict[str, float]:
+    """Time `requests` POST /lookup/batch calls of `batch` items against `size` synthetic rows."""
+    from fastapi.testclient import TestClient
+
+    table = synthetic_lookup(size)
+    populate(table)
+    rng = random.Random(1)
+    keys = list(table)
+    del table
+    bodies = [
+        [{"country": cc, "postal_code": pc} for cc, pc in rng.sample(keys, min(batch, len(keys)))]
+        for _ in range(requests)
+    ]
+
+    with patch.object(data_loader, "load_data"):
+        from app.main import app
+
+        with TestClient(app) as client:
+            timings = []
+            for body in bodies:
+                start = time.perf_counter()
+                resp = client.post("/lookup/batch", json=body)
+                timings.append(time.perf_counter() - start)
+                if resp.status_code != 200:
+                    raise SystemExit(f"unexpected {resp.status_code}: {resp.text[:200]}")
+
+    items = sum(len(b) for b in bodies)
+    return {
+        "size": size,
+        "batch": len(bodies[0]),
+        "p50_ms": statistics.median(timings) * 1e3,
+        "lookups_per_s": items / sum(timings),
+    }
+
+
+def bench_middleware(requests: int) -> dict[str, float]:
+    """Per-request cost of AuthMiddleware + AccessLogMiddleware around a bare ASGI endpoint.
+
+    Calls the ASGI stack directly (no HTTP client, no routing) so the
+    difference between the bare and wrapped timings is the middleware alone.
+    Measured for an anonymous request and for one carrying a trusted token.
+    """
+    from app import auth
+    from app.access_log import access_logger
+    from app.main import AccessLogMiddleware
+
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(headers):
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/lookup",
+            "raw_path": b"/lookup",
+            "query_string": b"country=DE&postal_code=10115",
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+
+    async def run(asgi, headers) -> float:
+        for _ in range(min(requests, 500)):  # warm-up
+            await asgi(scope(headers), receive, send)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await asgi(scope(headers), receive, send)
+        return (time.perf_counter() - start) / requests
+
+    wrapped = AccessLogMiddleware(auth.AuthMiddleware(endpoint))
+    # Keep the log call (record creation is part of the cost) but drop the output
+    access_logger.addHandler(logging.NullHandler())
+    access_logger.propagate = False
+    result: dict[str, float] = {"requests": requests}
+    with patch.object(auth, "_trusted", auth._build_trusted(frozenset({"bench-token"}))):
+        bare = asyncio.run(run(endpoint, []))
+        for label, headers in (("anonymous", []), ("trusted", [(b"authorization", b"Bearer bench-token")])):
+            result[f"{label}_us"] = (asyncio.run(run(wrapped, headers)) - bare) * 1e6
+    result["bare_us"] = bare * 1e6
+    return result
+
+
+def bench_gc(size: int, requests: int) -> dict[str, float]:
+    """Full-collection time and lookup() latency percentiles, before and after gc.freeze().
+
+    Each lookup also allocates a small reference cycle, standing in for the
+    request-handling garbage that drives collections in a live worker, so
+    the lookup timings include whatever GC pauses that garbage triggers. The
+    result cache is disabled so every call runs the tier waterfall.
+    """
+    import gc
+
+    from app import gc_stats
+    from app.lookup_cache import LookupCache
+
+    populate(synthetic_lookup(size))
+    codes = [(cc, pc) for cc, pc, _ in synthetic_rows(size)]
+    rng = random.Random(0)
+    sample = [rng.choice(codes) for _ in range(requests)]
+
+    def run() -> list[float]:
+        timings = []
+        for cc, pc in sample:
+            start = time.perf_counter()
+            data_loader.lookup(cc, pc)
+            garbage: dict = {}
+            garbage["self"] = garbage
+            timings.append(time.perf_counter() - start)
+        return sorted(timings)
+
+    def full_collect_ms() -> float:
+        start = time.perf_counter()
+        gc.collect()
+        return (time.perf_counter() - start) * 1000
+
+    result: dict[str, float] = {"size": size, "requests": requests}
+    with patch.object(data_loader, "_lookup_cache", LookupCache(0, 0)):
+        for label in ("tracked", "frozen"):
+            if label == "frozen":
+                gc_stats.freeze_heap()
+            result[f"{label}_collect_ms"] = full_collect_ms()
+            timings = run()
+            result[f"{label}_p50_us"] = timings[len(timings) // 2] * 1e6
+            result[f"{label}_p99_us"] = timings[int(len(timings) * 0.99)] * 1e6
+            result[f"{label}_max_ms"] = timings[-1] * 1000
+    gc.unfreeze()
+    return result
+
+
+def _estimates_csv(keys: list[tuple[str, str]]) -> bytes:
+    header = "COUNTRY_CODE,POSTAL_CODE,ESTIMATED_NUTS3,ESTIMATED_NUTS2,ESTIMATED_NUTS1,CONFIDENCE\n"
+    body = "".join(f"{cc},{pc},{cc}{pc[:3]},{cc}{pc[:2]},{cc}{pc[0]},high\n" for cc, pc in keys)
+    return (header + body).encode()
+
+
+def bench_estimates_refresh(size: int, rows: int) -> dict[str, float]:
+    """Event-loop stall and lookup misses while refresh_estimates_once() swaps in `rows` estimates.
+
+    The lookup table holds `size` synthetic rows. The remote CSV, served by an
+    httpx mock, holds `rows` estimates for codes the table lacks, half of them
+    already live. A ticker task records the longest gap between 1 ms sleeps on
+    the event loop, while a thread keeps looking up the estimates present
+    before and after the swap and counts answers that were not "estimated".
+    """
+    import threading
+
+    import httpx
+
+    from app import estimates_refresh
+    from app.lookup_cache import LookupCache
+
+    populate(synthetic_lookup(size))
+    width = synthetic_width(size)
+    step = max(2, 10**width // -(-size // len(SYNTHETIC_COUNTRIES)))
+    free = [
+        (cc, str(i * step + 1).zfill(width))
+        for i in range(-(-(rows + rows // 2) // len(SYNTHETIC_COUNTRIES)))
+        for cc in SYNTHETIC_COUNTRIES
+    ]
+    old_keys, new_keys = free[:rows], free[rows // 2 : rows + rows // 2]
+    kept = free[rows // 2 : rows]
+    old = data_loader.parse_estimates_from_text(_estimates_csv(old_keys).decode())[0]
+    body = _estimates_csv(new_keys)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+
+    async def run() -> tuple[float, float]:
+        gaps = [0.0]
+        done = False
+
+        async def ticker():
+            last = time.perf_counter()
+            while not done:
+                await asyncio.sleep(0.001)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport) as client:
+            await estimates_refresh.refresh_estimates_once(client)
+        elapsed = time.perf_counter() - start
+        done = True
+        await tick
+        return elapsed, max(gaps)
+
+    misses = lookups = 0
+    stop = threading.Event()
+
+    def hammer():
+        nonlocal misses, lookups
+        while not stop.is_set():
+            for cc, pc in kept[:1000]:
+                result = data_loader.lookup(cc, pc)
+                lookups += 1
+                if result is None or result["match_type"] != "estimated":
+                    misses += 1
+
+    with (
+        patch.object(data_loader, "_lookup_cache", LookupCache(0, 0)),
+        patch.object(estimates_refresh.settings, "estimates_refresh_url", "https://bench.invalid/e.csv"),
+    ):
+        data_loader.replace_estimates(old)
+        thread = threading.Thread(target=hammer)
+        thread.start()
+        try:
+            elapsed, stall = asyncio.run(run())
+        finally:
+            stop.set()
+            thread.join()
+    return {
+        "size": size,
+        "rows": rows,
+        "refresh_ms": elapsed * 1000,
+        "max_stall_ms": stall * 1000,
+        "lookups": lookups,
+        "misses": misses,
+    }
+
+
+# ── Regression suite ────────────────────────────────────────────────────────
+
+
+def _per_call_us(fn, calls: list[tuple], repeat: int = 5) -> float:
+    """Mean µs per fn(*args) over `calls`, best of `repeat` passes."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in calls:
+            fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best / len(calls) * 1e6
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def _mirror_transport(mirror: Path, base_url: str):
+    """An httpx transport serving the TERCET listing, ZIPs and GISCO names from `mirror`."""
+    import httpx
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        name = "index.html" if url.rstrip("/") == base_url.rstrip("/") else url.rsplit("/", 1)[-1]
+        path = mirror / name
+        if not path.is_file():
+            return httpx.Response(404)
+        return httpx.Response(200, content=path.read_bytes())
+
+    return httpx.MockTransport(handler)
+
+
+def _drive_asgi(queries: list[tuple[str, str]], requests: int, concurrency: int) -> dict[str, float]:
+    """Send `requests` GET /lookup calls through the full ASGI app from `concurrency` tasks."""
+    from urllib.parse import urlencode
+
+    from app.access_log import access_logger
+    from app.main import app
+
+    access_logger.addHandler(logging.NullHandler())
+    access_logger.propagate = False
+    query_strings = [urlencode({"country": cc, "postal_code": pc}).encode() for cc, pc in queries]
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def call(query_string: bytes) -> int:
+        status = 0
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/lookup",
+            "raw_path": b"/lookup",
+            "query_string": query_string,
+            "root_path": "",
+            "headers": [(b"host", b"testserver")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        await app(scope, receive, send)
+        return status
+
+    async def run(total: int) -> list[float]:
+        timings: list[float] = []
+        sent = 0
+
+        async def client():
+            nonlocal sent
+            while sent < total:
+                query_string = query_strings[sent % len(query_strings)]
+                sent += 1
+                start = time.perf_counter()
+                status = await call(query_string)
+                timings.append(time.perf_counter() - start)
+                if status != 200:
+                    raise SystemExit(f"unexpected {status} for {query_string.decode()}")
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return timings
+
+    asyncio.run(run(min(requests, 1000)))  # warm-up
+    start = time.perf_counter()
+    timings = sorted(asyncio.run(run(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_s": requests / elapsed,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99)] * 1e6,
+    }
+
+
+def bench_suite(size: int, *, seed: int, requests: int, concurrency: int) -> dict:
+    """Micro and macro benchmarks against a synthetic TERCET mirror of `size` rows.
+
+    Macro: a cold load_data() that downloads and parses every ZIP from the
+    mirror (served in process through an httpx mock transport), then warm
+    starts from the snapshot and from the SQLite cache, and in-process ASGI
+    GET /lookup throughput over a mix of every tier. Micro: lookup() per
+    answering tier with the result cache disabled (and one cached repeat),
+    extract_postal_code(), _build_prefix_index(), _save_to_db() and
+    _load_from_db() on the loaded table.
+    """
+    import functools
+    import gc
+
+    import httpx
+
+    from app.config import settings
+    from app.lookup_cache import LookupCache
+    from app.postal_patterns import extract_postal_code
+    from scripts.synthetic_tercet import SyntheticTercet
+
+    data = SyntheticTercet(size, seed)
+    queries = data.queries()
+    result: dict = {"size": size, "rows": data.row_count(), "countries": data.country_sizes}
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        mirror = data.write_mirror(Path(tmp) / "mirror", settings.nuts_version)
+        result["generate_s"] = time.perf_counter() - started
+        client = functools.partial(
+            httpx.Client, transport=_mirror_transport(mirror, settings.tercet_base_url)
+        )
+        with (
+            patch.object(data_loader.httpx, "Client", client),
+            patch.multiple(
+                settings,
+                data_dir=str(Path(tmp) / "data"),
+                estimates_csv=str(mirror / "estimates.csv"),
+                countries=list(data.countries),
+                extra_sources="",
+                snapshot_enabled=True,
+            ),
+        ):
+            macro: dict = {"load_data_cold_s": _timed(data_loader.load_data)}
+            if len(data_loader._lookup) != data.row_count():
+                raise SystemExit(
+                    f"cold load produced {len(data_loader._lookup)} rows, expected {data.row_count()}"
+                )
+            macro["load_data_warm_snapshot_s"] = _timed(data_loader.load_data)
+            settings.snapshot_enabled = False
+            macro["load_data_warm_sqlite_s"] = _timed(data_loader.load_data)
+            macro["build_timings"] = data_loader.get_generation().build_timings
+
+            micro: dict = {"build_prefix_index_s": _timed(data_loader._build_prefix_index)}
+            db = Path(tmp) / "bench.db"
+            micro["save_to_db_s"] = _timed(data_loader._save_to_db, db)
+            data_loader._begin_build()
+            micro["load_from_db_s"] = _timed(data_loader._load_from_db, db)
+            data_loader._begin_build()
+
+            lookup_us: dict[str, float] = {}
+            with patch.object(data_loader, "_lookup_cache", LookupCache(0, 0)):
+                for tier, calls in queries.items():
+                    for cc, pc in calls:
+                        answered = data_loader._lookup_in(data_loader.get_generation(), cc, pc)[0]
+                        if answered != tier:
+                            raise SystemExit(f"{cc}/{pc} answered by {answered}, expected {tier}")
+                    lookup_us[tier] = _per_call_us(data_loader.lookup, calls)
+            exact = queries["exact"]
+            cache = LookupCache(len(exact) * 2, 0)
+            cache.bind(data_loader.get_generation())
+            with patch.object(data_loader, "_lookup_cache", cache):
+                lookup_us["cached"] = _per_call_us(data_loader.lookup, exact)
+            micro["lookup_us"] = lookup_us
+            every_query = [call for calls in queries.values() for call in calls]
+            micro["extract_postal_code_us"] = _per_call_us(extract_postal_code, every_query)
+
+            # Every tier the endpoint answers with 200 (an unloaded country is a 400)
+            mix = [call for tier, calls in queries.items() if tier != "none" for call in calls]
+            random.Random(seed).shuffle(mix)
+            macro["asgi_lookup"] = _drive_asgi(mix, requests, concurrency)
+    gc.unfreeze()
+    result["micro"] = micro
+    result["macro"] = macro
+    return result
+
+
+def _environment() -> dict[str, str]:
+    import platform
+    import subprocess
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def _flatten(value, prefix: str = "") -> dict[str, float]:
+    if isinstance(value, dict):
+        flat: dict[str, float] = {}
+        for key, inner in value.items():
+            flat.update(_flatten(inner, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    return {prefix: value} if isinstance(value, (int, float)) else {}
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Metrics of `current` more than `tolerance` worse than `baseline`, matched by size.
+
+    Timings (`_s`, `_us`) regress upwards and throughput (`_per_s`) downwards;
+    other numbers (sizes, counts) are not compared.
+    """
+    old = {r["size"]: _flatten(r) for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = old.get(result["size"])
+        if before is None:
+            continue
+        for key, new in _flatten(result).items():
+            if key not in before or not before[key] or key.endswith("generate_s"):
+                continue
+            ratio = new / before[key]
+            if key.endswith("_per_s"):
+                worse = ratio < 1 / (1 + tolerance)
+            elif key.endswith(("_s", "_us")):
+                worse = ratio > 1 + tolerance
+            else:
+                continue
+            if worse:
+                regressions.append(f"{result['size']}: {key} {before[key]:.4g} -> {new:.4g} ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline /lookup benchmark on synthetic data.")
+    parser.add_argument(
+        "--sizes",
+        default="10000,100000,1000000",
+        help="Comma-separated table sizes (default: 10000,100000,1000000)",
+    )
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per size (default: 2000)")
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Compare RSS of a tuple-keyed dict vs the packed LookupStore instead",
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="Time warm load_data() from the SQLite cache vs the fast-start snapshot instead",
+    )
+    parser.add_argument(
+        "--worker-rss",
+        action="store_true",
+        help="Report one worker's private and mapped memory after a warm start from SQLite vs the snapshot",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Time POST /lookup/batch with N items per request instead",
+    )
+    parser.add_argument(
+        "--middleware",
+        action="store_true",
+        help="Measure the per-request overhead of the auth and access-log middleware instead",
+    )
+    parser.add_argument(
+        "--gc",
+        action="store_true",
+        help="Time full collections and lookup() tail latency before and after freezing the heap instead",
+    )
+    parser.add_argument(
+        "--estimates-refresh",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Measure the event-loop stall while a remote estimates refresh swaps in N rows instead",
+    )
+    parser.add_argument(
+        "--suite",
+        action="store_true",
+        help="Run the micro/macro regression suite against a synthetic TERCET mirror instead",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Synthetic dataset seed for --suite (default: 1)")
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="Concurrent ASGI clients for --suite (default: 16)"
+    )
+    parser.add_argument("--json", metavar="PATH", help="Write --suite results as JSON to PATH (- for stdout)")
+    parser.add_argument(
+        "--compare",
+        metavar="PATH",
+        help="Compare --suite results against a baseline JSON and exit 1 on a regression",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Slowdown --compare tolerates before reporting a regression (default: 0.2 = 20%%)",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show the app's INFO logs while benchmarking")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    if not args.verbose:
+        from app.access_log import access_logger
+
+        # Keep the loader's progress logs and the access log out of the report
+        for name in ("app", "httpx"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+        access_logger.setLevel(logging.WARNING)  # it sets its own level, so the "app" one is not enough
+
+    if args.suite:
+        import json
+
+        from app.limiter import limiter
+
+        limiter.enabled = False
+        report = {"environment": _environment(), "seed": args.seed, "results": []}
+        for size in sizes:
+            r = bench_suite(size, seed=args.seed, requests=args.requests, concurrency=args.concurrency)
+            report["results"].append(r)
+            micro, macro = r["micro"], r["macro"]
+            print(
+                f"{r['rows']:>10} rows  cold {macro['load_data_cold_s']:.2f}s  "
+                f"snapshot {macro['load_data_warm_snapshot_s']:.2f}s  "
+                f"sqlite {macro['load_data_warm_sqlite_s']:.2f}s  "
+                f"index {micro['build_prefix_index_s']:.2f}s  save {micro['save_to_db_s']:.2f}s  "
+                f"load {micro['load_from_db_s']:.2f}s",
+                file=sys.stderr,
+            )
+            tiers = "  ".join(f"{tier} {us:.2f}" for tier, us in micro["lookup_us"].items())
+            print(
+                f"{'':>10} lookup() µs: {tiers}  extract {micro['extract_postal_code_us']:.2f}",
+                file=sys.stderr,
+            )
+            asgi = macro["asgi_lookup"]
+            print(
+                f"{'':>10} ASGI /lookup: {asgi['requests_per_s']:.0f} req/s  "
+                f"p50 {asgi['p50_us']:.0f} µs  p99 {asgi['p99_us']:.0f} µs",
+                file=sys.stderr,
+            )
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        elif args.json:
+            Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+        if args.compare:
+            regressions = compare(json.loads(Path(args.compare).read_text()), report, args.tolerance)
+            for line in regressions:
+                print(f"REGRESSION {line}", file=sys.stderr)
+            if regressions:
+                raise SystemExit(1)
+        return
+
+    if args.memory:
+        print(f"{'size':>10} {'dict MB':>9} {'store MB':>9} {'B/row dict':>11} {'B/row store':>12}")
+        for size in sizes:
+            r = bench_memory(size)
+            print(
+                f"{size:>10} {r['dict_mb']:>9.1f} {r['store_mb']:>9.1f} "
+                f"{r['dict_mb'] * 1048576 / size:>11.0f} {r['store_mb'] * 1048576 / size:>12.0f}"
+            )
+        return
+
+    if args.startup:
+        print(f"{'size':>10} {'sqlite s':>9} {'build s':>9} {'snapshot s':>11}")
+        for size in sizes:
+            r = bench_startup(size)
+            print(f"{size:>10} {r['sqlite_s']:>9.2f} {r['build_s']:>9.2f} {r['snapshot_s']:>11.2f}")
+        return
+
+    if args.worker_rss:
+        print(f"{'size':>10} {'sqlite anon MB':>15} {'snapshot anon MB':>17} {'snapshot file MB':>17}")
+        for size in sizes:
+            r = bench_worker_rss(size)
+            print(
+                f"{size:>10} {r['sqlite_anon_mb']:>15.1f} {r['snapshot_anon_mb']:>17.1f} "
+                f"{r['snapshot_file_mb']:>17.1f}"
+            )
+        return
+
+    if args.middleware:
+        r = bench_middleware(args.requests)
+        print(f"{'requests':>9} {'bare µs':>8} {'+anon µs':>9} {'+trusted µs':>12}")
+        print(f"{r['requests']:>9} {r['bare_us']:>8.1f} {r['anonymous_us']:>9.1f} {r['trusted_us']:>12.1f}")
+        return
+
+    if args.gc:
+        print(f"{'size':>10} {'heap':>8} {'full GC ms':>11} {'p50 µs':>8} {'p99 µs':>8} {'max ms':>8}")
+        for size in sizes:
+            r = bench_gc(size, args.requests)
+            for label in ("tracked", "frozen"):
+                print(
+                    f"{size:>10} {label:>8} {r[f'{label}_collect_ms']:>11.1f} {r[f'{label}_p50_us']:>8.1f} "
+                    f"{r[f'{label}_p99_us']:>8.1f} {r[f'{label}_max_ms']:>8.2f}"
+                )
+        return
+
+    if args.estimates_refresh:
+        header = f"{'size':>10} {'estimates':>10} {'refresh ms':>11} {'max stall ms':>13}"
+        print(f"{header} {'lookups':>8} {'misses':>7}")
+        for size in sizes:
+            r = bench_estimates_refresh(size, args.estimates_refresh)
+            print(
+                f"{size:>10} {r['rows']:>10} {r['refresh_ms']:>11.1f} {r['max_stall_ms']:>13.1f} "
+                f"{r['lookups']:>8} {r['misses']:>7}"
+            )
+        return
+
+    # Every request comes from the same TestClient address; the per-IP limiter
+    # would 429 after the configured cap, so disable it for the measurement.
+    from app.limiter import limiter
+
+    limiter.enabled = False
+
+    if args.batch:
+        print(f"{'size':>10} {'batch':>7} {'p50 ms':>9} {'lookups/s':>10}")
+        for size in sizes:
+            r = bench_batch_endpoint(size, args.requests, args.batch)
+            print(f"{r['size']:>10} {r['batch']:>7} {r['p50_ms']:>9.1f} {r['lookups_per_s']:>10.0f}")
+        return
+
+    print(f"{'size':>10} {'requests':>9} {'p50 µs':>9} {'p99 µs':>9}")
+    for size in sizes:
+        r = bench_lookup_endpoint(size, args.requests)
+        print(f"{r['size']:>10} {r['requests']:>9} {r['p50_us']:>9.0f} {r['p99_us']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
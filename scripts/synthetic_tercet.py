@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Synthetic TERCET-shaped dataset for offline benchmarks.
+
+Generates postal code → NUTS3 rows in each country's real postal format
+(DE/FR/IT/ES/PL five digits, NL four digits plus two letters, PT seven
+digits, AT four digits), with the prefix structure the Tier 3 index sees in
+real data: the first digit picks NUTS1, the second NUTS2 and the third
+NUTS3; a few codes spill into a neighbouring NUTS3; and the number of codes
+under each two-digit area is heavily skewed (Pareto), so some prefixes hold
+tens of thousands of codes and others a handful. MT (letter locality codes,
+NUTS1/NUTS2 unanimous) and LI (one NUTS3) are always included so that Tier
+4 and Tier 5 are reachable. NL and PT take most of the rows, as they do in
+TERCET, and absorb the overflow once the smaller schemes are full, which is
+what makes sizes up to ~12M rows possible without widening any format.
+
+Besides the rows, a dataset provides an estimates CSV for codes missing from
+TERCET (Tier 2), codes missing from both (Tier 3), and sample raw inputs per
+lookup tier typed the way callers type them ("D-10115", "1012 ab"). It can
+also write a mirror of the TERCET download directory (listing, ZIPs, GISCO
+names CSV) that a cold load_data() can be served from.
+
+Output is a pure function of (size, seed).
+
+Usage:
+    python -m scripts.synthetic_tercet --size 2000000 --out /tmp/tercet-2m [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import random
+import sys
+import zipfile
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+class CountryProfile(NamedTuple):
+    """Postal format and share of the rows for one synthetic country."""
+
+    cc: str
+    digits: int  # numeric part, the first two digits select the area
+    letters: int  # trailing letters (NL)
+    first_digit: int  # lowest leading digit in use
+    weight: float  # share of the rows before capacity limits
+    fill: float  # largest fraction of an area's code space that is used
+    raw: str  # how a caller types a code; {a} and {b} are its two halves
+
+
+PROFILES = (
+    CountryProfile("NL", 4, 2, 1, 0.50, 0.8, "{a} {b_lower}"),
+    CountryProfile("PT", 7, 0, 1, 0.30, 0.8, "{a}-{b}"),
+    CountryProfile("PL", 5, 0, 0, 0.06, 0.8, "{a}-{b}"),
+    CountryProfile("DE", 5, 0, 0, 0.04, 0.8, "D-{a}{b}"),
+    CountryProfile("ES", 5, 0, 0, 0.04, 0.8, "{a}{b}"),
+    CountryProfile("FR", 5, 0, 1, 0.03, 0.8, "F-{a}{b}"),
+    CountryProfile("IT", 5, 0, 0, 0.02, 0.8, "I-{a}{b}"),
+    CountryProfile("AT", 4, 0, 1, 0.01, 0.8, "A-{a}{b}"),
+)
+# Where {a} ends in the code, per raw format
+_SPLIT = {"NL": 4, "PT": 4, "PL": 2}
+
+# Tier 4: three-letter localities, all in one NUTS2
+_MT_LOCALITIES = 60
+_MT_FIRST_LETTERS = "ABDFGHKLMNPRSTVZ"  # Q, X and Y never start one
+# Tier 5: one NUTS3 for the whole country
+_LI_CODES = tuple(str(pc) for pc in range(9485, 9499))
+
+# Fraction of codes assigned to the neighbouring NUTS3 of their area
+_SPILL_PERCENT = 5
+# Pre-computed estimates per generated row, and never fewer than this many
+_ESTIMATE_RATE = 0.005
+_MIN_ESTIMATES = 200
+# Codes per area held back as Tier 3 queries and sampled as Tier 1 queries
+_QUERIES_PER_AREA = 2
+
+
+def _allocate(total: int, weights: list[float], caps: list[int]) -> list[int]:
+    """Split `total` in proportion to `weights`, never giving an entry more than its cap."""
+    alloc = [0] * len(weights)
+    remaining = total
+    open_ = [i for i, cap in enumerate(caps) if cap > 0]
+    while remaining and open_:
+        weight_sum = sum(weights[i] for i in open_)
+        given = 0
+        for i in open_:
+            share = min(caps[i] - alloc[i], int(remaining * weights[i] / weight_sum))
+            alloc[i] += share
+            given += share
+        if not given:
+            # Every share rounded down to zero: hand out the rest one at a time
+            for i in sorted(open_, key=lambda i: -weights[i])[:remaining]:
+                alloc[i] += 1
+                given += 1
+        remaining -= given
+        open_ = [i for i in open_ if alloc[i] < caps[i]]
+    if remaining:
+        raise ValueError(f"{total} rows exceed the synthetic code space")
+    return alloc
+
+
+class _Area(NamedTuple):
+    """One two-digit area of a country: the code offsets it uses and holds back."""
+
+    prefix: int
+    codes: list[int]  # sorted
+    estimates: list[int]
+    gaps: list[int]
+
+
+class SyntheticTercet:
+    """A deterministic synthetic TERCET dataset of `size` rows (plus MT and LI)."""
+
+    def __init__(self, size: int, seed: int = 1) -> None:
+        self.size = size
+        self.seed = seed
+        self.estimate_rate = max(_ESTIMATE_RATE, _MIN_ESTIMATES / max(size, 1))
+        caps = [int(self._area_space(p) * p.fill) * (10 - p.first_digit) * 10 for p in PROFILES]
+        counts = _allocate(size, [p.weight for p in PROFILES], caps)
+        self.country_sizes = {p.cc: n for p, n in zip(PROFILES, counts)}
+        # Per-area row counts: Pareto-skewed weights, capped by each area's space
+        self._area_sizes: dict[str, list[int]] = {}
+        for profile, n in zip(PROFILES, counts):
+            rng = self._rng(profile.cc, "areas")
+            areas = (10 - profile.first_digit) * 10
+            weights = [rng.paretovariate(1.16) for _ in range(areas)]
+            cap = int(self._area_space(profile) * profile.fill)
+            self._area_sizes[profile.cc] = _allocate(n, weights, [cap] * areas)
+
+    def _rng(self, *parts: object) -> random.Random:
+        return random.Random(":".join(map(str, (self.seed, *parts))))
+
+    @staticmethod
+    def _area_space(profile: CountryProfile) -> int:
+        return 10 ** (profile.digits - 2) * 26**profile.letters
+
+    @property
+    def countries(self) -> tuple[str, ...]:
+        return (*(p.cc for p in PROFILES), "MT", "LI")
+
+    def widths(self) -> dict[str, int]:
+        """Postal code width per country, as LookupStore.load_sorted() takes them."""
+        return {**{p.cc: p.digits + p.letters for p in PROFILES}, "MT": 3, "LI": 4}
+
+    # ── Codes ───────────────────────────────────────────────────────────────
+
+    def _areas(self, profile: CountryProfile) -> Iterator[_Area]:
+        space = self._area_space(profile)
+        for index, k in enumerate(self._area_sizes[profile.cc]):
+            prefix = profile.first_digit * 10 + index
+            rng = self._rng(profile.cc, prefix)
+            estimates = int(k * self.estimate_rate + rng.random())
+            gaps = _QUERIES_PER_AREA if k else 0
+            sample = rng.sample(range(space), k + estimates + gaps)
+            yield _Area(prefix, sorted(sample[:k]), sample[k : k + estimates], sample[k + estimates :])
+
+    @staticmethod
+    def _code(profile: CountryProfile, prefix: int, offset: int) -> str:
+        if not profile.letters:
+            return f"{prefix:02d}{offset:0{profile.digits - 2}d}"
+        number, letters = divmod(offset, 26**profile.letters)
+        suffix = ""
+        for _ in range(profile.letters):
+            letters, i = divmod(letters, 26)
+            suffix = _LETTERS[i] + suffix
+        return f"{prefix:02d}{number:0{profile.digits - 2}d}{suffix}"
+
+    @staticmethod
+    def _nuts3(cc: str, code: str, offset: int) -> str:
+        # Two third digits per NUTS3, so five NUTS3 regions per NUTS2
+        region = int(code[2]) // 2
+        if (offset * 2654435761) % 100 < _SPILL_PERCENT:
+            region = (region + 1) % 5
+        return f"{cc}{code[0]}{code[1]}{region}"
+
+    def rows(self) -> Iterator[tuple[str, str, str]]:
+        """Yield every (country_code, postal_code, nuts3) row, sorted by country then code."""
+        for cc in sorted(self.countries):
+            yield from self._country_rows(cc)
+
+    def _country_rows(self, cc: str) -> Iterator[tuple[str, str, str]]:
+        if cc == "MT":
+            yield from self._mt_rows()
+            return
+        if cc == "LI":
+            for pc in _LI_CODES:
+                yield cc, pc, "LI000"
+            return
+        profile = next(p for p in PROFILES if p.cc == cc)
+        code, nuts3 = self._code, self._nuts3
+        for area in self._areas(profile):
+            for offset in area.codes:
+                pc = code(profile, area.prefix, offset)
+                yield cc, pc, nuts3(cc, pc, offset)
+
+    def _mt_rows(self) -> list[tuple[str, str, str]]:
+        rng = self._rng("MT")
+        localities: set[str] = set()
+        while len(localities) < _MT_LOCALITIES:
+            localities.add(rng.choice(_MT_FIRST_LETTERS) + "".join(rng.choices(_LETTERS, k=2)))
+        return [("MT", pc, "MT001" if rng.random() < 0.7 else "MT002") for pc in sorted(localities)]
+
+    def row_count(self) -> int:
+        return self.size + _MT_LOCALITIES + len(_LI_CODES)
+
+    def estimates(self) -> Iterator[tuple[str, str, str, str, str, str]]:
+        """Yield estimates CSV rows (country, code, NUTS3, NUTS2, NUTS1, label) for codes not in rows()."""
+        rng = self._rng("labels")
+        for profile in PROFILES:
+            for area in self._areas(profile):
+                for offset in area.estimates:
+                    pc = self._code(profile, area.prefix, offset)
+                    nuts3 = self._nuts3(profile.cc, pc, offset)
+                    label = rng.choices(("high", "medium", "low"), (6, 3, 1))[0]
+                    yield profile.cc, pc, nuts3, nuts3[:4], nuts3[:3], label
+
+    # ── Queries ─────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _raw(profile: CountryProfile, pc: str) -> str:
+        split = _SPLIT.get(profile.cc, 2)
+        a, b = pc[:split], pc[split:]
+        return profile.raw.format(a=a, b=b, b_lower=b.lower())
+
+    def queries(self) -> dict[str, list[tuple[str, str]]]:
+        """Sample (country, raw postal code) inputs per lookup() tier that should answer them."""
+        exact: list[tuple[str, str]] = []
+        estimated: list[tuple[str, str]] = []
+        prefix: list[tuple[str, str]] = []
+        for profile in PROFILES:
+            for area in self._areas(profile):
+                # sorted() hides the sample order, so the first picks are random rows
+                rng = self._rng(profile.cc, area.prefix, "queries")
+                picks = rng.sample(area.codes, min(_QUERIES_PER_AREA, len(area.codes)))
+                for offsets, out in ((picks, exact), (area.estimates, estimated), (area.gaps, prefix)):
+                    out.extend(
+                        (profile.cc, self._raw(profile, self._code(profile, area.prefix, o))) for o in offsets
+                    )
+        mt = [f"{pc} {1000 + i}" for i, (_, pc, _) in enumerate(self._mt_rows())]
+        return {
+            "exact": exact + [("MT", raw) for raw in mt] + [("LI", f"FL-{pc}") for pc in _LI_CODES],
+            "estimated": estimated,
+            "prefix": prefix,
+            # No locality starts with Q, X or Y, so no prefix matches either
+            "country_fallback": [("MT", "QRS 1000"), ("MT", "XAB 2010"), ("MT", "YTT 3020")],
+            "single_nuts3": [("LI", f"FL-{pc}") for pc in range(1000, 1010)],
+            # Supported by the app but absent from the data, and not a single-NUTS3 fallback
+            "none": [("SE", f"{pc} 22") for pc in range(111, 121)],
+        }
+
+    # ── TERCET mirror ───────────────────────────────────────────────────────
+
+    def nuts_names(self) -> dict[str, str]:
+        names: dict[str, str] = {}
+        for profile in PROFILES:
+            for area in self._areas(profile):
+                nuts2 = f"{profile.cc}{area.prefix:02d}"
+                names[nuts2[:3]] = f"Synthetic {nuts2[:3]}"
+                names[nuts2] = f"Synthetic {nuts2}"
+                for region in range(5):
+                    names[f"{nuts2}{region}"] = f"Synthetic {nuts2}{region}"
+        for code in ("MT0", "MT00", "MT001", "MT002", "LI0", "LI00", "LI000"):
+            names[code] = f"Synthetic {code}"
+        return names
+
+    def write_mirror(self, dest: Path, nuts_version: str = "2024") -> Path:
+        """Write TERCET ZIPs, a directory listing, GISCO names and the estimates CSV under `dest`.
+
+        Returns `dest`. The ZIP names follow the TERCET pattern, so the
+        loader infers the country from them as it does for real files.
+        """
+        dest.mkdir(parents=True, exist_ok=True)
+        names = []
+        for cc in self.countries:
+            name = f"pc2025_{cc}_NUTS-{nuts_version}_v1.0"
+            with zipfile.ZipFile(dest / f"{name}.zip", "w", zipfile.ZIP_DEFLATED) as zf:
+                with zf.open(f"{name}.csv", "w") as member, io.TextIOWrapper(member, "utf-8") as out:
+                    out.write(f"NUTS3_{nuts_version};CODE\n")
+                    out.writelines(f"{nuts3};{pc}\n" for _, pc, nuts3 in self._country_rows(cc))
+            names.append(name)
+        listing = "".join(f'<a href="{name}.zip">{name}.zip</a>\n' for name in names)
+        (dest / "index.html").write_text(f"<html><body>\n{listing}</body></html>\n")
+        with open(dest / f"NUTS_AT_{nuts_version}.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["NUTS_ID", "NAME_LATN"])
+            writer.writerows(self.nuts_names().items())
+        with open(dest / "estimates.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "COUNTRY_CODE",
+                    "POSTAL_CODE",
+                    "ESTIMATED_NUTS3",
+                    "ESTIMATED_NUTS2",
+                    "ESTIMATED_NUTS1",
+                    "CONFIDENCE",
+                ]
+            )
+            writer.writerows(self.estimates())
+        return dest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic TERCET mirror for offline benchmarks.")
+    parser.add_argument("--size", type=int, default=100_000, help="Rows across the sized countries")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    parser.add_argument("--out", type=Path, required=True, help="Directory to write the mirror to")
+    args = parser.parse_args()
+    data = SyntheticTercet(args.size, args.seed)
+    data.write_mirror(args.out)
+    sizes = ", ".join(f"{cc} {n}" for cc, n in data.country_sizes.items())
+    print(f"Wrote {data.row_count()} rows to {args.out} ({sizes})")
+
+
+if __name__ == "__main__":
+    main()
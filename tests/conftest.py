@@ -73,15 +73,18 @@ def mock_data():
     """Populate data_loader module globals with minimal test data.
 
     Calls _build_prefix_index() to set up _prefix_index, _single_nuts3,
-    and _country_fallback. Restores original state on teardown.
+    _country_fallback and the _countries registry, then publishes the result
+    as the live generation. Restores original state on teardown.
     """
     # Save originals
     orig_lookup = data_loader._lookup.copy()
     orig_estimates = data_loader._estimates.copy()
     orig_names = data_loader._nuts_names.copy()
-    orig_prefix = {k: dict(v) for k, v in data_loader._prefix_index.items()}
+    orig_prefix = dict(data_loader._prefix_index)  # the tables themselves are immutable
+    orig_codes = data_loader._nuts_codes
     orig_single = data_loader._single_nuts3.copy()
     orig_fallback = data_loader._country_fallback.copy()
+    orig_countries = data_loader._countries
 
     # Populate
     data_loader._lookup.clear()
@@ -91,6 +94,7 @@ def mock_data():
     data_loader._nuts_names.clear()
     data_loader._nuts_names.update(MOCK_NUTS_NAMES)
     data_loader._build_prefix_index()
+    data_loader._publish()
 
     yield
 
@@ -103,10 +107,13 @@ def mock_data():
     data_loader._nuts_names.update(orig_names)
     data_loader._prefix_index.clear()
     data_loader._prefix_index.update(orig_prefix)
+    data_loader._nuts_codes = orig_codes
     data_loader._single_nuts3.clear()
     data_loader._single_nuts3.update(orig_single)
     data_loader._country_fallback.clear()
     data_loader._country_fallback.update(orig_fallback)
+    data_loader._countries = orig_countries
+    data_loader._publish()
 
 
 @pytest.fixture()
@@ -128,7 +135,7 @@ def trusted_client(mock_data, monkeypatch):
 
     from app import auth, data_loader
 
-    monkeypatch.setattr(auth, "_get_trusted_tokens", lambda: frozenset({"test-token-aaa"}))
+    monkeypatch.setattr(auth, "_trusted", auth._build_trusted(frozenset({"test-token-aaa"})))
 
     from fastapi.testclient import TestClient
 
@@ -0,0 +1,190 @@
+"""Tests for app.access_log — queue-backed writer, overflow policy and JSON lines."""
+
+import io
+import json
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+import pytest
+
+from app import access_log
+from app.access_log import JsonFormatter, QueueWriter
+
+
+def _record(path="/lookup", status=200, token_id=None):
+    record = logging.LogRecord(
+        "app.access",
+        logging.INFO,
+        __file__,
+        0,
+        "%s %s %s %d %.1fms%s",
+        ("10.0.0.1", "GET", path, status, 1.25, f" token_id={token_id}" if token_id else ""),
+        None,
+    )
+    record.token_id = token_id
+    return record
+
+
+class _GatedStream(io.StringIO):
+    """A stream whose writes wait until `gate` is set, like a stalled disk."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.gate = threading.Event()
+
+    def write(self, text: str) -> int:
+        self.gate.wait(5)
+        return super().write(text)
+
+
+@pytest.fixture
+def gated():
+    stream = _GatedStream()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(logging.Formatter("%(message)s"))
+    return stream, target
+
+
+class TestQueueWriter:
+    def test_lines_reach_the_file_in_order(self, tmp_path):
+        target = RotatingFileHandler(tmp_path / "access.log", maxBytes=1 << 20, backupCount=1)
+        target.setFormatter(logging.Formatter("%(message)s"))
+        writer = QueueWriter(target, 100)
+        try:
+            for i in range(50):
+                writer.handle(_record(path=f"/p{i}"))
+            writer.flush()
+            lines = (tmp_path / "access.log").read_text().splitlines()
+            assert lines == [f"10.0.0.1 GET /p{i} 200 1.2ms" for i in range(50)]
+            assert writer.stats()["written"] == 50
+        finally:
+            writer.close()
+
+    def test_rotation_happens_on_the_writer_thread(self, tmp_path):
+        target = RotatingFileHandler(tmp_path / "access.log", maxBytes=200, backupCount=2)
+        target.setFormatter(logging.Formatter("%(message)s"))
+        writer = QueueWriter(target, 100)
+        try:
+            for _ in range(20):
+                writer.handle(_record())
+            writer.flush()
+        finally:
+            writer.close()
+        assert (tmp_path / "access.log.1").exists()
+
+    def test_full_queue_drops_and_counts(self, gated):
+        stream, target = gated
+        writer = QueueWriter(target, 2)
+        try:
+            for _ in range(10):
+                writer.handle(_record())
+            stats = writer.stats()
+            # One record may already be with the writer thread, stuck on the stream
+            assert stats["dropped"] in (7, 8)
+            assert stats["blocked"] == 0
+            stream.gate.set()
+            writer.flush()
+            assert writer.stats()["written"] == 10 - stats["dropped"]
+        finally:
+            stream.gate.set()
+            writer.close()
+
+    def test_block_policy_waits_for_room(self, gated):
+        stream, target = gated
+        writer = QueueWriter(target, 1, block=True, block_timeout=5)
+        done = threading.Event()
+
+        def produce():
+            for _ in range(5):
+                writer.handle(_record())
+            done.set()
+
+        producer = threading.Thread(target=produce)
+        try:
+            producer.start()
+            assert not done.wait(0.2)
+            stream.gate.set()
+            assert done.wait(5)
+            writer.flush()
+            stats = writer.stats()
+            assert (stats["written"], stats["dropped"]) == (5, 0)
+            assert stats["blocked"] >= 1
+        finally:
+            stream.gate.set()
+            producer.join()
+            writer.close()
+
+    def test_block_policy_gives_up_after_the_timeout(self, gated):
+        stream, target = gated
+        writer = QueueWriter(target, 1, block=True, block_timeout=0.01)
+        try:
+            for _ in range(5):
+                writer.handle(_record())
+            stats = writer.stats()
+            # One record may already be with the writer thread, stuck on the stream
+            assert stats["dropped"] in (3, 4)
+            assert stats["blocked"] >= stats["dropped"]
+        finally:
+            stream.gate.set()
+            writer.close()
+
+    def test_close_writes_out_the_queue(self, tmp_path):
+        target = RotatingFileHandler(tmp_path / "access.log", maxBytes=1 << 20, backupCount=1)
+        target.setFormatter(logging.Formatter("%(message)s"))
+        writer = QueueWriter(target, 100)
+        for _ in range(30):
+            writer.handle(_record())
+        writer.close()
+        assert len((tmp_path / "access.log").read_text().splitlines()) == 30
+
+
+class TestJsonFormatter:
+    def test_fields(self):
+        line = json.loads(JsonFormatter().format(_record(status=404)))
+        assert {k: v for k, v in line.items() if k != "ts"} == {
+            "client": "10.0.0.1",
+            "method": "GET",
+            "path": "/lookup",
+            "status": 404,
+            "duration_ms": 1.2,
+        }
+        assert line["ts"].endswith("+00:00")
+
+    def test_token_id_only_when_trusted(self):
+        line = json.loads(JsonFormatter().format(_record(token_id="abcd1234")))
+        assert line["token_id"] == "abcd1234"
+
+
+class TestConfigure:
+    @pytest.fixture
+    def configured(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(access_log.settings, "access_log_file", str(tmp_path / "access.log"))
+        monkeypatch.setattr(access_log.settings, "access_log_format", "json")
+        monkeypatch.setattr(access_log, "_writer", None)
+        access_log.configure()
+        writer = access_log._writer
+        yield tmp_path / "access.log"
+        access_log.access_logger.removeHandler(writer)
+        access_log.access_logger.propagate = True
+        writer.close()
+
+    def test_requests_are_logged_as_json_lines(self, configured, trusted_client):
+        trusted_client.get("/lookup", params={"postal_code": "10115", "country": "DE"})
+        trusted_client.get(
+            "/lookup",
+            params={"postal_code": "10115", "country": "DE"},
+            headers={"Authorization": "Bearer test-token-aaa"},
+        )
+        access_log._writer.flush()
+        lines = [json.loads(line) for line in configured.read_text().splitlines()]
+        assert [(line["path"], line["status"]) for line in lines] == [("/lookup", 200), ("/lookup", 200)]
+        assert "token_id" not in lines[0]
+        assert len(lines[1]["token_id"]) == 8
+        assert trusted_client.get("/health").json()["access_log"]["written"] == 2
+
+    def test_text_without_a_file_keeps_propagating(self, monkeypatch):
+        monkeypatch.setattr(access_log, "_writer", None)
+        access_log.configure()
+        assert access_log._writer is None
+        assert access_log.access_logger.propagate
@@ -0,0 +1,118 @@
+"""Tests for app.admission — in-flight caps, the trusted lane and adaptive shedding."""
+
+import pytest
+
+from app import admission
+from app.admission import _INTERVAL, AdmissionController
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestAdmissionController:
+    def test_sheds_over_the_cap_and_readmits_after_release(self):
+        ctl = AdmissionController(2, 1)
+        assert ctl.try_acquire(False) and ctl.try_acquire(False)
+        assert not ctl.try_acquire(False)
+        ctl.release(False, 0.001)
+        assert ctl.try_acquire(False)
+        assert ctl.stats()["shed"] == 1
+        assert ctl.stats()["in_flight"] == 2
+
+    def test_trusted_lane_is_independent(self):
+        ctl = AdmissionController(1, 1)
+        assert ctl.try_acquire(False)
+        assert not ctl.try_acquire(False)
+        assert ctl.try_acquire(True)
+        assert not ctl.try_acquire(True)
+        stats = ctl.stats()
+        assert (stats["shed"], stats["trusted_shed"]) == (1, 1)
+        assert (stats["in_flight"], stats["trusted_in_flight"]) == (1, 1)
+
+    def test_zero_cap_disables_shedding(self):
+        ctl = AdmissionController(0, 0)
+        assert all(ctl.try_acquire(trusted) for trusted in (False, True) for _ in range(100))
+
+    def test_standing_queue_cuts_the_cap_and_recovery_grows_it(self):
+        clock = FakeClock()
+        ctl = AdmissionController(8, 4, target_delay=0.05, clock=clock)
+
+        def interval(latency):
+            ctl.try_acquire(False)
+            clock.now += _INTERVAL
+            ctl.release(False, latency)
+
+        interval(0.2)
+        assert ctl.limit == 6
+        assert ctl.stats()["queue_delay_ms"] == 200.0
+        interval(0.2)
+        assert ctl.limit == 4
+        interval(0.001)
+        assert ctl.limit == 5
+        for _ in range(10):
+            interval(0.001)
+        assert ctl.limit == 8  # never above the configured maximum
+
+    def test_fastest_response_in_the_interval_decides(self):
+        clock = FakeClock()
+        ctl = AdmissionController(8, 4, target_delay=0.05, clock=clock)
+        ctl.try_acquire(False)
+        ctl.release(False, 0.5)  # a single slow outlier is a burst, not a queue
+        clock.now += _INTERVAL
+        ctl.try_acquire(False)
+        ctl.release(False, 0.002)
+        assert ctl.limit == 8
+
+    def test_fixed_cap_without_target_delay(self):
+        clock = FakeClock()
+        ctl = AdmissionController(8, 4, clock=clock)
+        ctl.try_acquire(False)
+        clock.now += _INTERVAL
+        ctl.release(False, 5.0)
+        assert ctl.limit == 8
+        assert ctl.stats()["queue_delay_ms"] == 5000.0
+
+
+class TestAdmissionMiddleware:
+    @pytest.fixture
+    def saturated(self, monkeypatch):
+        """A controller whose anonymous lane is full."""
+        ctl = AdmissionController(1, 1)
+        ctl.try_acquire(False)
+        monkeypatch.setattr(admission, "_controller", ctl)
+        return ctl
+
+    def test_over_cap_is_503_with_retry_after(self, trusted_client, saturated):
+        for path, params in (("/lookup", {"postal_code": "10115", "country": "DE"}), ("/pattern", {})):
+            resp = trusted_client.get(path, params=params)
+            assert resp.status_code == 503
+            assert resp.headers["Retry-After"] == "1"
+            assert resp.json() == {"detail": "Server is overloaded. Try again later."}
+        assert saturated.shed == 2
+
+    def test_trusted_requests_use_their_own_lane(self, trusted_client, saturated):
+        resp = trusted_client.get(
+            "/lookup",
+            params={"postal_code": "10115", "country": "DE"},
+            headers={"Authorization": "Bearer test-token-aaa"},
+        )
+        assert resp.status_code == 200
+        assert saturated.trusted_in_flight == 0
+
+    def test_other_paths_are_not_guarded(self, client, saturated):
+        resp = client.get("/health")
+        assert resp.status_code == 200
+        assert resp.json()["admission"]["shed"] == 0
+
+    def test_admitted_request_releases_its_slot(self, client, monkeypatch):
+        ctl = AdmissionController(1, 1)
+        monkeypatch.setattr(admission, "_controller", ctl)
+        for _ in range(3):
+            assert client.get("/lookup", params={"postal_code": "10115", "country": "DE"}).status_code == 200
+        assert ctl.in_flight == 0
+        assert ctl.shed == 0
@@ -61,6 +61,97 @@ class TestLookupEndpoint:
         assert resp.status_code == 200
         assert resp.json()["nuts3"] == "ME000"
 
+    def test_body_matches_response_model(self, client):
+        """The pre-encoded body is what FastAPI would render for NUTSResult."""
+        from app.models import NUTSResult
+
+        resp = client.get("/lookup", params={"postal_code": " 10-115 ", "country": "de"})
+        expected = NUTSResult.model_validate(resp.json()).model_dump_json()
+        assert resp.content == expected.encode()
+        assert resp.headers["content-type"] == "application/json"
+
+    def test_openapi_documents_nuts_result(self, client):
+        schema = client.get("/openapi.json").json()
+        ok = schema["paths"]["/lookup"]["get"]["responses"]["200"]["content"]["application/json"]
+        assert ok["schema"] == {"$ref": "#/components/schemas/NUTSResult"}
+
+
+# ── /lookup/batch endpoint tests ─────────────────────────────────────────────
+
+
+class TestBatchLookupEndpoint:
+    def test_results_in_input_order(self, client):
+        items = [
+            {"country": "DE", "postal_code": "10115"},
+            {"country": "ME", "postal_code": "81000"},
+            {"country": "ZZ", "postal_code": "12345"},
+            {"country": "GR", "postal_code": "11141"},
+            {"country": "DEU", "postal_code": "10115"},
+            {"country": "DE", "postal_code": "99999"},
+            {"country": "DE", "postal_code": "1" * 21},
+        ]
+        resp = client.post("/lookup/batch", json=items)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert [r["postal_code"] for r in data] == [i["postal_code"] for i in items]
+        assert (data[0]["match_type"], data[0]["nuts3"]) == ("exact", "DE300")
+        assert data[0]["nuts3_name"] == "Berlin"
+        assert (data[1]["match_type"], data[1]["nuts3"]) == ("estimated", "ME000")
+        assert data[2]["status"] == 400
+        assert "not supported" in data[2]["detail"]
+        assert (data[3]["country_code"], data[3]["nuts3"]) == ("EL", "EL303")
+        assert data[4]["status"] == 422
+        assert data[5]["status"] == 404
+        assert "Expected format" in data[5]["detail"]
+        assert data[6]["status"] == 422
+
+    def test_matches_single_lookup(self, client):
+        params = {"postal_code": "10999", "country": "de"}
+        single = client.get("/lookup", params=params).json()
+        batch = client.post("/lookup/batch", json=[params]).json()
+        assert batch == [single]
+
+    def test_over_max_size_is_413(self, client, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "batch_max_size", 2)
+        resp = client.post("/lookup/batch", json=[{"country": "DE", "postal_code": "10115"}] * 3)
+        assert resp.status_code == 413
+        assert "maximum of 2" in resp.json()["detail"]
+
+    def test_oversized_body_is_413_before_parsing(self, client, monkeypatch):
+        from app import main
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "batch_max_bytes", 100)
+        items = [{"country": "DE", "postal_code": "10115"}] * 3
+        monkeypatch.setattr(main, "lookup", None)  # never reached
+        resp = client.post("/lookup/batch", json=items)
+        assert resp.status_code == 413
+        assert "maximum of 100 bytes" in resp.json()["detail"]
+
+    def test_oversized_body_without_length_is_cut_off(self, client, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "batch_max_bytes", 60)
+        item = b'{"country": "DE", "postal_code": "10115"}'
+        chunks = [b"[" + item, b", " + item + b"]"]  # streamed, so no Content-Length
+        headers = {"Content-Type": "application/json"}
+        resp = client.post("/lookup/batch", content=iter(chunks), headers=headers)
+        assert resp.status_code == 413
+        assert "maximum of 60 bytes" in resp.json()["detail"]
+
+    def test_batch_counts_as_one_request(self, client):
+        """More items than the per-minute limit (120) still go through in one call."""
+        items = [{"country": "AT", "postal_code": "1010"}] * 500
+        resp = client.post("/lookup/batch", json=items)
+        assert resp.status_code == 200
+        assert len(resp.json()) == 500
+
+    def test_422_on_malformed_body(self, client):
+        resp = client.post("/lookup/batch", json={"country": "DE", "postal_code": "10115"})
+        assert resp.status_code == 422
+
 
 # ── /pattern endpoint tests ──────────────────────────────────────────────────
 
@@ -154,6 +245,21 @@ class TestHealthEndpoint:
         data = resp.json()
         assert "total_nuts_names" in data
 
+    def test_includes_data_generation(self, client):
+        from app import data_loader
+
+        data = client.get("/health").json()
+        assert data["data_generation"] == data_loader.get_generation().id
+        assert data["data_built_at"]
+        assert isinstance(data["data_build_timings"], dict)
+
+    def test_includes_lookup_cache_counters(self, client):
+        client.get("/lookup", params={"postal_code": "10115", "country": "DE"})
+        client.get("/lookup", params={"postal_code": "10115", "country": "DE"})
+        stats = client.get("/health").json()["lookup_cache"]
+        assert stats["hits"] >= 1
+        assert {"size", "max_size", "misses", "evictions", "invalidations"} <= set(stats)
+
     def test_health_includes_token_db_stale_when_db_url_set(self, monkeypatch, mock_data):
         from unittest.mock import patch
 
@@ -297,7 +403,7 @@ class TestAuthBypass:
         from app import auth, data_loader
 
         # Override: no tokens configured (bypass disabled)
-        monkeypatch.setattr(auth, "_get_trusted_tokens", lambda: frozenset())
+        monkeypatch.setattr(auth, "_trusted", auth._build_trusted(frozenset()))
 
         from fastapi.testclient import TestClient
 
@@ -338,6 +444,17 @@ class TestAuthBypass:
         log_text = " ".join(r.message for r in caplog.records if r.name == "app.access")
         assert "token_id=" not in log_text
 
+    def test_audit_log_records_short_circuit_status(self, trusted_client, caplog):
+        with caplog.at_level("INFO", logger="app.access"):
+            trusted_client.get(
+                "/lookup",
+                params={"postal_code": "10115", "country": "DE"},
+                headers={"Authorization": "Bearer wrong-token"},
+            )
+        log_text = " ".join(r.message for r in caplog.records if r.name == "app.access")
+        assert "GET /lookup 401 " in log_text
+        assert "token_id=" not in log_text
+
 
 class TestAdminRefreshEstimatesEndpoint:
     def test_401_without_authorization(self, trusted_client, monkeypatch):
@@ -388,7 +505,13 @@ class TestAdminRefreshEstimatesEndpoint:
 
         async def fake_refresh(client=None):
             return RefreshResult(
-                status="refreshed", previous_count=7000, new_count=7042, skipped_rows=0
+                status="refreshed",
+                previous_count=7000,
+                new_count=7042,
+                skipped_rows=0,
+                added=50,
+                removed=8,
+                changed=3,
             )
 
         monkeypatch.setattr(estimates_refresh, "refresh_estimates_once", fake_refresh)
@@ -402,6 +525,7 @@ class TestAdminRefreshEstimatesEndpoint:
         assert body["status"] == "refreshed"
         assert body["previous_count"] == 7000
         assert body["new_count"] == 7042
+        assert (body["added"], body["removed"], body["changed"]) == (50, 8, 3)
 
     def test_200_on_unchanged_refresh(self, trusted_client, monkeypatch):
         """When upstream content is unchanged (304 / identical hash), the
@@ -486,6 +610,30 @@ class TestAdminRefreshEstimatesEndpoint:
         assert body["candidate_count"] == 12
 
 
+class TestMetricsEndpoint:
+    def test_prometheus_text_with_lookup_counters(self, client):
+        client.get("/lookup", params={"postal_code": "10115", "country": "DE"})
+        client.get("/lookup", params={"postal_code": "99999", "country": "SE"})
+        client.get("/lookup", params={"postal_code": "99999", "country": "XX"})
+        resp = client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'pc2nuts_lookups_total{tier="exact"}' in resp.text
+        assert 'pc2nuts_lookup_errors_total{status="400",country="SE"}' in resp.text
+        assert 'pc2nuts_lookup_stage_seconds_bucket{stage="waterfall",le="+Inf"}' in resp.text
+
+    def test_rate_limit_rejections_are_counted(self, client):
+        from starlette.requests import Request
+
+        from app import metrics
+        from app.main import _rate_limit_handler
+
+        before = metrics.RATE_LIMITED.labels("/lookup").value
+        request = Request({"type": "http", "path": "/lookup", "headers": [], "query_string": b""})
+        assert _rate_limit_handler(request, None).status_code == 429
+        assert metrics.RATE_LIMITED.labels("/lookup").value == before + 1
+
+
 class TestAdminMemoryEndpoint:
     def test_401_without_authorization(self, trusted_client):
         resp = trusted_client.get("/admin/memory")
@@ -512,6 +660,7 @@ class TestAdminMemoryEndpoint:
             "asyncio_tasks",
             "thread_count",
             "gc_top_30_types",
+            "gc_pauses",
         }
         # Module-scoped sizes are present and integer-valued
         for key in (
@@ -526,6 +675,7 @@ class TestAdminMemoryEndpoint:
         assert isinstance(body["gc_top_30_types"], list)
         assert len(body["gc_top_30_types"]) > 0
         assert {"type", "count"} <= set(body["gc_top_30_types"][0].keys())
+        assert set(body["gc_pauses"]["generations"]) == {"0", "1", "2"}
         # asyncio task info has the expected shape
         assert "count" in body["asyncio_tasks"]
         # thread count is at least 1 (the test thread itself)
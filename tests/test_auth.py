@@ -183,8 +183,8 @@ class TestIsTrusted:
         self._auth = auth
 
     def _set_tokens(self, *tokens):
-        # Patch auth's view of settings.trusted_tokens
-        self._monkeypatch.setattr(self._auth, "_get_trusted_tokens", lambda: frozenset(tokens))
+        # Swap in the verification map auth checks candidates against
+        self._monkeypatch.setattr(self._auth, "_trusted", self._auth._build_trusted(frozenset(tokens)))
 
     def test_match_against_single_token(self):
         self._set_tokens("abc")
@@ -232,7 +232,7 @@ class TestAuthMiddleware:
 
         app = Starlette(routes=[Route("/x", endpoint), Route("/health", health_endpoint)])
         app.add_middleware(auth.AuthMiddleware)
-        monkeypatch.setattr(auth, "_get_trusted_tokens", lambda: frozenset(trusted))
+        monkeypatch.setattr(auth, "_trusted", auth._build_trusted(frozenset(trusted)))
         return app
 
     def test_no_header_marks_untrusted(self, monkeypatch):
@@ -280,6 +280,29 @@ class TestAuthMiddleware:
             resp = client.get("/health", headers={"Authorization": "Bearer wrong-token"})
         assert resp.status_code == 200
 
+    def test_lifespan_scope_passes_through(self, monkeypatch):
+        """Non-HTTP scopes (lifespan, websocket) carry no path or headers to check."""
+        from contextlib import asynccontextmanager
+
+        from starlette.applications import Starlette
+        from starlette.testclient import TestClient
+
+        from app import auth
+
+        started = []
+
+        @asynccontextmanager
+        async def lifespan(app):
+            started.append(True)
+            yield
+
+        app = Starlette(lifespan=lifespan)
+        app.add_middleware(auth.AuthMiddleware)
+        monkeypatch.setattr(auth, "_trusted", auth._build_trusted(frozenset({"good-token"})))
+        with TestClient(app):
+            pass
+        assert started == [True]
+
 
 # ── is_trusted_request predicate ─────────────────────────────────────────────
 
@@ -382,14 +405,22 @@ class TestDBTokensUnion:
 
 
 class TestRefreshDBTokens:
+    @pytest.fixture(autouse=True)
+    def _restore_trusted(self, monkeypatch):
+        from app import auth
+
+        monkeypatch.setattr(auth, "_trusted", auth._trusted)
+        monkeypatch.setattr(auth, "_db_tokens_since", None)
+        monkeypatch.setattr(auth, "_last_full_sync", 0.0)
+
     def test_refresh_populates_db_tokens(self, monkeypatch):
         from app import auth
 
         class FakeDB:
-            def list_active(self):
-                return [
-                    {"value": "a", "id": 1, "label": "x", "created_at": "..."},
-                    {"value": "b", "id": 2, "label": "y", "created_at": "..."},
+            def sync_rows(self, since=None):
+                return "2026-10-01 12:00:00", [
+                    {"value": "a", "id": 1, "created_at": "...", "revoked_at": None},
+                    {"value": "b", "id": 2, "created_at": "...", "revoked_at": None},
                 ]
 
         monkeypatch.setattr(auth, "_db_tokens", frozenset())
@@ -403,7 +434,7 @@ class TestRefreshDBTokens:
         from app.token_db import TokenDBError
 
         class FailingDB:
-            def list_active(self):
+            def sync_rows(self, since=None):
                 raise TokenDBError("boom")
 
         monkeypatch.setattr(auth, "_db_tokens", frozenset({"keepme"}))
@@ -416,8 +447,8 @@ class TestRefreshDBTokens:
         from app import auth
 
         class FakeDB:
-            def list_active(self):
-                return [{"value": "good"}]
+            def sync_rows(self, since=None):
+                return "2026-10-01 12:00:00", [{"value": "good", "revoked_at": None}]
 
         monkeypatch.setattr(auth, "_db_tokens", frozenset({"old"}))
         monkeypatch.setattr(auth, "_token_db_stale", True)
@@ -425,6 +456,107 @@ class TestRefreshDBTokens:
         assert auth._db_tokens == frozenset({"good"})
         assert auth._token_db_stale is False
 
+    def test_refresh_swaps_in_a_map_of_db_and_env_tokens(self, monkeypatch):
+        from app import auth
+
+        class FakeDB:
+            def sync_rows(self, since=None):
+                return "2026-10-01 12:00:00", [{"value": "db-token", "revoked_at": None}]
+
+        monkeypatch.setattr(auth, "_db_tokens", frozenset())
+        monkeypatch.setattr(
+            type(auth.settings), "trusted_tokens", property(lambda self: frozenset({"env-token"}))
+        )
+        before = auth._trusted
+        auth.refresh_db_tokens(FakeDB())
+        assert auth._trusted is not before
+        assert auth._trusted.tokens == frozenset({"db-token", "env-token"})
+        assert auth.verify_token("db-token") == auth.token_id("db-token")
+        assert auth.verify_token("env-token") == auth.token_id("env-token")
+        assert auth.verify_token("old") is None
+
+    def test_refresh_failure_keeps_the_map(self, monkeypatch):
+        from app import auth
+        from app.token_db import TokenDBError
+
+        class FailingDB:
+            def sync_rows(self, since=None):
+                raise TokenDBError("boom")
+
+        before = auth._trusted
+        auth.refresh_db_tokens(FailingDB())
+        assert auth._trusted is before
+
+    def test_later_refreshes_apply_deltas_since_the_db_clock(self, monkeypatch):
+        from app import auth
+
+        class FakeDB:
+            def __init__(self):
+                self.calls = []
+                self.replies = [
+                    (
+                        "2026-10-01 12:00:00",
+                        [{"value": "a", "revoked_at": None}, {"value": "b", "revoked_at": None}],
+                    ),
+                    (
+                        "2026-10-01 12:01:00",
+                        [
+                            {"value": "a", "revoked_at": "2026-10-01 12:00:30"},
+                            {"value": "c", "revoked_at": None},
+                        ],
+                    ),
+                    ("2026-10-01 12:02:00", []),
+                ]
+
+            def sync_rows(self, since=None):
+                self.calls.append(since)
+                return self.replies[len(self.calls) - 1]
+
+        db = FakeDB()
+        auth.refresh_db_tokens(db)
+        auth.refresh_db_tokens(db)
+        assert auth._db_tokens == frozenset({"b", "c"})
+        assert auth.is_trusted("c") and not auth.is_trusted("a")
+        before = auth._trusted
+        auth.refresh_db_tokens(db)
+        assert auth._trusted is before  # nothing changed, nothing rebuilt
+        assert db.calls == [None, "2026-10-01 12:00:00", "2026-10-01 12:01:00"]
+
+    def test_full_resync_after_the_interval(self, monkeypatch):
+        from app import auth
+
+        calls = []
+
+        class FakeDB:
+            def sync_rows(self, since=None):
+                calls.append(since)
+                return "2026-10-01 12:00:00", [{"value": "a", "revoked_at": None}]
+
+        monkeypatch.setattr(auth.settings, "token_full_resync_seconds", 1)
+        auth.refresh_db_tokens(FakeDB())
+        auth.refresh_db_tokens(FakeDB())
+        monkeypatch.setattr(auth, "_last_full_sync", auth._last_full_sync - 1)
+        auth.refresh_db_tokens(FakeDB())
+        assert calls == [None, "2026-10-01 12:00:00", None]
+
+    def test_failed_delta_is_retried_from_the_same_clock(self, monkeypatch):
+        from app import auth
+        from app.token_db import TokenDBError
+
+        calls = []
+
+        class FlakyDB:
+            def sync_rows(self, since=None):
+                calls.append(since)
+                if len(calls) == 2:
+                    raise TokenDBError("boom")
+                return f"2026-10-01 12:0{len(calls)}:00", []
+
+        for _ in range(3):
+            auth.refresh_db_tokens(FlakyDB())
+        assert calls == [None, "2026-10-01 12:01:00", "2026-10-01 12:01:00"]
+        assert auth._token_db_stale is False
+
 
 # ── lifespan refresh task (#61) ──────────────────────────────────────────────
 
@@ -1,5 +1,9 @@
 """Tests for data_loader.py — normalize functions and lookup tiers."""
 
+from unittest.mock import patch
+
+import pytest
+
 from app.data_loader import lookup, normalize_country, normalize_postal_code
 
 
@@ -135,6 +139,235 @@ class TestLookup:
         assert result is None
 
 
+class TestNuts3Records:
+    def test_exact_hits_share_one_read_only_result(self, mock_data):
+        result = lookup("DE", "10115")
+        assert lookup("DE", "10117") is result
+        assert dict(result) == {
+            "match_type": "exact",
+            "nuts1": "DE3",
+            "nuts1_confidence": 1.0,
+            "nuts2": "DE30",
+            "nuts2_confidence": 1.0,
+            "nuts3": "DE300",
+            "nuts3_confidence": 1.0,
+            "nuts1_name": "Berlin",
+            "nuts2_name": "Berlin",
+            "nuts3_name": "Berlin",
+        }
+        with pytest.raises(TypeError):
+            result["nuts3"] = "DE712"
+
+    def test_single_nuts3_fallback_is_shared(self, mock_data):
+        assert lookup("XX", "9998") is lookup("XX", "9999")
+
+    def test_records_follow_the_generation(self, mock_data):
+        from app import data_loader
+
+        data_loader._nuts_names["DE300"] = "Berlin-Mitte"
+        assert lookup("DE", "10115")["nuts3_name"] == "Berlin"
+        data_loader._publish()
+        assert lookup("DE", "10115")["nuts3_name"] == "Berlin-Mitte"
+
+    def test_tier_result_resolves_parents_outside_the_record(self, mock_data):
+        from app import data_loader
+
+        result = data_loader._tier_result(
+            data_loader.get_generation(), "approximate", "DE300", "DE7", "DE71", 0.5, 0.5, 0.4
+        )
+        assert (result["nuts1_name"], result["nuts2_name"], result["nuts3_name"]) == (
+            "Hessen",
+            "Darmstadt",
+            "Berlin",
+        )
+
+    def test_code_without_a_record_is_built_on_the_fly(self, mock_data):
+        from app import data_loader
+
+        record = data_loader._nuts3(data_loader.get_generation(), "FRY10")
+        assert record.nuts2_name == "Guadeloupe"
+        assert data_loader._nuts3(data_loader.get_generation(), "ZZ999").exact["nuts3_name"] is None
+
+
+class TestCountryRegistry:
+    def test_loaded_countries_include_tercet_and_settings_fallback(self, mock_data):
+        from app.data_loader import get_loaded_countries
+
+        loaded = get_loaded_countries()
+        assert {"DE", "AT", "EL", "XX", "YY"} <= loaded
+        assert "ME" in loaded  # single_nuts3_fallback in settings.json
+        assert "ZZ" not in loaded
+
+    def test_per_country_counts(self, mock_data):
+        from app.data_loader import get_country_counts
+
+        counts = get_country_counts()
+        assert counts["DE"] == 3
+        assert counts["YY"] == 4
+        assert "ME" not in counts  # no TERCET rows, fallback only
+
+    def test_available_countries_string_is_sorted(self, mock_data):
+        from app.data_loader import get_available_countries, get_loaded_countries
+
+        assert get_available_countries() == ", ".join(sorted(get_loaded_countries()))
+
+    def test_registry_is_swapped_not_mutated(self, mock_data):
+        """A rebuild replaces the registry, so a reader holding the old one is unaffected."""
+        from app import data_loader
+
+        before = data_loader.get_loaded_countries()
+        data_loader._lookup[("SE", "11122")] = "SE110"
+        data_loader._build_prefix_index()
+        data_loader._publish()
+        after = data_loader.get_loaded_countries()
+        assert "SE" not in before
+        assert "SE" in after
+        assert after is not before
+
+    def test_not_derived_from_lookup_per_call(self, mock_data):
+        """Country membership is precomputed — later table writes need a rebuild."""
+        from app import data_loader
+
+        data_loader._lookup[("SE", "11122")] = "SE110"
+        assert "SE" not in data_loader.get_loaded_countries()
+
+
+def _counter_vote(cc: str, postal_code: str) -> dict | None:
+    """Reference Tier 3 implementation: live Counter vote over the raw codes."""
+    from collections import Counter
+
+    from app import data_loader
+    from app.config import settings
+
+    neighbors_by_prefix: dict[str, list[str]] = {}
+    for (c, pc), nuts3 in data_loader._lookup.items():
+        if c == cc:
+            for length in range(1, len(pc)):
+                neighbors_by_prefix.setdefault(pc[:length], []).append(nuts3)
+    for length in range(len(postal_code), 0, -1):
+        neighbors = neighbors_by_prefix.get(postal_code[:length])
+        if neighbors:
+            break
+    else:
+        return None
+    prefix_ratio = length / len(postal_code)
+    caps = settings.approximate_confidence_caps
+    out = {}
+    for level, width in (("nuts1", 3), ("nuts2", 4), ("nuts3", 5)):
+        winner, count = Counter(n[:width] for n in neighbors).most_common(1)[0]
+        out[level] = winner
+        out[f"{level}_confidence"] = round(min((count / len(neighbors)) * prefix_ratio, caps[level]), 2)
+    if out["nuts1_confidence"] < settings.approximate_min_confidence:
+        return None
+    return out
+
+
+class TestPrefixVotes:
+    def test_summary_fields(self, mock_data):
+        from app import data_loader
+
+        votes = data_loader._PrefixVotes(
+            *data_loader._unpack_votes(data_loader._prefix_index["YY"]["1"], data_loader._nuts_codes)
+        )
+        assert votes.total == 3
+        assert (votes.nuts3, votes.nuts3_count) == ("YY111", 3)
+        assert (votes.nuts1, votes.nuts1_count) == ("YY1", 3)
+
+    def test_pack_roundtrip(self):
+        from app import data_loader
+
+        votes = data_loader._PrefixVotes(4_000_000, "DE1", 3_999_999, "DE11", 257, "DE111", 1)
+        code_ids = {"DE3": 0}
+        packed = data_loader._pack_votes(votes, code_ids)
+        assert code_ids == {"DE3": 0, "DE1": 1, "DE11": 2, "DE111": 3}
+        assert data_loader._unpack_votes(packed, tuple(code_ids)) == votes
+
+    def test_index_holds_no_per_prefix_objects(self, mock_data):
+        from array import array
+
+        from app import data_loader
+
+        assert data_loader._prefix_index
+        for table in data_loader._prefix_index.values():
+            # A few flat buffers per country, however many prefixes it has
+            assert isinstance(table.index.keys, bytes)
+            assert isinstance(table.counts, array)
+            assert isinstance(table.ids, array)
+
+    def test_matches_counter_vote_including_ties(self, mock_data):
+        """Precomputed summaries must give bit-identical results to a live vote."""
+        import random
+
+        from app import data_loader
+
+        rng = random.Random(42)
+        data_loader._lookup.clear()
+        for _ in range(2000):
+            pc = f"{rng.randrange(100000):05d}"
+            # Few regions per prefix so ties between NUTS3 codes are common
+            data_loader._lookup[("DE", pc)] = rng.choice(["DE111", "DE112", "DE121", "DE211", "DE300"])
+        data_loader._build_prefix_index()
+        data_loader._publish()
+
+        for _ in range(500):
+            pc = f"{rng.randrange(100000):05d}"
+            expected = _counter_vote("DE", pc)
+            got = data_loader._estimate_by_prefix("DE", pc)
+            if expected is None:
+                assert got is None
+                continue
+            for field, value in expected.items():
+                assert got[field] == value, (pc, field)
+
+
+    def test_ties_go_to_the_first_loaded_code(self, mock_data):
+        """A tie goes to the code loaded first, even once compaction has sorted the rows."""
+        from app import data_loader
+
+        data_loader._lookup.clear()
+        data_loader._lookup[("DE", "10999")] = "DE712"
+        data_loader._lookup[("DE", "10100")] = "DE300"
+        data_loader._lookup.compact()  # as load_data() does before building
+        data_loader._build_prefix_index()
+        data_loader._publish()
+
+        result = data_loader._estimate_by_prefix("DE", "10555")
+        assert (result["nuts3"], result["nuts3_confidence"]) == ("DE712", 0.2)
+
+    def test_tie_order_survives_the_sqlite_cache(self, mock_data, tmp_path):
+        from app import data_loader
+
+        data_loader._lookup.clear()
+        data_loader._lookup[("DE", "10999")] = "DE712"
+        data_loader._lookup[("DE", "10100")] = "DE300"
+        data_loader._lookup.compact()
+        db = tmp_path / "cache.db"
+        data_loader._save_to_db(db)
+        data_loader._lookup.clear()
+        assert data_loader._load_from_db(db)
+        data_loader._build_prefix_index()
+        data_loader._publish()
+
+        result = data_loader._estimate_by_prefix("DE", "10555")
+        assert result["nuts3"] == "DE712"
+
+
+class TestSqliteCache:
+    def test_save_and_load_roundtrip(self, mock_data, tmp_path):
+        from app import data_loader
+
+        expected = dict(data_loader._lookup.items())
+        db = tmp_path / "cache.db"
+        data_loader._save_to_db(db)
+        data_loader._lookup.clear()
+
+        assert data_loader._load_from_db(db) is True
+        assert dict(data_loader._lookup.items()) == expected
+        # Loaded straight into packed columns, nothing left in the staging dict
+        assert data_loader._lookup.countries()["DE"] == 3
+        assert lookup("DE", "10115")["nuts3"] == "DE300"
+
+
 class TestParseEstimatesFromText:
     def test_parses_well_formed_csv(self):
         from app.data_loader import parse_estimates_from_text
@@ -165,6 +398,19 @@ class TestParseEstimatesFromText:
         assert ("DE", "99998") not in d
         assert ("DE", "99999") in d
 
+    def test_equal_rows_are_shared(self):
+        from app.data_loader import parse_estimates_from_text
+
+        text = (
+            "COUNTRY_CODE,POSTAL_CODE,ESTIMATED_NUTS3,ESTIMATED_NUTS2,ESTIMATED_NUTS1,CONFIDENCE\n"
+            "DE,99999,DE300,DE30,DE3,high\n"
+            "DE,99998,DE300,DE30,DE3,high\n"
+            "DE,99997,DE300,DE30,DE3,medium\n"
+        )
+        d, _ = parse_estimates_from_text(text)
+        assert d[("DE", "99999")] is d[("DE", "99998")]
+        assert d[("DE", "99997")] is not d[("DE", "99999")]
+
     def test_handles_utf8_bom(self):
         from app.data_loader import parse_estimates_from_text
 
@@ -175,3 +421,517 @@ class TestParseEstimatesFromText:
         d, skipped = parse_estimates_from_text(text)
         assert len(d) == 1
         assert ("DE", "99999") in d
+
+
+# ── Parallel TERCET download ────────────────────────────────────────────────
+
+
+def _zip_bytes(rows: list[tuple[str, str]]) -> bytes:
+    import io
+    import zipfile
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("data.csv", "CODE;NUTS3\n" + "".join(f"{pc};{nuts3}\n" for pc, nuts3 in rows))
+    return buf.getvalue()
+
+
+class TestParallelDownload:
+    BASE = "https://tercet.test/NUTS-2024/"
+
+    def _run(self, mock_data, tmp_path, monkeypatch, files: dict[str, bytes], *, listing=(), delays=None):
+        """Cold-load against a fake TERCET server; returns (requested URLs, peak in-flight requests)."""
+        import threading
+        import time
+        from unittest.mock import patch
+
+        import httpx
+
+        from app import data_loader
+
+        monkeypatch.setattr(data_loader.settings, "data_dir", str(tmp_path))
+        monkeypatch.setattr(data_loader.settings, "estimates_csv", str(tmp_path / "none.csv"))
+        monkeypatch.setattr(data_loader.settings, "tercet_base_url", self.BASE)
+        monkeypatch.setattr(data_loader.settings, "countries", ["AT", "DE", "NL"])
+        monkeypatch.setattr(data_loader.settings, "snapshot_enabled", False)
+        monkeypatch.setattr(data_loader.settings, "download_concurrency", 4)
+
+        lock = threading.Lock()
+        requested: list[str] = []
+        in_flight = peak = 0
+
+        def handler(request):
+            nonlocal in_flight, peak
+            url = str(request.url)
+            with lock:
+                requested.append(url)
+                in_flight += 1
+                peak = max(peak, in_flight)
+            try:
+                time.sleep((delays or {}).get(url, 0.01))
+                if url == self.BASE:
+                    return httpx.Response(200, text="".join(f'<a href="{name}">' for name in listing))
+                name = url.rsplit("/", 1)[-1]
+                if name in files:
+                    return httpx.Response(200, content=files[name])
+                return httpx.Response(404)
+            finally:
+                with lock:
+                    in_flight -= 1
+
+        real_client = httpx.Client
+        with patch.object(
+            data_loader.httpx,
+            "Client",
+            lambda **kw: real_client(transport=httpx.MockTransport(handler), **kw),
+        ):
+            data_loader.load_data()
+        return requested, peak
+
+    def test_first_write_wins_follows_listing_order_not_finish_order(self, mock_data, tmp_path, monkeypatch):
+        from app import data_loader
+
+        files = {
+            "pc2024_DE_NUTS-2024_v1.0.zip": _zip_bytes([("10115", "DE300"), ("20095", "DE600")]),
+            "pc2024_DE_NUTS-2024_v2.0.zip": _zip_bytes([("10115", "DE111"), ("80331", "DE212")]),
+        }
+        listing = list(files)
+        # The first-listed file finishes last
+        delays = {self.BASE + listing[0]: 0.2}
+        self._run(mock_data, tmp_path, monkeypatch, files, listing=listing, delays=delays)
+
+        assert data_loader._lookup[("DE", "10115")] == "DE300"
+        assert data_loader._lookup[("DE", "80331")] == "DE212"
+        timings = data_loader.get_load_timings()["DE"]
+        assert timings["files"] == 2
+        assert timings["entries"] == 3
+        assert timings["fetch_s"] > 0.2
+
+    def test_guessed_urls_probe_countries_in_parallel(self, mock_data, tmp_path, monkeypatch):
+        from app import data_loader
+
+        version = data_loader.settings.nuts_version
+        files = {
+            # AT's first guess 404s; its second one exists
+            f"pc2025_AT_NUTS-{version}_v2.0.zip": _zip_bytes([("1010", "AT130")]),
+            f"pc2025_DE_NUTS-{version}_v1.0.zip": _zip_bytes([("10115", "DE300")]),
+            # A later DE guess that must never be fetched: the first hit wins
+            f"pc2024_DE_NUTS-{version}_v1.0.zip": _zip_bytes([("10115", "DE999")]),
+        }
+        requested, peak = self._run(mock_data, tmp_path, monkeypatch, files)
+
+        assert dict(data_loader._lookup.items()) == {("AT", "1010"): "AT130", ("DE", "10115"): "DE300"}
+        assert self.BASE + f"pc2024_DE_NUTS-{version}_v1.0.zip" not in requested
+        assert peak > 1
+        assert set(data_loader.get_load_timings()) == {"AT", "DE"}
+
+    def _run_partial(self, mock_data, tmp_path, monkeypatch, files):
+        """Cold-load with NL's first guess answering only after the startup timeout."""
+        from app import data_loader
+
+        monkeypatch.setattr(data_loader.settings, "startup_timeout", 0.3)
+        nl_guess = next(data_loader._guess_zip_urls_for_country(self.BASE, "NL"))
+        self._run(mock_data, tmp_path, monkeypatch, files, delays={nl_guess: 0.6})
+
+    def test_stale_reload_refetches_instead_of_reusing_the_partial_cache(
+        self, mock_data, tmp_path, monkeypatch
+    ):
+        from app import data_loader
+
+        version = data_loader.settings.nuts_version
+        files = {
+            f"pc2025_AT_NUTS-{version}_v1.0.zip": _zip_bytes([("1010", "AT130")]),
+            f"pc2025_DE_NUTS-{version}_v1.0.zip": _zip_bytes([("10115", "DE300")]),
+        }
+        self._run_partial(mock_data, tmp_path, monkeypatch, files)
+        db = data_loader._db_path()
+        assert data_loader.get_generation().stale
+        assert data_loader._read_db_metadata(db, "stale") == "1"
+
+        # The fresh DB cache holds the partial load, so the reload must download again
+        files[f"pc2025_NL_NUTS-{version}_v1.0.zip"] = _zip_bytes([("1011", "NL329")])
+        requested, _ = self._run(mock_data, tmp_path, monkeypatch, files)
+
+        gen = data_loader.get_generation()
+        assert self.BASE + f"pc2025_NL_NUTS-{version}_v1.0.zip" in requested
+        assert gen.lookup.get(("NL", "1011")) == "NL329"
+        assert not gen.stale
+        assert data_loader._read_db_metadata(db, "stale") == "0"
+
+    def test_stale_db_keeps_the_generation_stale(self, mock_data, tmp_path, monkeypatch):
+        from app import data_loader
+
+        monkeypatch.setattr(data_loader.settings, "data_dir", str(tmp_path))
+        monkeypatch.setattr(data_loader.settings, "estimates_csv", str(tmp_path / "none.csv"))
+        monkeypatch.setattr(data_loader.settings, "snapshot_enabled", False)
+        monkeypatch.setattr(data_loader, "_data_stale", True)
+        data_loader._save_to_db(data_loader._db_path())
+
+        # A restart served from the partial cache is still partial
+        data_loader.load_data()
+
+        assert data_loader.get_generation().stale
+
+    def test_failed_refetch_keeps_the_stale_generation(self, mock_data, tmp_path, monkeypatch):
+        import shutil
+
+        from app import data_loader
+
+        version = data_loader.settings.nuts_version
+        files = {f"pc2025_DE_NUTS-{version}_v1.0.zip": _zip_bytes([("10115", "DE300")])}
+        self._run_partial(mock_data, tmp_path, monkeypatch, files)
+        before = data_loader.get_generation()
+        assert before.stale
+
+        # TERCET is unreachable and the ZIP cache is gone: nothing new to publish
+        shutil.rmtree(tmp_path / f"NUTS-{version}")
+        self._run(mock_data, tmp_path, monkeypatch, {})
+
+        after = data_loader.get_generation()
+        assert after.id == before.id
+        assert after.stale
+
+
+# ── Streaming ZIP ingest ────────────────────────────────────────────────────
+
+
+class TestStreamingIngest:
+    def _zip(self, tmp_path, members: dict[str, bytes]):
+        import zipfile
+
+        path = tmp_path / "src.zip"
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in members.items():
+                zf.writestr(name, data)
+        return path
+
+    def test_detects_encoding_and_dialect_per_member(self, tmp_path):
+        from app.data_loader import _iter_zip_rows
+
+        path = self._zip(
+            tmp_path,
+            {
+                "utf8_bom.csv": "﻿CODE,NUTS3,NAME\n10115,DE300,Berlin\n".encode(),
+                "latin1.txt": "PC\tNUTS3\tNAME\n1010\tAT130\tWien Zentrum\n20095\tAT130\tGöß\n".encode(
+                    "latin-1"
+                ),
+                "readme.pdf": b"%PDF",
+                "with_cc.csv": b"COUNTRY_CODE;POSTAL_CODE;NUTS_ID\nli;9490;LI000\n",
+            },
+        )
+        assert list(_iter_zip_rows(path, "src.zip", "DE")) == [
+            ("DE", "10115", "DE300"),
+            ("DE", "1010", "AT130"),
+            ("DE", "20095", "AT130"),
+            ("LI", "9490", "LI000"),
+        ]
+
+    def test_member_is_streamed_not_read_whole(self, tmp_path, monkeypatch):
+        import zipfile
+
+        from app import data_loader
+
+        body = "CODE;NUTS3\n" + "".join(f"{i:06d};DE{i % 900:03d}\n" for i in range(200_000))
+        path = self._zip(tmp_path, {"big.csv": body.encode()})
+        monkeypatch.setattr(zipfile.ZipFile, "read", None)  # any whole-member read would fail
+
+        rows = data_loader._iter_zip_rows(path, "big.zip", "DE")
+        assert next(rows) == ("DE", "000000", "DE000")
+        assert sum(1 for _ in rows) == 199_999
+
+    def test_non_utf8_byte_past_the_sample_does_not_abort(self, tmp_path, monkeypatch):
+        from app import data_loader
+
+        monkeypatch.setattr(data_loader, "_SAMPLE_BYTES", 64)
+        body = (
+            b"CODE;NUTS3;NAME\n"
+            + b"".join(b"%05d;DE300;x\n" % i for i in range(20))
+            + b"99999;DE300;G\xf6\xdf\n"
+        )
+        path = self._zip(tmp_path, {"tail.csv": body})
+        rows = list(data_loader._iter_zip_rows(path, "tail.zip", "DE"))
+        assert len(rows) == 21
+        assert rows[-1] == ("DE", "99999", "DE300")
+
+    def test_oversized_member_is_skipped(self, tmp_path, monkeypatch):
+        from app import data_loader
+
+        monkeypatch.setattr(data_loader, "_MAX_UNCOMPRESSED_SIZE", 10)
+        path = self._zip(tmp_path, {"a.csv": b"CODE;NUTS3\n10115;DE300\n"})
+        assert list(data_loader._iter_zip_rows(path, "a.zip", "DE")) == []
+
+    def test_merge_compacts_while_streaming(self, mock_data, monkeypatch):
+        from app import data_loader
+
+        monkeypatch.setattr(data_loader, "_COMPACT_MIN_ROWS", 10)
+        data_loader._lookup.clear()
+        rows = [("DE", f"{i:05d}", "DE300") for i in range(100)]
+        assert data_loader._merge_rows(iter(rows)) == 100
+        # Packed along the way, not only once at the end
+        assert data_loader._lookup.countries()["DE"] >= 80
+        assert dict(data_loader._lookup.items()) == {(cc, pc): n for cc, pc, n in rows}
+
+    def test_download_streams_to_cache_and_cleans_up_on_error(self, tmp_path):
+        import httpx
+
+        from app.data_loader import _download_zip
+
+        def handler(request):
+            if request.url.path.endswith("broken.zip"):
+                raise httpx.ReadError("connection reset")
+            return httpx.Response(200, content=b"PK\x05\x06" + b"\0" * 18)
+
+        with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+            assert _download_zip(client, "https://x.test/ok.zip", tmp_path / "ok.zip") is True
+            assert (tmp_path / "ok.zip").read_bytes().startswith(b"PK")
+            with patch("app.data_loader.time.sleep"):
+                assert _download_zip(client, "https://x.test/broken.zip", tmp_path / "broken.zip") is False
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["ok.zip"]
+
+
+class TestHotReload:
+    @pytest.fixture
+    def data_dir(self, mock_data, tmp_path, monkeypatch):
+        """A data dir whose SQLite cache holds the mock data plus one SE row."""
+        from app import data_loader
+
+        monkeypatch.setattr(data_loader.settings, "data_dir", str(tmp_path))
+        monkeypatch.setattr(data_loader.settings, "estimates_csv", str(tmp_path / "missing.csv"))
+        monkeypatch.setattr(data_loader.settings, "snapshot_enabled", False)
+        data_loader._lookup[("SE", "11122")] = "SE110"
+        data_loader._save_to_db(data_loader._db_path())
+        del data_loader._lookup[("SE", "11122")]
+        return tmp_path
+
+    def test_reload_publishes_a_new_generation(self, data_dir):
+        from app import data_loader
+
+        before = data_loader.get_generation()
+        data_loader.load_data()
+        after = data_loader.get_generation()
+
+        assert after.id == before.id + 1
+        assert lookup("SE", "11122")["nuts3"] == "SE110"
+        assert "SE" in data_loader.get_loaded_countries()
+        assert {"load_s", "index_s", "total_s"} <= set(after.build_timings)
+        assert after.built_at
+        # The outgoing generation is left intact for readers still holding it
+        assert ("SE", "11122") not in before.lookup
+        assert before.lookup.get(("DE", "10115")) == "DE300"
+
+    def test_requests_see_the_old_generation_during_a_build(self, data_dir):
+        from app import data_loader
+
+        seen = []
+        build_index = data_loader._build_prefix_index
+
+        def observe():
+            # Working tables are already filled; the live generation must not be
+            seen.append((lookup("DE", "10115"), "SE" in data_loader.get_loaded_countries()))
+            build_index()
+
+        with patch.object(data_loader, "_build_prefix_index", observe):
+            data_loader.load_data()
+
+        assert seen == [(lookup("DE", "10115"), False)]
+        assert seen[0][0]["match_type"] == "exact"
+
+    def test_reload_freezes_the_heap_before_publishing(self, data_dir, monkeypatch):
+        from app import data_loader
+
+        frozen_at = []
+
+        def freeze():
+            frozen_at.append(data_loader._gen.id)
+            return 1
+
+        monkeypatch.setattr(data_loader.gc_stats, "freeze_heap", freeze)
+        before = data_loader.get_generation()
+        data_loader.load_data()
+        assert frozen_at == [before.id]
+        assert "gc_freeze_s" in data_loader.get_generation().build_timings
+
+        monkeypatch.setattr(data_loader.settings, "gc_freeze", False)
+        data_loader.load_data()
+        assert frozen_at == [before.id]
+        assert "gc_freeze_s" not in data_loader.get_generation().build_timings
+
+    def test_empty_reload_keeps_the_live_generation(self, data_dir):
+        from app import data_loader
+
+        before = data_loader.get_generation()
+        with patch.object(data_loader, "_load_tables"):
+            data_loader.load_data()
+        assert data_loader.get_generation() is before
+        assert lookup("DE", "10115")["nuts3"] == "DE300"
+
+    def test_remote_estimates_survive_a_reload(self, data_dir, monkeypatch):
+        from app import data_loader
+
+        monkeypatch.setattr(data_loader.settings, "estimates_refresh_url", "https://example.invalid/e.csv")
+        remote = {
+            ("PT", "1000001"): {
+                "nuts3": "PT170",
+                "nuts2": "PT17",
+                "nuts1": "PT1",
+                "nuts3_confidence": 0.9,
+                "nuts2_confidence": 0.9,
+                "nuts1_confidence": 0.9,
+            },
+            # Gains an exact match in the reloaded data, so is revalidated away
+            ("SE", "11122"): {
+                "nuts3": "SE110",
+                "nuts2": "SE11",
+                "nuts1": "SE1",
+                "nuts3_confidence": 0.9,
+                "nuts2_confidence": 0.9,
+                "nuts1_confidence": 0.9,
+            },
+        }
+        assert data_loader.replace_estimates(remote).count == 2
+        data_loader.load_data()
+        assert set(data_loader.get_estimates_table()) == {("PT", "1000001")}
+        assert lookup("PT", "1000-001")["match_type"] == "estimated"
+
+    def test_estimates_swap_leaves_the_outgoing_table_intact(self, mock_data):
+        from app import data_loader
+
+        outgoing = data_loader.get_generation()
+        before = dict(outgoing.estimates)
+        data_loader.replace_estimates({("PT", "1000001"): dict(next(iter(before.values())))})
+        assert outgoing.estimates == before
+        assert set(data_loader.get_estimates_table()) == {("PT", "1000001")}
+
+    def test_estimates_swap_rechecks_against_a_generation_published_meanwhile(self, mock_data, monkeypatch):
+        from app import data_loader
+
+        real_revalidate = data_loader._revalidate_estimates
+        calls = []
+
+        def revalidate_then_reload(estimates, table):
+            calls.append(table)
+            if len(calls) == 1:
+                data_loader._begin_build()
+                data_loader._lookup.update({("PT", "1000001"): "PT170"})
+                data_loader._build_prefix_index()
+                data_loader._publish()
+            return real_revalidate(estimates, table)
+
+        monkeypatch.setattr(data_loader, "_revalidate_estimates", revalidate_then_reload)
+        est = {"nuts3": "PT170", "nuts2": "PT17", "nuts1": "PT1"}
+        est.update(nuts3_confidence=0.9, nuts2_confidence=0.9, nuts1_confidence=0.9)
+        assert data_loader.replace_estimates({("PT", "1000001"): est}).count == 0
+        assert calls[1] is data_loader.get_lookup_table()
+
+    def test_estimates_swap_applies_only_the_diff(self, mock_data):
+        from app import data_loader
+
+        fr = data_loader.get_estimates_table()[("FR", "97105")]
+        pt = dict(fr, nuts3="PT170", nuts2="PT17", nuts1="PT1")
+        diff = data_loader.replace_estimates({("FR", "97105"): dict(fr), ("PT", "1000001"): pt})
+        assert diff == data_loader.EstimatesDiff(added=1, removed=0, changed=0, count=2)
+        kept = data_loader.get_estimates_table()[("FR", "97105")]
+        assert kept is fr
+
+        diff = data_loader.replace_estimates({("FR", "97105"): dict(fr, nuts3_confidence=0.5)})
+        assert diff == data_loader.EstimatesDiff(added=0, removed=1, changed=1, count=1)
+        assert data_loader.get_estimates_table()[("FR", "97105")]["nuts3_confidence"] == 0.5
+
+    def test_identical_estimates_are_not_swapped(self, mock_data):
+        from app import data_loader
+
+        data_loader.replace_estimates(dict(data_loader.get_estimates_table()))
+        live = data_loader.get_generation()
+        diff = data_loader.replace_estimates(dict(data_loader.get_estimates_table()))
+        assert diff == data_loader.EstimatesDiff(added=0, removed=0, changed=0, count=1)
+        assert data_loader.get_generation() is live
+
+    def test_reload_due(self, mock_data):
+        from datetime import datetime, timedelta, timezone
+
+        from app import data_loader
+
+        fresh = datetime.now(timezone.utc).isoformat()
+        expired = (datetime.now(timezone.utc) - timedelta(days=365)).isoformat()
+        live = data_loader._gen
+        for gen, due in [
+            (live._replace(loaded_at=fresh), False),
+            (live._replace(loaded_at=expired), True),
+            (live._replace(loaded_at=fresh, stale=True), True),
+            (live._replace(loaded_at=""), True),
+        ]:
+            with patch.object(data_loader, "_gen", gen):
+                assert data_loader.reload_due() is due
+
+
+class TestLookupResultCache:
+    def test_repeat_lookup_is_a_hit(self, mock_data):
+        from app import data_loader
+
+        before = data_loader.get_lookup_cache_stats()
+        first = lookup("de", "10115")
+        assert lookup("DE", "10115") is first
+        assert lookup("DE", "10-115") == first  # different raw input, separate entry
+        after = data_loader.get_lookup_cache_stats()
+        assert after["hits"] - before["hits"] == 1
+        assert after["misses"] - before["misses"] == 2
+
+    def test_no_match_is_cached(self, mock_data):
+        from app import data_loader
+
+        assert lookup("DE", "99999") is None
+        hits = data_loader.get_lookup_cache_stats()["hits"]
+        assert lookup("DE", "99999") is None
+        assert data_loader.get_lookup_cache_stats()["hits"] == hits + 1
+
+    def test_publish_invalidates(self, mock_data):
+        from app import data_loader
+
+        assert lookup("DE", "10115")["nuts3"] == "DE300"
+        data_loader._begin_build()
+        data_loader._lookup.update({("DE", "10115"): "DE712"})
+        data_loader._build_prefix_index()
+        data_loader._publish()
+        assert lookup("DE", "10115")["nuts3"] == "DE712"
+
+    def test_estimates_replacement_invalidates(self, mock_data):
+        from app import data_loader
+
+        assert lookup("PT", "1000-001") is None
+        data_loader.replace_estimates(
+            {
+                ("PT", "1000001"): {
+                    "nuts3": "PT170",
+                    "nuts2": "PT17",
+                    "nuts1": "PT1",
+                    "nuts3_confidence": 0.9,
+                    "nuts2_confidence": 0.9,
+                    "nuts1_confidence": 0.9,
+                }
+            }
+        )
+        assert lookup("PT", "1000-001")["match_type"] == "estimated"
+
+    def test_estimates_diff_keeps_unaffected_results(self, mock_data):
+        from app import data_loader
+
+        exact = lookup("DE", "10115")
+        estimated = lookup("FR", "97105")
+        assert lookup("PT", "1000-001") is None
+        fr = data_loader.get_estimates_table()[("FR", "97105")]
+        data_loader.replace_estimates(
+            {("FR", "97105"): dict(fr), ("PT", "1000001"): dict(fr, nuts3="PT170", nuts2="PT17", nuts1="PT1")}
+        )
+        hits = data_loader.get_lookup_cache_stats()["hits"]
+        assert lookup("DE", "10115") is exact
+        assert lookup("FR", "97105") is estimated
+        assert data_loader.get_lookup_cache_stats()["hits"] == hits + 2
+        assert lookup("PT", "1000-001")["nuts3"] == "PT170"
+
+    def test_result_from_outgoing_generation_is_not_stored(self, mock_data):
+        from app import data_loader
+
+        outgoing = data_loader.get_generation()
+        data_loader._publish()
+        data_loader._lookup_cache.put(outgoing, ("DE", "10115"), {"nuts3": "stale"})
+        assert lookup("DE", "10115")["nuts3"] == "DE300"
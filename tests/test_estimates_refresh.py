@@ -1,8 +1,11 @@
 """Tests for app.estimates_refresh — periodic refresh of tercet_missing_codes.csv (#44)."""
 
 import asyncio
+import contextlib
 import hashlib
 import importlib
+import json
+import time
 from unittest.mock import patch
 
 import httpx
@@ -51,10 +54,10 @@ class TestFetchRemoteCsv:
         return httpx.AsyncClient(transport=httpx.MockTransport(handler))
 
     @pytest.mark.asyncio
-    async def test_returns_body_on_200(self, url):
+    async def test_returns_parsed_body_on_200(self, url):
         from app.estimates_refresh import fetch_remote_csv
 
-        body = b"COUNTRY_CODE,POSTAL_CODE\nDE,99999\n"
+        body = TestRefreshOnce._csv([("DE", "99999", "high"), ("FR", "75000", "bogus")])
 
         def handler(request):
             assert str(request.url) == url
@@ -64,9 +67,64 @@ class TestFetchRemoteCsv:
             data, status, headers = await fetch_remote_csv(client)
 
         assert status == 200
-        assert data == body
+        assert list(data.estimates) == [("DE", "99999")]
+        assert data.skipped == 1
+        assert (data.sha256, data.size) == (hashlib.sha256(body).hexdigest(), len(body))
         assert headers.get("etag") == "W/abc"
 
+    @pytest.mark.asyncio
+    async def test_chunk_boundaries_do_not_change_the_parse(self, url, monkeypatch):
+        from app import estimates_refresh
+        from app.data_loader import parse_estimates_from_text
+
+        monkeypatch.setattr(estimates_refresh, "_CHUNK", 7)
+        rows = "".join(f'DE,"{20000 + i}",DE300,DE30,DE3,high\r\n' for i in range(50))
+        body = (
+            "\ufeffCOUNTRY_CODE,POSTAL_CODE,ESTIMATED_NUTS3,ESTIMATED_NUTS2,ESTIMATED_NUTS1,CONFIDENCE\r\n"
+            + rows
+            + "AT,1010,AT130,AT13,AT1,höch"
+        ).encode("utf-8")
+
+        async with self._client_with(lambda request: httpx.Response(200, content=body)) as client:
+            data, _, _ = await estimates_refresh.fetch_remote_csv(client)
+
+        assert (data.estimates, data.skipped) == parse_estimates_from_text(body.decode("utf-8-sig"))
+        assert len(data.estimates) == 50
+
+    @pytest.mark.asyncio
+    async def test_parse_error_stops_the_download(self, url):
+        from app import estimates_refresh
+
+        sent = []
+
+        async def chunks():
+            yield b"WRONG,HEADER\n" + b"DE,99999\n" * 7000
+            for i in range(100):
+                sent.append(i)
+                yield b"DE,99999\n" * 7000
+
+        async with self._client_with(lambda request: httpx.Response(200, content=chunks())) as client:
+            with pytest.raises(KeyError):
+                await estimates_refresh.fetch_remote_csv(client)
+
+        assert len(sent) < 100
+
+    @pytest.mark.asyncio
+    async def test_body_over_the_limit_is_refused(self, url, monkeypatch):
+        from app import estimates_refresh
+
+        monkeypatch.setattr(estimates_refresh.settings, "estimates_refresh_max_mb", 1)
+        body = TestRefreshOnce._csv([("DE", str(100000 + i), "high") for i in range(40000)])
+
+        async def chunks():
+            for start in range(0, len(body), 50000):
+                yield body[start : start + 50000]
+
+        for content in (body, chunks()):
+            async with self._client_with(lambda request: httpx.Response(200, content=content)) as client:
+                with pytest.raises(estimates_refresh.BodyTooLarge):
+                    await estimates_refresh.fetch_remote_csv(client)
+
     @pytest.mark.asyncio
     async def test_returns_none_on_304(self, url):
         from app.estimates_refresh import fetch_remote_csv
@@ -135,7 +193,7 @@ class TestRefreshOnce:
         return u
 
     @pytest.fixture
-    def seed_estimates(self):
+    def seed_estimates(self, monkeypatch):
         from app.data_loader import _estimates
 
         _estimates.clear()
@@ -148,7 +206,7 @@ class TestRefreshOnce:
                 "nuts2_confidence": 0.95,
                 "nuts1_confidence": 0.98,
             }
-        yield _estimates
+        yield _live_estimates(monkeypatch, _estimates)
         _estimates.clear()
 
     @staticmethod
@@ -183,6 +241,25 @@ class TestRefreshOnce:
         assert result.new_count == 80
         assert estimates_refresh._stale is False
         assert estimates_refresh._last_etag == "W/new"
+        assert (result.added, result.removed, result.changed) == (80, 100, 0)
+
+    @pytest.mark.asyncio
+    async def test_second_refresh_reports_only_the_diff(self, url, seed_estimates):
+        from app import estimates_refresh
+
+        rows = [("DE", str(10000 + i), "high") for i in range(100)]
+        bodies = [self._csv(rows), self._csv(rows[:98] + [("DE", "10098", "low"), ("DE", "10099", "low")])]
+
+        def handler(request):
+            return httpx.Response(200, content=bodies.pop(0))
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await estimates_refresh.refresh_estimates_once(client=client)
+            result = await estimates_refresh.refresh_estimates_once(client=client)
+
+        assert result.status == "refreshed"
+        assert (result.added, result.removed, result.changed) == (0, 0, 2)
+        assert result.new_count == 100
 
     @pytest.mark.asyncio
     async def test_unchanged_on_304(self, url, seed_estimates):
@@ -274,6 +351,42 @@ class TestRefreshOnce:
         assert estimates_refresh._stale is True
         assert len(seed_estimates) == 100
 
+    @pytest.mark.asyncio
+    async def test_unchanged_on_identical_hash_despite_parse_error(self, url, seed_estimates, monkeypatch):
+        from app import estimates_refresh
+
+        monkeypatch.setattr(estimates_refresh, "_CHUNK", 7)
+        body = b"WRONG,HEADER\n" + b"DE,99999\n" * 100
+        estimates_refresh._last_hash = hashlib.sha256(body).hexdigest()
+
+        def handler(request):
+            return httpx.Response(200, content=body)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            result = await estimates_refresh.refresh_estimates_once(client=client)
+
+        assert result.status == "unchanged"
+        assert estimates_refresh._stale is False
+        assert len(seed_estimates) == 100
+
+    @pytest.mark.asyncio
+    async def test_failed_when_body_is_too_large(self, url, seed_estimates, monkeypatch):
+        from app import estimates_refresh
+
+        monkeypatch.setattr(estimates_refresh.settings, "estimates_refresh_max_mb", 1)
+        big_csv = self._csv([("DE", str(100000 + i), "high") for i in range(40000)])
+
+        def handler(request):
+            return httpx.Response(200, content=big_csv)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            result = await estimates_refresh.refresh_estimates_once(client=client)
+
+        assert result.status == "failed"
+        assert result.reason.startswith("size: ")
+        assert estimates_refresh._stale is True
+        assert len(seed_estimates) == 100
+
     @pytest.mark.asyncio
     async def test_rejected_by_sanity_guard(self, url, seed_estimates):
         from app import estimates_refresh
@@ -294,12 +407,11 @@ class TestRefreshOnce:
         assert len(seed_estimates) == 100
 
     @pytest.mark.asyncio
-    async def test_bootstrap_path_accepts_any_size(self, url):
+    async def test_bootstrap_path_accepts_any_size(self, url, monkeypatch):
         """When current is empty (first-ever fetch), the sanity guard must not block."""
         from app import estimates_refresh
-        from app.data_loader import _estimates
 
-        _estimates.clear()
+        _live_estimates(monkeypatch, {})
         small_csv = self._csv([("DE", "99999", "high")])
 
         def handler(request):
@@ -411,7 +523,7 @@ class TestConcurrentRefresh:
         return u
 
     @pytest.fixture
-    def seed_estimates(self):
+    def seed_estimates(self, monkeypatch):
         from app.data_loader import _estimates
 
         _estimates.clear()
@@ -424,7 +536,7 @@ class TestConcurrentRefresh:
                 "nuts2_confidence": 0.95,
                 "nuts1_confidence": 0.98,
             }
-        yield _estimates
+        yield _live_estimates(monkeypatch, _estimates)
         _estimates.clear()
 
     @pytest.mark.asyncio
@@ -434,6 +546,8 @@ class TestConcurrentRefresh:
         entry/exit timestamps and assert the second call's entry is strictly
         after the first call's exit."""
         from app import estimates_refresh
+        from app.data_loader import parse_estimates_from_text
+        from app.estimates_refresh import FetchedCsv
 
         # Each fetch returns a unique CSV body so we can tell which one wins.
         def make_csv(tag: str) -> bytes:
@@ -456,7 +570,10 @@ class TestConcurrentRefresh:
             await asyncio.sleep(0)
             await asyncio.sleep(0)
             events.append((tag, "exit"))
-            return responses[tag], 200, {"etag": f'W/"{tag}"'}
+            body = responses[tag]
+            estimates, skipped = parse_estimates_from_text(body.decode("utf-8"))
+            fetched = FetchedCsv(estimates, skipped, hashlib.sha256(body).hexdigest(), len(body))
+            return fetched, 200, {"etag": f'W/"{tag}"'}
 
         original_fetch = estimates_refresh.fetch_remote_csv
         estimates_refresh.fetch_remote_csv = instrumented_fetch
@@ -497,11 +614,173 @@ class TestConcurrentRefresh:
         assert result.status == "disabled"
 
 
-def _stub_settings(*, url: str = "", interval: int = 86400):
-    """Build a minimal settings stub for tests that only need the two new fields."""
+class TestSharedRefresh:
+    """With several workers, one fetches and publishes; the others adopt."""
+
+    URL = "https://example.invalid/tercet.csv"
+
+    @pytest.fixture
+    def shared(self, tmp_path, monkeypatch):
+        from app import estimates_refresh
+
+        stub = _stub_settings(url=self.URL, workers=2, data_dir=str(tmp_path))
+        monkeypatch.setattr("app.estimates_refresh.settings", stub)
+        self._restart_settings = lambda: monkeypatch.setattr("app.estimates_refresh.settings", stub)
+        yield tmp_path
+        if estimates_refresh._leader_file is not None:
+            estimates_refresh._leader_file.close()
+
+    @pytest.fixture
+    def seed_estimates(self, monkeypatch):
+        return _live_estimates(monkeypatch, {})
+
+    @staticmethod
+    def _other_worker_leads(tmp_path):
+        """Hold the fetcher lock the way another worker process would."""
+        import fcntl
+
+        f = open(tmp_path / "estimates_refresh.lock", "a+b")
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+
+    def _restart(self):
+        """Drop this worker's leadership and state, as if it were a freshly started sibling."""
+        from app import estimates_refresh
+
+        estimates_refresh._leader_file.close()
+        importlib.reload(estimates_refresh)
+        self._restart_settings()
+
+    async def _fetch(self, body, etag="W/one"):
+        from app import estimates_refresh
+
+        def handler(request):
+            return httpx.Response(200, content=body, headers={"ETag": etag})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await estimates_refresh.refresh_estimates_once(client=client)
+
+    @pytest.mark.asyncio
+    async def test_follower_adopts_the_published_generation(self, shared, seed_estimates, monkeypatch):
+        from app import estimates_refresh
+
+        body = TestRefreshOnce._csv([("DE", str(20000 + i), "high") for i in range(5)])
+        assert (await self._fetch(body)).status == "refreshed"
+        state = json.loads((shared / "estimates_refresh.json").read_text())
+        assert state["hash"] == hashlib.sha256(body).hexdigest()
+        assert state["status"] == "refreshed"
+
+        self._restart()
+        lock = self._other_worker_leads(shared)
+        try:
+            _live_estimates(monkeypatch, {})
+            result = estimates_refresh._adopt()
+            assert (result.status, result.new_count) == ("refreshed", 5)
+            assert ("DE", "20000") in estimates_refresh.get_estimates_table()
+            assert estimates_refresh._last_etag == "W/one"
+            assert estimates_refresh._adopt().status == "unchanged"
+        finally:
+            lock.close()
+
+    @pytest.mark.asyncio
+    async def test_new_fetcher_continues_from_the_published_etag(self, shared, seed_estimates):
+        from app import estimates_refresh
+
+        await self._fetch(TestRefreshOnce._csv(), etag="W/first")
+        self._restart()
+
+        seen = {}
+
+        def handler(request):
+            seen["if-none-match"] = request.headers.get("if-none-match")
+            return httpx.Response(304)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            result = await estimates_refresh.refresh_estimates_once(client=client)
+        assert result.status == "unchanged"
+        assert seen["if-none-match"] == "W/first"
+
+    @pytest.mark.asyncio
+    async def test_follower_refresh_requests_a_fetch_and_reports_its_outcome(self, shared, seed_estimates):
+        from app import estimates_refresh
+
+        lock = self._other_worker_leads(shared)
+
+        async def leader():
+            request = shared / "estimates_refresh.request"
+            while not request.exists():
+                await asyncio.sleep(0.01)
+            state = {"hash": None, "stale": True, "status": "rejected", "reason": "sanity guard"}
+            (shared / "estimates_refresh.json").write_text(json.dumps({**state, "checked_at": time.time()}))
+
+        try:
+            result, _ = await asyncio.gather(estimates_refresh.refresh_estimates_once(), leader())
+        finally:
+            lock.close()
+        assert (result.status, result.reason) == ("rejected", "sanity guard")
+        assert estimates_refresh._stale is True
+
+    def test_fetch_is_due_after_the_interval_or_a_request(self, shared):
+        from app import estimates_refresh
+
+        assert estimates_refresh._fetch_due(60)
+        (shared / "estimates_refresh.json").write_text(json.dumps({"checked_at": time.time()}))
+        assert not estimates_refresh._fetch_due(60)
+        # Without periodic fetches only a request makes one due
+        assert not estimates_refresh._fetch_due(0)
+        (shared / "estimates_refresh.request").write_text(str(time.time() + 1))
+        assert estimates_refresh._fetch_due(60)
+        assert estimates_refresh._fetch_due(0)
+
+    @pytest.mark.asyncio
+    async def test_fetcher_answers_requests_without_a_refresh_interval(self, shared, monkeypatch):
+        from app import estimates_refresh
+
+        estimates_refresh.settings.estimates_refresh_interval_seconds = 0
+        estimates_refresh.settings.estimates_follow_seconds = 0.05
+        (shared / "estimates_refresh.json").write_text(json.dumps({"checked_at": time.time()}))
+        fetches = []
+
+        async def fetch(client=None):
+            fetches.append(time.time())
+            (shared / "estimates_refresh.json").write_text(json.dumps({"checked_at": time.time()}))
+            return estimates_refresh.RefreshResult(status="unchanged", previous_count=0, new_count=0)
+
+        monkeypatch.setattr(estimates_refresh, "refresh_estimates_once", fetch)
+        loop = asyncio.create_task(estimates_refresh.refresh_estimates_loop())
+        try:
+            await asyncio.sleep(0.3)
+            assert fetches == []  # no periodic fetches
+            (shared / "estimates_refresh.request").write_text(str(time.time()))
+            for _ in range(100):
+                if fetches:
+                    break
+                await asyncio.sleep(0.02)
+            assert len(fetches) == 1
+            assert not loop.done()
+        finally:
+            loop.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await loop
+
+
+def _live_estimates(monkeypatch, estimates: dict) -> dict:
+    """Make `estimates` the live generation's table for the duration of the test."""
+    from app import data_loader
+
+    monkeypatch.setattr(data_loader, "_gen", data_loader._gen._replace(estimates=estimates))
+    return estimates
+
+
+def _stub_settings(*, url: str = "", interval: int = 86400, workers: int = 1, data_dir: str = "./data"):
+    """Build a minimal settings stub with just the fields the refresh reads."""
 
     class _S:
         estimates_refresh_url = url
         estimates_refresh_interval_seconds = interval
+        estimates_follow_seconds = 1
+        estimates_refresh_max_mb = 64
 
+    _S.workers = workers
+    _S.data_dir = data_dir
     return _S()
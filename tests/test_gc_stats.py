@@ -0,0 +1,49 @@
+"""Tests for app.gc_stats — GC pause histogram and heap freezing."""
+
+import gc
+
+from app import gc_stats
+from app.gc_stats import PAUSE_BUCKETS, _PauseHistogram
+
+
+class TestPauseHistogram:
+    def test_observe_fills_buckets_by_upper_bound(self):
+        hist = _PauseHistogram()
+        for seconds in (0.0001, 0.0005, 0.003, 2.0):
+            hist.observe(seconds)
+        assert hist.count == 4
+        assert hist.max == 2.0
+        assert round(hist.total, 4) == 2.0036
+        stats = hist.as_dict()
+        assert stats["buckets"]["0.0005"] == 2  # bounds are inclusive
+        assert stats["buckets"]["0.005"] == 1
+        assert stats["buckets"]["+Inf"] == 1
+        assert len(stats["buckets"]) == len(PAUSE_BUCKETS) + 1
+
+
+class TestInstall:
+    def test_collections_are_timed_per_generation(self):
+        gc_stats.install()
+        gc_stats.install()  # idempotent
+        try:
+            assert gc.callbacks.count(gc_stats._on_gc) == 1
+            before = gc_stats.get_pause_stats()["generations"]["2"]["count"]
+            gc.collect()
+            after = gc_stats.get_pause_stats()["generations"]["2"]
+            assert after["count"] == before + 1
+            assert after["max_s"] > 0
+        finally:
+            gc_stats.uninstall()
+        assert gc_stats._on_gc not in gc.callbacks
+
+
+class TestFreezeHeap:
+    def test_live_objects_leave_gc_tracking(self):
+        survivor = [[]]
+        try:
+            frozen = gc_stats.freeze_heap()
+            assert frozen == gc.get_freeze_count() > 0
+            assert gc_stats.get_pause_stats()["frozen_objects"] == frozen
+            assert not any(o is survivor for o in gc.get_objects())
+        finally:
+            gc.unfreeze()
@@ -0,0 +1,77 @@
+"""Tests for app.lookup_cache — LRU of lookup() results."""
+
+from unittest.mock import patch
+
+from app.lookup_cache import MISSING, LookupCache
+
+OWNER = object()
+
+
+def _cache(maxsize: int = 3, ttl: float = 0) -> LookupCache:
+    cache = LookupCache(maxsize, ttl)
+    cache.bind(OWNER)
+    return cache
+
+
+class TestLookupCache:
+    def test_get_put_and_counters(self):
+        cache = _cache()
+        assert cache.get(OWNER, ("DE", "10115")) is MISSING
+        cache.put(OWNER, ("DE", "10115"), {"nuts3": "DE300"})
+        cache.put(OWNER, ("DE", "99999"), None)
+        assert cache.get(OWNER, ("DE", "10115")) == {"nuts3": "DE300"}
+        assert cache.get(OWNER, ("DE", "99999")) is None
+        assert cache.stats() == {
+            "size": 2,
+            "max_size": 3,
+            "hits": 2,
+            "misses": 1,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def test_evicts_least_recently_used(self):
+        cache = _cache(maxsize=2)
+        cache.put(OWNER, ("DE", "1"), None)
+        cache.put(OWNER, ("DE", "2"), None)
+        cache.get(OWNER, ("DE", "1"))
+        cache.put(OWNER, ("DE", "3"), None)
+        assert cache.get(OWNER, ("DE", "2")) is MISSING
+        assert cache.get(OWNER, ("DE", "1")) is None
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire_after_ttl(self):
+        cache = _cache(ttl=10)
+        with patch("app.lookup_cache.time.monotonic", return_value=100.0):
+            cache.put(OWNER, ("DE", "1"), None)
+        with patch("app.lookup_cache.time.monotonic", return_value=109.0):
+            assert cache.get(OWNER, ("DE", "1")) is None
+        with patch("app.lookup_cache.time.monotonic", return_value=110.0):
+            assert cache.get(OWNER, ("DE", "1")) is MISSING
+        assert cache.stats()["size"] == 0
+
+    def test_bind_drops_entries_and_other_owners(self):
+        cache = _cache()
+        cache.put(OWNER, ("DE", "1"), None)
+        new_owner = object()
+        cache.bind(new_owner)
+        assert cache.get(new_owner, ("DE", "1")) is MISSING
+        cache.put(OWNER, ("DE", "1"), None)  # late result for the old owner
+        assert cache.stats()["size"] == 0
+        assert cache.stats()["invalidations"] == 1
+
+    def test_rebind_keeps_entries_that_are_not_stale(self):
+        cache = _cache()
+        cache.put(OWNER, ("DE", "1"), "keep")
+        cache.put(OWNER, ("DE", "2"), "drop")
+        new_owner = object()
+        assert cache.rebind(new_owner, lambda value: value == "drop") == 1
+        assert cache.get(new_owner, ("DE", "1")) == "keep"
+        assert cache.get(new_owner, ("DE", "2")) is MISSING
+        assert cache.get(OWNER, ("DE", "1")) is MISSING
+
+    def test_size_zero_disables(self):
+        cache = _cache(maxsize=0)
+        cache.put(OWNER, ("DE", "1"), None)
+        assert cache.get(OWNER, ("DE", "1")) is MISSING
+        assert cache.stats()["misses"] == 0
@@ -0,0 +1,196 @@
+"""Tests for app.lookup_store — packed per-country lookup table."""
+
+import pytest
+
+from app.lookup_store import LookupStore, _CountryTable
+
+
+def _store(entries: dict[tuple[str, str], str], *, compact: bool = True) -> LookupStore:
+    store = LookupStore()
+    store.update(entries)
+    if compact:
+        store.compact()
+    return store
+
+
+SAMPLE = {
+    ("DE", "10115"): "DE300",
+    ("DE", "10117"): "DE300",
+    ("DE", "60311"): "DE712",
+    ("AT", "1010"): "AT130",
+    ("NL", "1012AB"): "NL329",
+    ("NL", "9"): "NL111",
+}
+
+
+class TestCountryTable:
+    def test_build_sorts_keys_and_dedupes_codes(self):
+        table = _CountryTable.build({"60311": "DE712", "10115": "DE300", "10117": "DE300"})
+        assert table.codes == ("DE300", "DE712")
+        assert [pc for pc, _ in table.items()] == ["10115", "10117", "60311"]
+        assert len(table) == 3
+        assert table.nbytes() == 3 * 5 + 3 * table.ids.itemsize
+
+    def test_find_with_mixed_key_lengths(self):
+        table = _CountryTable.build({"9": "NL111", "1012AB": "NL329", "1012": "NL329"})
+        assert table.get("9") == "NL111"
+        assert table.get("1012") == "NL329"
+        assert table.get("1012AB") == "NL329"
+        assert table.get("101") is None
+        assert table.get("1012ABC") is None  # longer than the table width
+
+    def test_non_ascii_input_is_a_miss(self):
+        table = _CountryTable.build({"10115": "DE300"})
+        assert table.get("1011é") is None
+
+    def test_find_across_fence_blocks(self):
+        """Every key is found and every gap misses, whichever fence block it falls in."""
+        entries = {f"{i:05d}": "DE300" for i in range(10, 3000, 3)}
+        table = _CountryTable.build(entries)
+        assert [table.find(pc) for pc in entries] == list(range(len(entries)))
+        for i in (0, 11, 12, 1001, 2999, 99999):
+            assert table.find(f"{i:05d}") == -1
+
+
+class TestLookupStore:
+    @pytest.mark.parametrize("compact", [True, False])
+    def test_mapping_behaves_like_dict(self, compact):
+        store = _store(SAMPLE, compact=compact)
+        assert len(store) == len(SAMPLE)
+        assert dict(store.items()) == SAMPLE
+        assert set(store) == set(SAMPLE)
+        assert store[("DE", "10115")] == "DE300"
+        assert store.get(("DE", "99999")) is None
+        assert store.get(("ZZ", "1"), "x") == "x"
+        assert ("AT", "1010") in store
+        assert ("AT", "9999") not in store
+        with pytest.raises(KeyError):
+            store[("AT", "9999")]
+
+    def test_staged_write_overrides_packed_value(self):
+        store = _store(SAMPLE)
+        store[("DE", "10115")] = "DE111"
+        assert store[("DE", "10115")] == "DE111"
+        assert len(store) == len(SAMPLE)
+        store.compact()
+        assert store[("DE", "10115")] == "DE111"
+        assert len(store) == len(SAMPLE)
+
+    def test_compact_merges_into_existing_country(self):
+        store = _store(SAMPLE)
+        store[("DE", "20095")] = "DE600"
+        store.compact()
+        assert store.countries() == {"DE": 4, "AT": 1, "NL": 2}
+        assert store[("DE", "20095")] == "DE600"
+        assert store[("DE", "60311")] == "DE712"
+
+    def test_add_is_first_write_wins(self):
+        store = _store(SAMPLE)
+        assert store.add(("DE", "10115"), "DE111") is False
+        assert store.add(("DE", "20095"), "DE600") is True
+        assert store.add(("DE", "20095"), "DE999") is False
+        assert store[("DE", "10115")] == "DE300"
+        assert store[("DE", "20095")] == "DE600"
+        assert len(store) == len(SAMPLE) + 1
+
+    def test_compact_merges_wider_keys_into_packed_table(self):
+        store = _store(SAMPLE)
+        store.add(("DE", "1011"), "DE111")
+        store.add(("DE", "101150"), "DE300")
+        store.compact()
+        table = store.tables()["DE"]
+        assert table.width == 6
+        assert [pc for pc, _ in table.items()] == ["1011", "10115", "101150", "10117", "60311"]
+        assert store[("DE", "1011")] == "DE111"
+        assert store[("DE", "60311")] == "DE712"
+
+    def test_merge_keeps_existing_ids(self):
+        table = _CountryTable.build({"10115": "DE300", "60311": "DE712"})
+        merged = table.merged({"20095": "DE600", "10117": "DE300"})
+        assert merged.codes == ("DE300", "DE712", "DE600")
+        assert dict(merged.items()) == {
+            "10115": "DE300",
+            "10117": "DE300",
+            "20095": "DE600",
+            "60311": "DE712",
+        }
+
+    def test_delete_packed_and_staged(self):
+        store = _store(SAMPLE)
+        store[("SE", "11122")] = "SE110"
+        del store[("SE", "11122")]
+        del store[("AT", "1010")]
+        assert ("AT", "1010") not in store
+        assert "AT" not in store.countries()
+        assert len(store) == len(SAMPLE) - 1
+        with pytest.raises(KeyError):
+            del store[("AT", "1010")]
+
+    def test_nuts3_codes_include_staged_writes(self):
+        store = _store(SAMPLE)
+        store[("SE", "11122")] = "SE110"
+        assert store.nuts3_codes() == {"DE300", "DE712", "AT130", "NL329", "NL111", "SE110"}
+
+    def test_copy_is_independent(self):
+        store = _store(SAMPLE)
+        other = store.copy()
+        other[("DE", "20095")] = "DE600"
+        other.clear()
+        assert len(store) == len(SAMPLE)
+        assert len(other) == 0
+
+    def test_packed_size_is_a_few_bytes_per_row(self):
+        entries = {("DE", f"{i:05d}"): f"DE{i % 400:03d}" for i in range(10_000)}
+        store = _store(entries)
+        assert store.nbytes() <= 10_000 * (5 + 2 + 4)
+
+    def test_ordered_items_replay_insertion_order(self):
+        store = _store({("DE", "60311"): "DE712", ("DE", "10117"): "DE300"})
+        store[("DE", "20095")] = "DE600"  # merged into the packed table
+        store[("DE", "60311")] = "DE713"  # overwrite keeps its position
+        store.compact()
+        store[("DE", "10115")] = "DE300"  # still staged
+        assert list(store.ordered_items()) == [
+            (("DE", "60311"), "DE713"),
+            (("DE", "10117"), "DE300"),
+            (("DE", "20095"), "DE600"),
+            (("DE", "10115"), "DE300"),
+        ]
+
+    def test_delete_keeps_insertion_order(self):
+        store = _store({("DE", "3"): "DE300", ("DE", "2"): "DE300", ("DE", "1"): "DE300"})
+        del store[("DE", "2")]
+        assert [pc for (_, pc), _ in store.ordered_items()] == ["3", "1"]
+
+
+class TestLoadSorted:
+    def test_builds_tables_from_sorted_rows(self):
+        rows = sorted((cc, pc, nuts3) for (cc, pc), nuts3 in SAMPLE.items())
+        store = LookupStore()
+        count = store.load_sorted(rows, {"AT": 4, "DE": 5, "NL": 6})
+        assert count == len(SAMPLE) == len(store)
+        assert dict(store.items()) == SAMPLE
+
+    def test_ordered_rows_carry_insertion_order(self):
+        rows = [("DE", "1", "DE300", 7), ("DE", "2", "DE712", 3)]
+        store = LookupStore()
+        store.load_sorted(rows, {"DE": 1}, ordered=True)
+        assert [pc for (_, pc), _ in store.ordered_items()] == ["2", "1"]
+        store[("DE", "0")] = "DE300"
+        store.compact()
+        assert [pc for (_, pc), _ in store.ordered_items()] == ["2", "1", "0"]
+
+    def test_replaces_existing_contents(self):
+        store = _store(SAMPLE)
+        store[("SE", "11122")] = "SE110"
+        store.load_sorted([("AT", "1010", "AT130")], {"AT": 4})
+        assert dict(store.items()) == {("AT", "1010"): "AT130"}
+
+    def test_rejects_unsorted_rows(self):
+        with pytest.raises(ValueError, match="out of order"):
+            LookupStore().load_sorted([("DE", "2", "DE300"), ("DE", "1", "DE300")], {"DE": 1})
+
+    def test_rejects_non_contiguous_country(self):
+        rows = [("AT", "1", "AT130"), ("DE", "1", "DE300"), ("AT", "2", "AT130")]
+        with pytest.raises(ValueError, match="contiguous"):
+            LookupStore().load_sorted(rows, {"AT": 1, "DE": 1})
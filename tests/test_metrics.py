@@ -0,0 +1,175 @@
+"""Tests for app.metrics — registry, Prometheus rendering and cross-worker aggregation."""
+
+import json
+import os
+import time
+
+import pytest
+
+from app import metrics
+from app.data_loader import lookup
+
+
+def _value(families, name, *labels):
+    for sample in families[name]["samples"]:
+        if tuple(sample[0]) == labels:
+            return sample[1]
+    return 0
+
+
+def _counter(name, labels, samples):
+    return {name: {"type": "counter", "help": "h", "labels": labels, "samples": samples}}
+
+
+def _histogram(samples):
+    return {
+        "h_seconds": {
+            "type": "histogram",
+            "help": "h",
+            "labels": ["stage"],
+            "buckets": [0.1, 1.0],
+            "samples": samples,
+        }
+    }
+
+
+class TestRender:
+    def test_counter_lines_with_escaped_labels(self):
+        text = metrics.render(_counter("c_total", ["path"], [[['a"b\\'], 3], [["/x"], 1.5]]))
+        assert text.splitlines() == [
+            "# HELP c_total h",
+            "# TYPE c_total counter",
+            'c_total{path="/x"} 1.5',
+            'c_total{path="a\\"b\\\\"} 3',
+        ]
+
+    def test_histogram_buckets_are_cumulative(self):
+        text = metrics.render(_histogram([[["extract"], [2, 1, 1], 1.75, 4]]))
+        assert text.splitlines()[2:] == [
+            'h_seconds_bucket{stage="extract",le="0.1"} 2',
+            'h_seconds_bucket{stage="extract",le="1.0"} 3',
+            'h_seconds_bucket{stage="extract",le="+Inf"} 4',
+            'h_seconds_sum{stage="extract"} 1.75',
+            'h_seconds_count{stage="extract"} 4',
+        ]
+
+    def test_unlabelled_counter(self):
+        assert metrics.render(_counter("c_total", [], [[[], 7]])).endswith("c_total 7\n")
+
+
+class TestMerge:
+    def test_sums_matching_samples_and_keeps_the_rest(self):
+        merged = metrics.merge(
+            [
+                {
+                    **_counter("c_total", ["tier"], [[["exact"], 2]]),
+                    **_histogram([[["x"], [1, 0, 0], 0.05, 1]]),
+                },
+                {
+                    **_counter("c_total", ["tier"], [[["exact"], 3], [["prefix"], 1]]),
+                    **_histogram([[["x"], [0, 2, 1], 3.0, 3]]),
+                },
+            ]
+        )
+        assert _value(merged, "c_total", "exact") == 5
+        assert _value(merged, "c_total", "prefix") == 1
+        assert merged["h_seconds"]["samples"] == [[["x"], [1, 2, 1], 3.05, 4]]
+
+    def test_inputs_are_not_modified(self):
+        first = _counter("c_total", ["tier"], [[["exact"], 2]])
+        metrics.merge([first, _counter("c_total", ["tier"], [[["exact"], 3]])])
+        assert first["c_total"]["samples"] == [[["exact"], 2]]
+
+    def test_mismatched_buckets_are_skipped(self):
+        other = _histogram([[["x"], [5, 5, 5, 5], 1.0, 20]])
+        other["h_seconds"]["buckets"] = [0.1, 0.5, 1.0]
+        merged = metrics.merge([_histogram([[["x"], [1, 0, 0], 0.05, 1]]), other])
+        assert merged["h_seconds"]["samples"] == [[["x"], [1, 0, 0], 0.05, 1]]
+
+
+class TestWorkerAggregation:
+    @pytest.fixture
+    def workers(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(metrics.settings, "data_dir", str(tmp_path))
+        monkeypatch.setattr(metrics.settings, "workers", 2)
+        directory = tmp_path / "metrics"
+        directory.mkdir()
+        return directory
+
+    def test_sums_live_workers_and_retires_stale_ones(self, workers):
+        own = _value(metrics.snapshot(), "pc2nuts_rate_limited_total", "/lookup")
+        (workers / "101.json").write_text(
+            json.dumps(_counter("pc2nuts_rate_limited_total", ["path"], [[["/lookup"], 4]]))
+        )
+        stale = workers / "102.json"
+        stale.write_text(json.dumps(_counter("pc2nuts_rate_limited_total", ["path"], [[["/lookup"], 100]])))
+        old = time.time() - 3600
+        os.utime(stale, (old, old))
+        (workers / "103.json").write_text("{not json")
+
+        families = metrics.collect()
+        assert _value(families, "pc2nuts_rate_limited_total", "/lookup") == own + 4 + 100
+        assert not stale.exists()
+        retired = json.loads((workers / "retired.json").read_text())
+        assert _value(retired, "pc2nuts_rate_limited_total", "/lookup") == 100
+
+    def test_own_file_is_not_counted_twice(self, workers):
+        metrics.RATE_LIMITED.inc("/own")
+        metrics.write_worker_snapshot()
+        assert (workers / f"{os.getpid()}.json").exists()
+        own = _value(metrics.snapshot(), "pc2nuts_rate_limited_total", "/own")
+        assert _value(metrics.collect(), "pc2nuts_rate_limited_total", "/own") == own
+
+    def test_totals_never_go_down_across_workers_and_exits(self, workers, monkeypatch):
+        def scrape(pid):
+            with monkeypatch.context() as m:
+                m.setattr(metrics.os, "getpid", lambda: pid)
+                return _value(metrics.collect(), "pc2nuts_rate_limited_total", "/monotonic")
+
+        metrics.RATE_LIMITED.inc("/monotonic", amount=5)
+        first = scrape(101)
+        metrics.RATE_LIMITED.inc("/monotonic")
+        second = scrape(102)
+        # Worker 101 exits; its flushed totals must stay in the sum
+        old = time.time() - 3600
+        os.utime(workers / "101.json", (old, old))
+        third = scrape(102)
+        fourth = scrape(102)
+
+        assert first <= second <= third <= fourth
+        assert (first, second, third, fourth) == (5, 11, 11, 11)
+
+    def test_single_worker_ignores_the_directory(self, workers, monkeypatch):
+        monkeypatch.setattr(metrics.settings, "workers", 1)
+        (workers / "101.json").write_text(
+            json.dumps(_counter("pc2nuts_rate_limited_total", ["path"], [[["/x"], 4]]))
+        )
+        assert _value(metrics.collect(), "pc2nuts_rate_limited_total", "/x") == 0
+
+
+class TestLookupInstrumentation:
+    @pytest.mark.parametrize(
+        "country, postal_code, tier",
+        [
+            ("DE", "10115", "exact"),
+            ("FR", "97105", "estimated"),
+            ("DE", "10999", "prefix"),
+            ("YY", "9999", "country_fallback"),
+            ("XX", "9999", "single_nuts3"),
+            ("ZZ", "1", "none"),
+        ],
+    )
+    def test_each_tier_is_counted(self, mock_data, country, postal_code, tier):
+        before = metrics.LOOKUPS.labels(tier).value
+        lookup(country, postal_code)
+        lookup(country, postal_code)  # the cached repeat keeps its tier
+        assert metrics.LOOKUPS.labels(tier).value == before + 2
+
+    def test_stages_are_timed_on_uncached_lookups(self, mock_data):
+        counts = {
+            stage: metrics.LOOKUP_STAGE_SECONDS.labels(stage).count for stage in ("extract", "waterfall")
+        }
+        lookup("AT", "1010")
+        lookup("AT", "1010")
+        for stage, before in counts.items():
+            assert metrics.LOOKUP_STAGE_SECONDS.labels(stage).count == before + 1
@@ -0,0 +1,47 @@
+"""Tests for app.response_cache — pre-encoded /lookup response bodies."""
+
+import json
+
+import pytest
+
+from app import data_loader, response_cache
+from app.models import NUTSResult
+
+
+def _result(**overrides) -> dict:
+    result = dict(data_loader._nuts3_record("DE300", {"DE3": "Berlin", "DE30": "Berlin"}).exact)
+    result.update(overrides)
+    return result
+
+
+class TestEncodeLookup:
+    @pytest.mark.parametrize(
+        "postal_code, result",
+        [
+            ("10115", _result()),
+            (" 10-115 ", _result(match_type="approximate", nuts3_confidence=0.4)),
+            ('10115"\\\x01\t ', _result()),
+            ("1010", _result(nuts1_name="Ostösterreich", nuts3_name=None)),
+            ("\U0001f600", _result(match_type="estimated", nuts1_confidence=1, nuts2_confidence=0.95)),
+        ],
+    )
+    def test_matches_pydantic_serialization(self, mock_data, postal_code, result):
+        expected = NUTSResult(postal_code=postal_code, country_code="DE", **result).model_dump_json()
+        assert response_cache.encode_lookup(postal_code, "DE", result) == expected.encode()
+
+    def test_tail_is_shared_across_postal_codes(self, mock_data):
+        result = _result()
+        first = response_cache.encode_lookup("10115", "DE", result)
+        second = response_cache.encode_lookup("10117", "DE", dict(result))
+        assert json.loads(second)["postal_code"] == "10117"
+        assert first[first.index(b',"match_type"') :] == second[second.index(b',"match_type"') :]
+        assert len(response_cache._templates) == 1
+
+    def test_templates_dropped_on_new_generation(self, mock_data):
+        response_cache.encode_lookup("10115", "DE", _result())
+        assert response_cache._templates
+        data_loader._publish()
+        response_cache.encode_lookup("10115", "DE", _result(nuts3_name="Berlin-Mitte"))
+        assert list(response_cache._templates.values()) == [
+            response_cache._encode_tail(_result(nuts3_name="Berlin-Mitte"))
+        ]
@@ -0,0 +1,249 @@
+"""Tests for app.snapshot — shared read-only lookup snapshot (mmap)."""
+
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app import data_loader, snapshot
+from app.lookup_store import LookupStore, _PrefixTable
+from tests.conftest import MOCK_LOOKUP
+
+
+def _packed(entries) -> LookupStore:
+    store = LookupStore()
+    store.update(entries)
+    store.compact()
+    return store
+
+
+def _meta(**overrides) -> dict:
+    meta = {
+        "nuts_version": data_loader.settings.nuts_version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "written_at": time.time(),
+        "stale": False,
+        "entry_count": len(MOCK_LOOKUP),
+        "extra_sources_hash": "",
+        "settings_hash": data_loader._derived_settings_hash(),
+        "estimates_source": data_loader._estimates_source(),
+    }
+    meta.update(overrides)
+    return meta
+
+
+class TestSnapshotFile:
+    def test_roundtrip_is_memory_mapped(self, tmp_path):
+        path = tmp_path / "lookup.snapshot"
+        snapshot.write_snapshot(path, _packed(MOCK_LOOKUP).tables(), _meta())
+
+        tables, meta, payload, prefixes = snapshot.open_snapshot(path)
+        store = LookupStore()
+        store.replace_tables(tables)
+
+        assert dict(store.items()) == MOCK_LOOKUP
+        assert store.get(("DE", "10115")) == "DE300"
+        assert store.get(("DE", "99999")) is None
+        assert meta["entry_count"] == len(MOCK_LOOKUP)
+        assert isinstance(tables["DE"].keys, snapshot.mmap.mmap)
+        assert payload is None
+        assert prefixes == {}
+
+    def test_payload_roundtrip(self, tmp_path):
+        path = tmp_path / "lookup.snapshot"
+        payload = {
+            "prefix_index": {"DE": {"1": (2, "DE3", 2, "DE30", 2, "DE300", 2)}},
+            "names": {"DE3": "Berlin"},
+        }
+        snapshot.write_snapshot(path, _packed(MOCK_LOOKUP).tables(), _meta(), payload)
+        assert snapshot.open_snapshot(path).payload == payload
+
+    def test_prefix_tables_are_mapped_not_decoded(self, tmp_path):
+        path = tmp_path / "lookup.snapshot"
+        votes = {"1": 2 | 2 << 32 | 1 << 128, "10": 1 | 1 << 96 | 0xFFFF << 160, "2": 0xFFFFFFFF}
+        prefixes = {"DE": _PrefixTable.build(votes), "AT": _PrefixTable.build({})}
+        snapshot.write_snapshot(path, _packed(MOCK_LOOKUP).tables(), _meta(), None, prefixes)
+
+        mapped = snapshot.open_snapshot(path).prefixes
+        assert mapped == {"DE": votes, "AT": {}}
+        assert isinstance(mapped["DE"].index.keys, snapshot.mmap.mmap)
+        assert mapped["DE"]["10"] == votes["10"]
+        assert "3" not in mapped["DE"]
+
+        # A mapped prefix table can itself be written out again
+        again = tmp_path / "again.snapshot"
+        snapshot.write_snapshot(again, _packed(MOCK_LOOKUP).tables(), _meta(), None, mapped)
+        assert snapshot.open_snapshot(again).prefixes == {"DE": votes, "AT": {}}
+
+    def test_unmarshallable_payload_writes_nothing(self, tmp_path):
+        path = tmp_path / "lookup.snapshot"
+        with pytest.raises(ValueError):
+            snapshot.write_snapshot(path, _packed(MOCK_LOOKUP).tables(), _meta(), {"votes": object()})
+        assert list(tmp_path.iterdir()) == []
+
+    def test_rewrite_from_mapped_tables(self, tmp_path):
+        """A mapped table can itself be written out (e.g. on the next rebuild)."""
+        first, second = tmp_path / "a.snapshot", tmp_path / "b.snapshot"
+        meta = _meta()
+        snapshot.write_snapshot(first, _packed(MOCK_LOOKUP).tables(), meta)
+        tables = snapshot.open_snapshot(first).tables
+        snapshot.write_snapshot(second, tables, meta)
+        assert first.read_bytes() == second.read_bytes()
+
+    def test_rejects_foreign_file(self, tmp_path):
+        path = tmp_path / "lookup.snapshot"
+        path.write_bytes(b"SQLite format 3\0" + b"\0" * 64)
+        with pytest.raises(snapshot.SnapshotError, match="not a snapshot"):
+            snapshot.read_meta(path)
+
+    def test_rejects_other_format_version(self, tmp_path):
+        path = tmp_path / "lookup.snapshot"
+        path.write_bytes(snapshot._HEADER.pack(snapshot.MAGIC, snapshot.FORMAT_VERSION + 1, 0))
+        with pytest.raises(snapshot.SnapshotError, match="format version"):
+            snapshot.open_snapshot(path)
+
+    def test_rejects_other_python(self, tmp_path, monkeypatch):
+        path = tmp_path / "lookup.snapshot"
+        monkeypatch.setattr(snapshot, "_PYTHON", "2.7")
+        snapshot.write_snapshot(path, _packed(MOCK_LOOKUP).tables(), _meta())
+        monkeypatch.undo()
+        with pytest.raises(snapshot.SnapshotError, match="Python 2.7"):
+            snapshot.read_meta(path)
+
+    def test_rejects_truncated_file(self, tmp_path):
+        path = tmp_path / "lookup.snapshot"
+        snapshot.write_snapshot(path, _packed(MOCK_LOOKUP).tables(), _meta())
+        path.write_bytes(path.read_bytes()[:-16])
+        with pytest.raises(snapshot.SnapshotError, match="past the end"):
+            snapshot.open_snapshot(path)
+
+
+class TestSnapshotValidity:
+    def test_fresh_snapshot_is_valid(self):
+        assert data_loader._snapshot_is_valid(_meta(written_at=0), built_since=time.time())
+
+    def test_version_mismatch(self):
+        assert not data_loader._snapshot_is_valid(_meta(nuts_version="1999"), built_since=0)
+
+    def test_extra_sources_change(self):
+        assert not data_loader._snapshot_is_valid(_meta(extra_sources_hash="abc"), built_since=0)
+
+    def test_settings_change(self):
+        assert not data_loader._snapshot_is_valid(_meta(settings_hash="abc"), built_since=0)
+
+    def test_estimates_csv_change(self, tmp_path, monkeypatch):
+        meta = _meta()
+        csv_path = tmp_path / "estimates.csv"
+        csv_path.write_text("COUNTRY_CODE,POSTAL_CODE\n")
+        monkeypatch.setattr(data_loader.settings, "estimates_csv", str(csv_path))
+        assert not data_loader._snapshot_is_valid(meta, built_since=0)
+        assert data_loader._snapshot_is_valid(_meta(), built_since=0)
+
+    def test_expired(self):
+        old = (datetime.now(timezone.utc) - timedelta(days=365)).isoformat()
+        assert not data_loader._snapshot_is_valid(
+            _meta(created_at=old, written_at=0), built_since=time.time()
+        )
+
+    def test_expired_but_just_built_by_sibling(self):
+        old = (datetime.now(timezone.utc) - timedelta(days=365)).isoformat()
+        started = time.time() - 5
+        assert data_loader._snapshot_is_valid(_meta(created_at=old, stale=True), built_since=started)
+
+    def test_partial_load_rejected_when_refetching(self):
+        assert data_loader._snapshot_is_valid(_meta(written_at=0, stale=True), built_since=time.time())
+        assert not data_loader._snapshot_is_valid(
+            _meta(written_at=0, stale=True), built_since=time.time(), refetch=True
+        )
+        # A sibling's refetch that also timed out is still the result we'd get ourselves
+        started = time.time() - 5
+        assert data_loader._snapshot_is_valid(_meta(stale=True), built_since=started, refetch=True)
+
+
+class TestLoadDataWithSnapshot:
+    @pytest.fixture
+    def data_dir(self, mock_data, tmp_path, monkeypatch):
+        """A data dir holding a valid SQLite cache of the mock data."""
+        monkeypatch.setattr(data_loader.settings, "data_dir", str(tmp_path))
+        monkeypatch.setattr(data_loader.settings, "estimates_csv", str(tmp_path / "missing.csv"))
+        data_loader._save_to_db(data_loader._db_path())
+        return tmp_path
+
+    def test_first_load_writes_snapshot_and_maps_it(self, data_dir):
+        data_loader.load_data()
+
+        assert data_loader._snapshot_path().is_file()
+        assert isinstance(data_loader._lookup.tables()["DE"].keys, snapshot.mmap.mmap)
+        assert isinstance(data_loader._prefix_index["DE"].index.keys, snapshot.mmap.mmap)
+        assert dict(data_loader._lookup.items()) == MOCK_LOOKUP
+        assert data_loader.lookup("DE", "10115")["nuts3"] == "DE300"
+        assert "DE" in data_loader.get_loaded_countries()
+
+    def test_second_load_restores_everything_without_sqlite_or_reindexing(self, data_dir):
+        data_loader.load_data()
+        built = {
+            "prefix_index": {cc: dict(idx) for cc, idx in data_loader._prefix_index.items()},
+            "nuts_codes": data_loader._nuts_codes,
+            "single_nuts3": dict(data_loader._single_nuts3),
+            "country_fallback": dict(data_loader._country_fallback),
+            "estimates": dict(data_loader._estimates),
+            "nuts_names": dict(data_loader._nuts_names),
+            "countries": data_loader._countries,
+            "results": [
+                data_loader.lookup(cc, pc) for cc, pc in [("DE", "10999"), ("FR", "97105"), ("YY", "9999")]
+            ],
+        }
+
+        def forbidden(*args, **kwargs):
+            raise AssertionError("warm start went past the snapshot")
+
+        with (
+            patch.object(data_loader, "_db_connection", forbidden),
+            patch.object(data_loader, "_build_prefix_index", forbidden),
+        ):
+            data_loader.load_data()
+
+        assert dict(data_loader._lookup.items()) == MOCK_LOOKUP
+        assert {
+            "prefix_index": data_loader._prefix_index,
+            "nuts_codes": data_loader._nuts_codes,
+            "single_nuts3": data_loader._single_nuts3,
+            "country_fallback": data_loader._country_fallback,
+            "estimates": data_loader._estimates,
+            "nuts_names": data_loader._nuts_names,
+            "countries": data_loader._countries,
+            "results": [
+                data_loader.lookup(cc, pc) for cc, pc in [("DE", "10999"), ("FR", "97105"), ("YY", "9999")]
+            ],
+        } == built
+        assert built["results"][0]["match_type"] == "approximate"
+        assert data_loader.get_nuts_names()["DE300"] == "Berlin"
+
+    def test_new_estimates_csv_triggers_rebuild(self, data_dir, monkeypatch):
+        data_loader.load_data()
+        csv_path = data_dir / "estimates.csv"
+        csv_path.write_text(
+            "COUNTRY_CODE,POSTAL_CODE,ESTIMATED_NUTS3,ESTIMATED_NUTS2,ESTIMATED_NUTS1,CONFIDENCE\n"
+            "PT,1000-001,PT170,PT17,PT1,high\n"
+        )
+        monkeypatch.setattr(data_loader.settings, "estimates_csv", str(csv_path))
+        data_loader.load_data()
+        assert ("PT", "1000001") in data_loader._estimates
+        assert (
+            snapshot.read_meta(data_loader._snapshot_path())["estimates_source"]
+            == data_loader._estimates_source()
+        )
+
+    def test_corrupt_snapshot_is_rebuilt(self, data_dir):
+        data_loader.load_data()
+        data_loader._snapshot_path().write_bytes(b"garbage")
+        data_loader.load_data()
+        assert dict(data_loader._lookup.items()) == MOCK_LOOKUP
+        assert snapshot.read_meta(data_loader._snapshot_path())["entry_count"] == len(MOCK_LOOKUP)
+
+    def test_disabled_keeps_private_copy(self, data_dir, monkeypatch):
+        monkeypatch.setattr(data_loader.settings, "snapshot_enabled", False)
+        data_loader.load_data()
+        assert not data_loader._snapshot_path().exists()
+        assert dict(data_loader._lookup.items()) == MOCK_LOOKUP
@@ -0,0 +1,55 @@
+"""Tests for scripts/synthetic_tercet.py — the benchmark suite's synthetic TERCET dataset."""
+
+from unittest.mock import patch
+
+import httpx
+
+from scripts.benchmark import _mirror_transport
+from scripts.synthetic_tercet import SyntheticTercet, _allocate
+
+
+class TestAllocate:
+    def test_overflow_moves_to_entries_with_room(self):
+        assert _allocate(100, [0.9, 0.1], [50, 100]) == [50, 50]
+
+    def test_remainder_goes_to_the_heaviest(self):
+        assert sum(_allocate(7, [1.0, 1.0, 2.0], [10, 10, 10])) == 7
+
+
+class TestSyntheticTercet:
+    def test_rows_are_sorted_unique_and_sized(self):
+        data = SyntheticTercet(5000)
+        rows = list(data.rows())
+        keys = [(cc, pc) for cc, pc, _ in rows]
+        assert len(rows) == data.row_count()
+        assert keys == sorted(keys)
+        assert len(set(keys)) == len(keys)
+        widths = data.widths()
+        assert all(len(pc) == widths[cc] for cc, pc in keys)
+
+    def test_same_seed_same_data(self):
+        assert list(SyntheticTercet(2000, seed=3).rows()) == list(SyntheticTercet(2000, seed=3).rows())
+        assert list(SyntheticTercet(2000, seed=3).rows()) != list(SyntheticTercet(2000, seed=4).rows())
+
+    def test_cold_load_from_the_mirror_answers_each_tier(self, mock_data, tmp_path, monkeypatch):
+        from app import data_loader
+
+        data = SyntheticTercet(3000)
+        mirror = data.write_mirror(tmp_path / "mirror", data_loader.settings.nuts_version)
+        monkeypatch.setattr(data_loader.settings, "data_dir", str(tmp_path / "data"))
+        monkeypatch.setattr(data_loader.settings, "estimates_csv", str(mirror / "estimates.csv"))
+        monkeypatch.setattr(data_loader.settings, "countries", list(data.countries))
+        monkeypatch.setattr(data_loader.settings, "snapshot_enabled", False)
+        monkeypatch.setattr(data_loader.settings, "gc_freeze", False)
+        transport = _mirror_transport(mirror, data_loader.settings.tercet_base_url)
+        real_client = httpx.Client
+        with patch.object(data_loader.httpx, "Client", lambda **kw: real_client(transport=transport, **kw)):
+            data_loader.load_data()
+
+        gen = data_loader.get_generation()
+        assert len(gen.lookup) == data.row_count()
+        assert len(gen.estimates) == sum(1 for _ in data.estimates())
+        for tier, queries in data.queries().items():
+            assert queries
+            for cc, raw in queries:
+                assert data_loader._lookup_in(gen, cc, raw)[0] == tier, (cc, raw)
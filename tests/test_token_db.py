@@ -198,6 +198,49 @@ class TestTokenDBExecute:
         with pytest.raises(TokenDBError):
             db.execute("SELECT 1")
 
+    def test_pipeline_sends_statements_in_one_request(self, monkeypatch):
+        from app.token_db import TokenDB
+
+        ok = self._ok(cols=["n"], rows=[[{"type": "integer", "value": "1"}]])["results"][0]
+        captured = self._mock_response(monkeypatch, json_body={"results": [ok, ok]})
+        db = TokenDB("https://db.example/v1")
+        assert db.pipeline([("SELECT 1 AS n", None), ("SELECT ? AS n", [1])]) == [[{"n": 1}], [{"n": 1}]]
+        assert [r["stmt"]["sql"] for r in captured["json"]["requests"]] == ["SELECT 1 AS n", "SELECT ? AS n"]
+
+    def test_pipeline_error_in_any_statement_raises(self, monkeypatch):
+        from app.token_db import TokenDB, TokenDBError
+
+        ok = self._ok()["results"][0]
+        body = {"results": [ok, {"type": "error", "error": {"message": "no such table"}}]}
+        self._mock_response(monkeypatch, json_body=body)
+        db = TokenDB("https://db.example/v1")
+        with pytest.raises(TokenDBError, match="no such table"):
+            db.pipeline([("SELECT 1", None), ("SELECT * FROM missing", None)])
+
+    def test_requests_reuse_one_pooled_client(self, monkeypatch):
+        import httpx
+
+        from app.token_db import TokenDB
+
+        clients = []
+        real_init = httpx.Client.__init__
+
+        def _init(self, *args, **kwargs):
+            clients.append(self)
+            real_init(self, *args, **kwargs)
+
+        self._mock_response(monkeypatch, json_body=self._ok())
+        monkeypatch.setattr(httpx.Client, "__init__", _init)
+        db = TokenDB("https://db.example/v1")
+        db.execute("SELECT 1")
+        db.execute("SELECT 1")
+        assert len(clients) == 1
+        db.close()
+        assert clients[0].is_closed
+        db.execute("SELECT 1")
+        assert len(clients) == 2
+        db.close()
+
     def test_execute_libsql_error_raises_token_db_error(self, monkeypatch):
         from app.token_db import TokenDB, TokenDBError
 
@@ -220,15 +263,18 @@ class TestTokenDBMethods:
         from app.token_db import TokenDB
 
         captured: list[tuple[str, list]] = []
+        pipelines: list[int] = []
         return_value: list[dict] = []
 
-        def _execute(self, sql, params=None):
-            captured.append((sql, list(params) if params else []))
-            return list(return_value)
+        def _pipeline(self, statements):
+            pipelines.append(len(statements))
+            captured.extend((sql, list(params) if params else []) for sql, params in statements)
+            return [list(return_value) for _ in statements]
 
-        monkeypatch.setattr(TokenDB, "execute", _execute)
+        monkeypatch.setattr(TokenDB, "pipeline", _pipeline)
         db = TokenDB("https://db.example/v1")
         db._captured = captured
+        db._pipelines = pipelines
         db._set_return = return_value
         return db
 
@@ -239,6 +285,7 @@ class TestTokenDBMethods:
         assert any("CREATE INDEX" in s and "idx_trusted_tokens_active" in s for s in sqls)
         # Both statements must use IF NOT EXISTS so init is idempotent
         assert all("IF NOT EXISTS" in s for s in sqls)
+        assert len(db._pipelines) == 1
 
     def test_add_inserts_value_and_label(self, db):
         db._set_return.clear()
@@ -263,6 +310,26 @@ class TestTokenDBMethods:
         assert params == []
         assert rows == [{"id": 1, "value": "v1", "label": "a", "created_at": "2026-01-01"}]
 
+    def test_full_sync_reads_clock_then_active_rows(self, db):
+        db._set_return.clear()
+        db._set_return.append({"now": "2026-10-01 12:00:00"})
+        clock, _ = db.sync_rows()
+        assert clock == "2026-10-01 12:00:00"
+        assert db._pipelines == [2]
+        assert "datetime('now')" in db._captured[0][0]
+        sql, params = db._captured[1]
+        assert "revoked_at IS NULL" in sql
+        assert params == []
+
+    def test_delta_sync_selects_rows_created_or_revoked_since(self, db):
+        db._set_return.clear()
+        db._set_return.append({"now": "2026-10-01 12:01:00"})
+        db.sync_rows("2026-10-01 12:00:00")
+        sql, params = db._captured[1]
+        assert "created_at >= ?" in sql and "revoked_at >= ?" in sql
+        assert "revoked_at IS NULL" not in sql
+        assert params == ["2026-10-01 12:00:00", "2026-10-01 12:00:00"]
+
     def test_list_all_omits_value_column(self, db):
         db.list_all()
         sql, _ = db._captured[0]